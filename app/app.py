@@ -0,0 +1,43 @@
+"""
+Service setup, run by hyperflask's create_app once models, routes and actors are loaded.
+"""
+from hyperflask.factory import app, db
+
+from app.services.stripe_service import stripe_service
+from app.services.entitlements import entitlements
+from app.services.plan_catalog import plan_catalog
+from app.services.db_pool import install_pool
+from app.services.sqlite_profile import install_sqlite_profile
+from app.services.db_router import db_router, install_replicas
+from app.services.query_stats import query_stats
+from app.services.slow_queries import slow_query_log
+from app.services.server_timing import server_timing
+from app.services.metrics import metrics
+from app.services.page_cache import page_cache
+from app.services.warmup import warmup
+
+
+# Bounded, recycling connection pool when db_pool_* is configured (production Postgres)
+install_pool(app, db)
+# Tuned single-writer engine + reader pool when sqlite_profile is enabled
+install_sqlite_profile(app, db)
+# GET requests read from replicas when db_replica_uri is set
+install_replicas(app, db)
+db_router.init_app(app, db)
+# Per-request query counts and N+1 detection (X-DB-Queries header in debug)
+query_stats.init_app(app)
+slow_query_log.init_app(app)
+# Server-Timing header (debug) and per-page phase aggregates
+server_timing.init_app(app)
+# Prometheus /metrics, summed across web and worker processes
+metrics.init_app(app, db)
+# Compiled .jpy frontmatter and Jinja bytecode on disk (warmed by `hyperflask warm-page-cache`)
+page_cache.init_app(app)
+
+stripe_service.init_app(app)
+entitlements.init_app(app)
+# No I/O here: each process loads the catalog on first use (syncing from Stripe if the table is empty)
+plan_catalog.init_app(app)
+
+# Last: warms pages, connections and caches on the first request, /readyz reports when done
+warmup.init_app(app, db)
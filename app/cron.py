@@ -0,0 +1,60 @@
+"""
+Periodic jobs, scheduled by periodiq in the dramatiq worker.
+"""
+from datetime import timedelta
+
+from hyperflask import cron
+from hyperflask.factory import app
+
+from app.services.stripe_service import stripe_service
+from app.services.plan_catalog import plan_catalog
+from app.services.admin_stats import refresh_stats
+from app.services.rollups import run_rollups
+from app.services.cart_sweeper import sweep_abandoned_carts
+from app.services.subscription_expiry import expire_subscriptions
+
+
+@app.actor(periodic=cron(app.config.get('PLAN_CATALOG_SYNC_CRON', '*/15 * * * *')))
+def sync_plan_catalog():
+    """Refresh the plan table from Stripe prices (web processes pick it up within plan_catalog_ttl)"""
+    if not stripe_service.is_enabled():
+        return
+    count = plan_catalog.sync()
+    print(f"✓ Synced {count} plans from Stripe")
+
+
+@app.actor(periodic=cron(app.config.get('ADMIN_STATS_REFRESH_CRON', '*/5 * * * *')))
+def refresh_admin_stats():
+    """Recompute the admin dashboard counters"""
+    stats = refresh_stats()
+    print(f"✓ Refreshed admin stats ({stats['users_total']} users, {stats['orders_total']} orders)")
+
+
+@app.actor(periodic=cron(app.config.get('ROLLUPS_CRON', '*/10 * * * *')))
+def update_rollups():
+    """Fold new orders and timeline entries into the daily rollup tables"""
+    stats = run_rollups()
+    print(f"✓ Rollups updated in {stats['elapsed_seconds']:.2f}s "
+          f"({stats['daily_product_sales']['days']} sales days, {stats['daily_product_posts']['days']} post days)")
+
+
+@app.actor(periodic=cron(app.config.get('CART_SWEEP_CRON', '23 * * * *')))
+def sweep_carts():
+    """Delete abandoned cart items in small batches"""
+    stats = sweep_abandoned_carts(
+        max_age=timedelta(days=float(app.config.get('CART_ABANDON_DAYS', 30))),
+        batch_size=int(app.config.get('CART_SWEEP_BATCH_SIZE', 500)),
+    )
+    print(f"✓ Swept {stats['deleted']} abandoned cart items in {stats['batches']} batches "
+          f"({stats['elapsed_seconds']:.2f}s, added before {stats['cutoff']:%Y-%m-%d %H:%M})")
+
+
+@app.actor(periodic=cron(app.config.get('SUBSCRIPTION_EXPIRY_CRON', '7 * * * *')))
+def reconcile_subscriptions():
+    """End subscriptions past subscription_ends_at whose cancellation webhook never arrived"""
+    stats = expire_subscriptions(
+        grace=timedelta(hours=float(app.config.get('SUBSCRIPTION_EXPIRY_GRACE_HOURS', 24))),
+        verify_limit=int(app.config.get('SUBSCRIPTION_VERIFY_LIMIT', 20)),
+    )
+    print(f"✓ Expired {stats['expired']} subscriptions "
+          f"({stats['verified']} checked with Stripe, {stats['renewed']} renewed)")
@@ -1,9 +1,18 @@
 from hyperflask.factory import db
 from hyperflask_users import UserMixin, UserRelatedMixin
 from sqlalchemy import Index
+from sqlorm import SQL
 import datetime
 
 
+def find_by_ids(model, ids):
+    """{id: instance} for the given ids, in a single query (one parameter per id)"""
+    ids = {id for id in ids if id is not None}
+    if not ids:
+        return {}
+    return {obj.id: obj for obj in model.find_all(model.id.in_(SQL.Tuple(SQL.Param(id) for id in ids)))}
+
+
 class User(UserMixin, db.Model):
     is_admin: bool = db.Column(default=False)
 
@@ -13,6 +22,15 @@ class User(UserMixin, db.Model):
     subscription_status: str = db.Column(nullable=True)  # active, canceled, past_due, trialing
     subscription_plan: str = db.Column(nullable=True)    # basic, pro, enterprise (or your plan names)
     subscription_ends_at: datetime.datetime = db.Column(nullable=True)
+    # Precomputed entitlement tier (0 = none, see app/services/entitlements.py)
+    # Only written by webhook processing
+    subscription_tier: int = db.Column(default=0)
+
+    __table_args__ = (
+        Index('ix_user_signup_at', 'signup_at'),
+        Index('ix_user_stripe_subscription_id', 'stripe_subscription_id'),
+        Index('ix_user_subscription_status_ends_at', 'subscription_status', 'subscription_ends_at'),
+    )
 
     @classmethod
     def create_user(cls, email, password=None, **kwargs):
@@ -41,6 +59,14 @@ class User(UserMixin, db.Model):
 
             return user
 
+    @classmethod
+    def find_by_ids(cls, ids):
+        """
+        Users by id in a single query, e.g. the authors of a page of timeline entries
+        (instead of loading entry.user once per entry).
+        """
+        return find_by_ids(cls, ids)
+
 
 class TimelineEntry(UserRelatedMixin, db.Model):
     timestamp: datetime.datetime
@@ -55,6 +81,10 @@ class TimelineEntry(UserRelatedMixin, db.Model):
     __table_args__ = (
         Index('ix_timelineentry_timestamp', 'timestamp'),
         Index('ix_timelineentry_user_timestamp', 'user_id', 'timestamp'),
+        Index('ix_timelineentry_status_timestamp', 'status', 'timestamp'),
+        Index('ix_timelineentry_status_created_at', 'status', 'created_at'),
+        Index('ix_timelineentry_created_at', 'created_at'),
+        Index('ix_timelineentry_product_status_created_at', 'product_id', 'status', 'created_at'),
     )
 
 
@@ -74,6 +104,7 @@ class Product(db.Model):
 
     # Subscription gating: require certain subscription tier to purchase
     requires_subscription: str = db.Column(nullable=True)  # 'basic', 'pro', 'enterprise', or null
+    required_tier: int = db.Column(default=0)  # Integer form of requires_subscription, kept in sync on save
 
     created_at: datetime.datetime = db.Column(default=datetime.datetime.utcnow)
     updated_at: datetime.datetime = db.Column(default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
@@ -84,8 +115,14 @@ class Product(db.Model):
     __table_args__ = (
         Index('ix_product_category', 'category'),
         Index('ix_product_is_active', 'is_active'),
+        Index('ix_product_is_active_created_at', 'is_active', 'created_at'),
     )
 
+    def save(self, *args, **kwargs):
+        from app.services.entitlements import plan_tier
+        self.required_tier = plan_tier(self.requires_subscription)
+        return super().save(*args, **kwargs)
+
 
 class CartItem(db.Model):
     """Shopping cart items"""
@@ -98,6 +135,8 @@ class CartItem(db.Model):
     __table_args__ = (
         Index('ix_cartitem_user', 'user_id'),
         Index('ix_cartitem_product', 'product_id'),
+        Index('ix_cartitem_user_product', 'user_id', 'product_id'),
+        Index('ix_cartitem_added_at', 'added_at'),
     )
 
 
@@ -129,6 +168,8 @@ class Order(UserRelatedMixin, db.Model):
         Index('ix_order_user', 'user_id'),
         Index('ix_order_status', 'status'),
         Index('ix_order_number', 'order_number'),
+        Index('ix_order_created_at', 'created_at'),
+        Index('ix_order_updated_at', 'updated_at'),
     )
 
 
@@ -145,3 +186,89 @@ class OrderItem(db.Model):
         Index('ix_orderitem_order', 'order_id'),
         Index('ix_orderitem_product', 'product_id'),
     )
+
+
+class CheckoutRequest(UserRelatedMixin, db.Model):
+    """
+    Asynchronous Stripe Checkout session creation.
+    Written by StripeService's executor, polled by the HTMX checkout flow.
+    """
+    id: int
+    price_id: str = db.Column(nullable=False)
+    status: str = db.Column(default='pending')  # pending, ready, failed
+    session_id: str = db.Column(nullable=True)
+    checkout_url: str = db.Column(nullable=True)
+    error: str = db.Column(nullable=True)
+    created_at: datetime.datetime = db.Column(default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_checkoutrequest_user_status', 'user_id', 'status'),
+    )
+
+
+class Plan(db.Model):
+    """
+    Subscription plan catalog, one row per Stripe price.
+    Synced from Stripe by app/services/plan_catalog.py and cached in memory by each process.
+    """
+    id: int
+    price_id: str = db.Column(nullable=False, unique=True)
+    plan: str = db.Column(nullable=False)  # basic, pro, enterprise (see entitlements.PLAN_TIERS)
+    name: str = db.Column(nullable=False)
+    amount: int = db.Column(nullable=False)  # Price in cents
+    currency: str = db.Column(default='usd')
+    interval: str = db.Column(default='month')
+    features: str = db.Column(nullable=True)  # Newline separated
+    highlighted: bool = db.Column(default=False)
+    is_active: bool = db.Column(default=True)
+    synced_at: datetime.datetime = db.Column(default=datetime.datetime.utcnow)
+
+
+class AdminStat(db.Model):
+    """
+    Precomputed admin dashboard counters, one row per metric.
+    Refreshed by a periodiq job (see app/services/admin_stats.py).
+    """
+    id: int
+    name: str = db.Column(nullable=False, unique=True)
+    value: int = db.Column(default=0)
+    refreshed_at: datetime.datetime = db.Column(default=datetime.datetime.utcnow)
+
+
+class DailyProductSales(db.Model):
+    """
+    Daily sales rollup per product (paid orders, by order day).
+    Written by app/services/rollups.py; read directly by the admin charts.
+    """
+    id: int
+    day: datetime.date = db.Column(nullable=False)
+    product_id: int = db.Column(nullable=False)
+    category: str = db.Column(nullable=True)  # Product category at rollup time
+    orders: int = db.Column(default=0)
+    units: int = db.Column(default=0)
+    revenue: int = db.Column(default=0)  # Revenue in cents
+
+    __table_args__ = (
+        Index('ix_dailyproductsales_day_product', 'day', 'product_id', unique=True),
+    )
+
+
+class DailyProductPosts(db.Model):
+    """Daily count of timeline entries mentioning each product (rollup, see DailyProductSales)"""
+    id: int
+    day: datetime.date = db.Column(nullable=False)
+    product_id: int = db.Column(nullable=False)
+    posts: int = db.Column(default=0)
+
+    __table_args__ = (
+        Index('ix_dailyproductposts_day_product', 'day', 'product_id', unique=True),
+    )
+
+
+class RollupWatermark(db.Model):
+    """How far each rollup has read its source table"""
+    id: int
+    name: str = db.Column(nullable=False, unique=True)
+    last_id: int = db.Column(nullable=True)
+    last_timestamp: datetime.datetime = db.Column(nullable=True)
+    updated_at: datetime.datetime = db.Column(default=datetime.datetime.utcnow)
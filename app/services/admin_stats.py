@@ -0,0 +1,85 @@
+"""
+Admin dashboard statistics.
+
+Counters are computed with a few SQL aggregates (no rows are loaded) and
+stored in the `adminstat` table by a periodiq job (app/cron.py), so the
+dashboard only reads a handful of precomputed rows.
+
+Usage:
+    from app.services.admin_stats import get_stats
+    stats = get_stats()
+    stats['users_total'], stats['revenue_cents'], stats['refreshed_at']
+"""
+from typing import Dict, Any
+from datetime import datetime
+
+from app.services.entitlements import ENTITLED_STATUSES
+
+
+# Order statuses that count as revenue
+PAID_ORDER_STATUSES = ('paid', 'shipped', 'completed')
+
+STAT_NAMES = (
+    'users_total',
+    'users_subscribed',
+    'entries_total',
+    'entries_approved',
+    'entries_pending',
+    'orders_total',
+    'orders_paid',
+    'revenue_cents',
+)
+
+
+def compute_stats() -> Dict[str, int]:
+    """Compute all dashboard counters with one aggregate query per table"""
+    from hyperflask.factory import db
+    from app.services.db_sql import sql, placeholders
+
+    entitled = f'subscription_status IN ({placeholders(len(ENTITLED_STATUSES))})'
+    paid = f'status IN ({placeholders(len(PAID_ORDER_STATUSES))})'
+
+    with db as tx:
+        users = tx.fetchone(sql(tx, 'SELECT count(*), '
+                                f'coalesce(sum(CASE WHEN {entitled} THEN 1 ELSE 0 END), 0) FROM "user"'),
+                            list(ENTITLED_STATUSES))
+        entries = tx.fetchone(sql(tx, 'SELECT count(*), '
+                                  "coalesce(sum(CASE WHEN status = 'approved' THEN 1 ELSE 0 END), 0), "
+                                  "coalesce(sum(CASE WHEN status = 'pending' THEN 1 ELSE 0 END), 0) FROM timelineentry"))
+        orders = tx.fetchone(sql(tx, 'SELECT count(*), '
+                                 f'coalesce(sum(CASE WHEN {paid} THEN 1 ELSE 0 END), 0), '
+                                 f'coalesce(sum(CASE WHEN {paid} THEN total_amount ELSE 0 END), 0) FROM "order"'),
+                             list(PAID_ORDER_STATUSES) * 2)
+
+    values = tuple(users) + tuple(entries) + tuple(orders)
+    return {name: int(value or 0) for name, value in zip(STAT_NAMES, values)}
+
+
+def refresh_stats() -> Dict[str, int]:
+    """Recompute the counters and replace the stored rows in one transaction"""
+    from hyperflask.factory import db
+    from app.services.db_sql import sql
+
+    stats = compute_stats()
+    now = datetime.utcnow()
+
+    with db as tx:
+        tx.execute('DELETE FROM adminstat')
+        tx.executemany(sql(tx, 'INSERT INTO adminstat (name, value, refreshed_at) VALUES (?, ?, ?)'),
+                       [(name, value, now) for name, value in stats.items()])
+
+    return stats
+
+
+def get_stats() -> Dict[str, Any]:
+    """
+    Stored counters plus 'refreshed_at'.
+    Until the job has run (fresh install), counters are 0 and 'refreshed_at' is None.
+    """
+    from app.models import AdminStat
+
+    rows = list(AdminStat.find_all())
+    stats: Dict[str, Any] = {name: 0 for name in STAT_NAMES}
+    stats.update({row.name: row.value for row in rows})
+    stats['refreshed_at'] = min((row.refreshed_at for row in rows), default=None)
+    return stats
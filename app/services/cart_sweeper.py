@@ -0,0 +1,69 @@
+"""
+Abandoned cart cleanup.
+
+Cart items are only removed by the user or at checkout, so carts that are
+never checked out stay forever and every cart query pays for them. A
+periodiq job (app/cron.py) deletes abandoned carts: all items of a user
+whose most recent item was added more than cart_abandon_days ago. A cart
+with a recent item is left whole, old items included.
+
+Rows are deleted in batches of cart_sweep_batch_size, each in its own short
+transaction, so on SQLite the write lock is released between batches and
+requests adding to a cart never wait behind one long DELETE. Both lookups
+(old rows, users with a recent row) are range scans of ix_cartitem_added_at.
+
+Config:
+    cart_abandon_days: 30
+    cart_sweep_batch_size: 500
+    cart_sweep_cron: "23 * * * *"
+
+Usage:
+    from app.services.cart_sweeper import sweep_abandoned_carts
+    stats = sweep_abandoned_carts(max_age=timedelta(days=30))
+    stats['deleted'], stats['batches']
+"""
+from typing import Optional, Dict, Any
+from datetime import datetime, timedelta
+import time
+
+
+ABANDON_AFTER = timedelta(days=30)
+BATCH_SIZE = 500
+# Pause between batches, lets queued writers take the SQLite lock
+BATCH_PAUSE = 0.05
+
+# One batch: old rows of users without a recent row (params: cutoff, cutoff, batch size)
+SWEEP_BATCH = (
+    'DELETE FROM cartitem WHERE id IN ('
+    'SELECT id FROM cartitem WHERE added_at < ? '
+    'AND user_id NOT IN (SELECT user_id FROM cartitem WHERE added_at >= ?) LIMIT ?)'
+)
+
+
+def sweep_abandoned_carts(max_age: timedelta = ABANDON_AFTER, batch_size: int = BATCH_SIZE,
+                          now: Optional[datetime] = None, pause: float = BATCH_PAUSE) -> Dict[str, Any]:
+    """Delete the items of carts untouched for max_age, batch_size rows per transaction"""
+    from hyperflask.factory import db
+    from app.services.db_sql import execute
+
+    start = time.perf_counter()
+    cutoff = (now or datetime.utcnow()) - max_age
+
+    deleted = 0
+    batches = 0
+    while True:
+        with db as tx:
+            count = execute(tx, SWEEP_BATCH, [cutoff, cutoff, batch_size])
+        deleted += count
+        batches += 1
+        if count < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    return {
+        'deleted': deleted,
+        'batches': batches,
+        'cutoff': cutoff,
+        'elapsed_seconds': time.perf_counter() - start,
+    }
@@ -0,0 +1,337 @@
+"""
+Connection pooling for the database engine.
+
+sqlorm's built-in pool is a plain list: it never blocks, never recycles
+connections and fails as soon as max_pool_conns is reached. PooledEngine
+keeps the same Engine API (so sessions, models and signals are unchanged)
+and adds what a production Postgres deployment needs:
+
+- min/max size: idle connections are kept warm down to min_size
+- max_lifetime / max_idle: old or long-idle connections are closed and replaced
+- acquire_timeout: requests wait for a free connection instead of failing at once
+- prepare_threshold: psycopg server-side prepared statements after N executions
+- stats: in-use / idle / waiting connections and acquire latency
+
+Config (see config_prod.yml):
+    db_pool_min_size: 2
+    db_pool_max_size: 10
+    db_pool_max_lifetime: 1800     # seconds
+    db_pool_max_idle: 300          # seconds
+    db_pool_acquire_timeout: 5     # seconds
+    db_prepare_threshold: 5        # executions before preparing, 0 = always (psycopg only)
+
+Keys are uppercased when the config files are loaded (DB_POOL_MAX_SIZE, ...),
+so they can also be set from the environment (FLASK_DB_POOL_MAX_SIZE=20).
+The pool is installed by app/app.py when db_pool_max_size is set.
+"""
+from typing import Optional, Dict, Any, List
+import threading
+import time
+
+from sqlorm.engine import Engine, EngineError
+
+
+# Acquire latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class PoolTimeoutError(EngineError):
+    """No connection became available within acquire_timeout"""
+
+
+class PoolStats:
+    """Counters and acquire latency histogram for one pool"""
+
+    def __init__(self):
+        self.acquires = 0
+        self.timeouts = 0
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.acquire_seconds_total = 0.0
+        self.acquire_seconds_max = 0.0
+        # Cumulative counts per LATENCY_BUCKETS bound (Prometheus style), plus +Inf
+        self.acquire_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record_acquire(self, seconds: float):
+        self.acquires += 1
+        self.acquire_seconds_total += seconds
+        self.acquire_seconds_max = max(self.acquire_seconds_max, seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.acquire_buckets[i] += 1
+        self.acquire_buckets[-1] += 1
+
+
+class PooledEngine(Engine):
+    """
+    Thread-safe, bounded connection pool with lifetime/idle recycling.
+
+    Usage:
+        engine = PooledEngine.from_engine(db.engine, min_size=2, max_size=10)
+    """
+
+    def __init__(
+        self,
+        dbapi,
+        connection_factory,
+        logger=None,
+        logger_level="debug",
+        min_size: int = 0,
+        max_size: int = 10,
+        max_lifetime: Optional[float] = None,
+        max_idle: Optional[float] = None,
+        acquire_timeout: float = 5.0,
+        prepare_threshold: Optional[int] = None,
+        name: str = "default",
+    ):
+        super().__init__(dbapi, connection_factory, logger, logger_level, pool=True, max_pool_conns=max_size)
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.acquire_timeout = acquire_timeout
+        self.prepare_threshold = prepare_threshold
+        self.name = name
+        self.stats = PoolStats()
+        self.waiting = 0
+        self._opening = 0
+        self._opened_at: Dict[int, float] = {}
+        self._idle_since: Dict[int, float] = {}
+        self._cond = threading.Condition()
+        self._prefill_started = False
+
+    @classmethod
+    def from_engine(cls, engine: Engine, **options) -> "PooledEngine":
+        """Wrap an existing engine's connection factory (keeps its URI and driver options)"""
+        return cls(engine.dbapi, engine.connection_factory, engine.logger, engine.logger_level, **options)
+
+    # Connection lifecycle
+
+    def _connect(self):
+        conn = super()._connect()
+        if self.prepare_threshold is not None and hasattr(conn, "prepare_threshold"):
+            conn.prepare_threshold = self.prepare_threshold
+        with self._cond:
+            self._opened_at[id(conn)] = time.monotonic()
+            self.stats.connections_opened += 1
+        return conn
+
+    def _close(self, conn):
+        with self._cond:
+            self._opened_at.pop(id(conn), None)
+            self._idle_since.pop(id(conn), None)
+            self.stats.connections_closed += 1
+        try:
+            super()._close(conn)
+        except Exception:
+            # Broken connections may fail to close cleanly; they are dropped either way
+            pass
+
+    def _is_expired(self, conn, now: float, idle: bool) -> bool:
+        if getattr(conn, "closed", False) or getattr(conn, "broken", False):
+            return True
+        opened_at = self._opened_at.get(id(conn), now)
+        if self.max_lifetime and now - opened_at > self.max_lifetime:
+            return True
+        if idle and self.max_idle and len(self.pool) + len(self.active_conns) > self.min_size:
+            if now - self._idle_since.get(id(conn), now) > self.max_idle:
+                return True
+        return False
+
+    def connect(self, from_pool=True):
+        if not from_pool:
+            return self._connect()
+
+        start = time.monotonic()
+        deadline = start + self.acquire_timeout
+        conn = None
+        expired: List[Any] = []
+
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    while self.pool:
+                        candidate = self.pool.pop()  # most recently used first, so extra idle ones age out
+                        if self._is_expired(candidate, now, idle=True):
+                            expired.append(candidate)
+                        else:
+                            conn = candidate
+                            break
+                    if conn is not None:
+                        break
+                    if len(self.active_conns) + self._opening < self.max_size:
+                        self._opening += 1
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.stats.timeouts += 1
+                        raise PoolTimeoutError(
+                            f"No database connection available after {self.acquire_timeout}s "
+                            f"(pool '{self.name}', max_size={self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+
+        for stale in expired:
+            self._close(stale)
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            finally:
+                with self._cond:
+                    self._opening -= 1
+                    self._cond.notify()
+            reused = False
+        else:
+            reused = True
+
+        with self._cond:
+            self._idle_since.pop(id(conn), None)
+            self.active_conns.append(conn)
+            self.stats.record_acquire(time.monotonic() - start)
+
+        if reused:
+            if self.logger:
+                getattr(self.logger, self.logger_level)("Re-using connection from pool")
+            self.pool_checkout.send(self, conn=conn)
+
+        if self.min_size and not self._prefill_started:
+            self._start_prefill()
+        return conn
+
+    def disconnect(self, conn, force=False):
+        with self._cond:
+            if conn not in self.active_conns:
+                if not force:
+                    raise EngineError("Cannot close connection which is not part of pool")
+                keep = False
+            else:
+                self.active_conns.remove(conn)
+                keep = not force and not self._is_expired(conn, time.monotonic(), idle=False)
+                if keep:
+                    self.pool.append(conn)
+                    self._idle_since[id(conn)] = time.monotonic()
+            self._cond.notify()
+
+        if keep:
+            if self.logger:
+                getattr(self.logger, self.logger_level)("Returning connection to pool")
+            self.pool_checkin.send(self, conn=conn)
+        else:
+            self._close(conn)
+
+    def disconnect_all(self):
+        with self._cond:
+            conns = self.pool + self.active_conns
+            self.pool = []
+            self.active_conns = []
+            self._cond.notify_all()
+        for conn in conns:
+            self._close(conn)
+
+    # Warm-up
+
+    def prefill(self):
+        """Open idle connections until the pool holds min_size connections"""
+        while True:
+            with self._cond:
+                if len(self.pool) + len(self.active_conns) + self._opening >= self.min_size:
+                    return
+                self._opening += 1
+            try:
+                conn = self._connect()
+            finally:
+                with self._cond:
+                    self._opening -= 1
+            with self._cond:
+                self.pool.append(conn)
+                self._idle_since[id(conn)] = time.monotonic()
+                self._cond.notify()
+
+    def _start_prefill(self):
+        # Lazily, after the first successful connection, so importing the app never touches the database
+        self._prefill_started = True
+
+        def run():
+            try:
+                self.prefill()
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"Database pool prefill failed: {e}")
+
+        threading.Thread(target=run, name=f"db-pool-prefill-{self.name}", daemon=True).start()
+
+    # Metrics
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Point-in-time pool metrics"""
+        with self._cond:
+            stats = self.stats
+            return {
+                'pool': self.name,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': len(self.pool) + len(self.active_conns),
+                'in_use': len(self.active_conns),
+                'idle': len(self.pool),
+                'waiting': self.waiting,
+                'acquires': stats.acquires,
+                'timeouts': stats.timeouts,
+                'connections_opened': stats.connections_opened,
+                'connections_closed': stats.connections_closed,
+                'acquire_seconds_total': stats.acquire_seconds_total,
+                'acquire_seconds_max': stats.acquire_seconds_max,
+                'acquire_seconds_avg': stats.acquire_seconds_total / stats.acquires if stats.acquires else 0.0,
+                'acquire_buckets': dict(zip([*map(str, LATENCY_BUCKETS), '+Inf'], stats.acquire_buckets)),
+            }
+
+
+def pool_options(config, prefix: str = "DB_POOL_") -> Optional[Dict[str, Any]]:
+    """PooledEngine options from config, or None when pooling isn't configured"""
+    if config.get(f"{prefix}MAX_SIZE") is None:
+        return None
+
+    def seconds(key):
+        value = config.get(f"{prefix}{key}")
+        return float(value) if value not in (None, "", 0, "0") else None
+
+    prepare_threshold = config.get("DB_PREPARE_THRESHOLD")
+    return {
+        'min_size': int(config.get(f"{prefix}MIN_SIZE", 0)),
+        'max_size': int(config.get(f"{prefix}MAX_SIZE")),
+        'max_lifetime': seconds("MAX_LIFETIME"),
+        'max_idle': seconds("MAX_IDLE"),
+        'acquire_timeout': float(config.get(f"{prefix}ACQUIRE_TIMEOUT", 5)),
+        'prepare_threshold': int(prepare_threshold) if prepare_threshold not in (None, "") else None,
+    }
+
+
+def replace_engine(db, old: Engine, new: Engine):
+    """Swap an engine registered on FlaskSQLORM (db.engine and/or the dispatcher)"""
+    if db.engine is old:
+        db.engine = new
+    db.engines._engines = [(new if engine is old else engine, tags) for engine, tags in db.engines._engines]
+
+
+def install_pool(app, db) -> Optional[PooledEngine]:
+    """Replace the default engine with a PooledEngine when db_pool_* is configured"""
+    options = pool_options(app.config)
+    if options is None or not getattr(db, "engine", None):
+        return None
+
+    pooled = PooledEngine.from_engine(db.engine, **options)
+    db.engine.disconnect_all()
+    replace_engine(db, db.engine, pooled)
+    return pooled
+
+
+def get_pool_stats(db) -> List[Dict[str, Any]]:
+    """Stats for every pooled engine registered on db"""
+    engines = getattr(db, "engines", None)
+    if engines is None:
+        return []
+    return [engine.get_stats() for engine in engines.engines if isinstance(engine, PooledEngine)]
@@ -0,0 +1,156 @@
+"""
+Per-request database routing.
+
+The app context session (db.session, models' queries) is created on the
+default engine (the primary) before the request is dispatched. For
+read-only requests (GET/HEAD/OPTIONS) the router swaps it, before any
+query runs, for a session on an engine tagged "reader": the SQLite reader
+pool (app/services/sqlite_profile.py) or read replicas (db_replica_uri).
+Explicit `with db:` blocks always run on db.engine, so writes made while
+rendering a GET page still go to the primary.
+
+Requests stay on the primary when:
+- the method isn't read-only (POST handlers: shop/cart/*, webhooks/stripe, ...)
+- the path starts with one of db_primary_paths (pages that must never read
+  stale rows, e.g. the cart and checkout status polling)
+- the client wrote less than db_sticky_seconds ago (read-your-writes across
+  the redirect that follows a POST)
+
+Replicas lag behind the primary, so as soon as a request commits on the
+primary its own session is moved to the primary too. SQLite readers share
+the writer's file and see commits immediately, so stickiness only applies
+when replicas are registered.
+
+Config (see config_prod.yml):
+    db_replica_uri: postgresql://...   # one URI or a list
+    db_sticky_seconds: 5
+    db_primary_paths: [/shop/cart, /checkout, /webhooks]
+
+When no reader engine is registered the router does nothing.
+"""
+from typing import Optional, List
+import random
+import time
+
+from flask import current_app, g, request, session, has_request_context
+from sqlorm.engine import Engine, Session, session_context
+
+from app.services.db_pool import PooledEngine, pool_options
+
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+READER_TAG = "reader"
+REPLICA_TAG = "replica"
+PRIMARY_PATHS = ("/shop/cart", "/checkout", "/webhooks")
+STICKY_SESSION_KEY = "_db_primary_until"
+
+
+def use_engine(engine: Engine) -> bool:
+    """
+    Switch the current app context session to `engine`.
+    Not possible while the session is inside a transaction.
+    """
+    current = getattr(g, "sqlorm_session", None)
+    if current is None or current.engine is engine or current.in_transaction:
+        return False
+
+    stack = session_context.stack
+    if current not in stack:
+        return False
+
+    replacement = engine.make_session()
+    stack[stack.index(current)] = replacement
+    g.sqlorm_session = replacement
+    current.close()
+    return True
+
+
+def install_replicas(app, db) -> List[Engine]:
+    """Register engines for db_replica_uri with the reader and replica tags"""
+    uris = app.config.get("DB_REPLICA_URI") or []
+    if isinstance(uris, str):
+        uris = [uris]
+
+    options = pool_options(app.config)
+    replicas = []
+    for uri in uris:
+        engine = db.create_engine(uri)
+        if options is not None:
+            engine = PooledEngine.from_engine(engine, name=REPLICA_TAG, **options)
+        db.engines.register(engine, [READER_TAG, REPLICA_TAG])
+        replicas.append(engine)
+    return replicas
+
+
+class DatabaseRouter:
+    """Routes read-only requests to reader engines, with read-your-writes stickiness"""
+
+    def __init__(self, app=None, db=None):
+        self.app = app
+        self.db = db
+        self.sticky_seconds = 5.0
+        self.primary_paths = PRIMARY_PATHS
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        """Initialize with Flask app"""
+        self.app = app
+        self.db = db
+        self.sticky_seconds = float(app.config.get("DB_STICKY_SECONDS", 5))
+        self.primary_paths = tuple(app.config.get("DB_PRIMARY_PATHS", PRIMARY_PATHS))
+        app.before_request(self.route_request)
+        app.after_request(self.remember_write)
+        Session.after_commit.connect(self.on_commit, weak=False)
+
+    def _tagged(self, tag) -> List[Engine]:
+        return [engine for engine, tags in self.db.engines._engines if tag in tags]
+
+    @property
+    def readers(self) -> List[Engine]:
+        return self._tagged(READER_TAG)
+
+    @property
+    def has_replicas(self) -> bool:
+        return bool(self._tagged(REPLICA_TAG))
+
+    def is_sticky(self) -> bool:
+        """Whether the client wrote recently enough that replicas may not have caught up"""
+        return self.has_replicas and session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+    def select_engine(self) -> Optional[Engine]:
+        """Engine for the current request, None to stay on the primary"""
+        readers = self.readers
+        if not readers or request.method not in READ_METHODS:
+            return None
+        if request.path.startswith(self.primary_paths) or self.is_sticky():
+            return None
+        return random.choice(readers)
+
+    def route_request(self):
+        engine = self.select_engine()
+        if engine is not None:
+            use_engine(engine)
+
+    def pin_primary(self) -> bool:
+        """Move the current request to the primary (e.g. before reading rows it just wrote)"""
+        return use_engine(self.db.engine)
+
+    def on_commit(self, sess, **kwargs):
+        # The signal is process-wide: only handle commits made while serving this app
+        if not has_request_context() or current_app._get_current_object() is not self.app:
+            return
+        if not self.has_replicas or sess.engine in self.readers:
+            return
+        g.db_wrote = True
+        # Reads later in this request must see the write
+        self.pin_primary()
+
+    def remember_write(self, response):
+        if g.get("db_wrote") and self.sticky_seconds > 0:
+            session[STICKY_SESSION_KEY] = time.time() + self.sticky_seconds
+        return response
+
+
+# Global instance (initialized in app factory)
+db_router = DatabaseRouter()
@@ -0,0 +1,290 @@
+"""
+Fast database reset from a migrated, seeded template.
+
+Resetting by deleting rows and seeding through the models takes seconds and
+grows with the schema. Instead, a SQLite template database is built once
+(migrations + seed data) and copied over the working database on every reset:
+
+    database/snapshots/template-<key>.db  ->  database/test.db
+
+The key hashes the migrations folder, the models and the seed function, so
+the template is rebuilt when any of them changes (and daily, since seed
+timestamps are relative to the build day). The copy is a reflink on
+filesystems that support it (btrfs, XFS, APFS-like CoW), a plain file copy
+otherwise: a few milliseconds either way.
+
+PostgreSQL databases can't be swapped as files: the database is migrated and
+seeded once, then each test runs inside a transaction that is rolled back
+(app commits become SAVEPOINT releases, see savepoint_rollback()).
+
+Config:
+    db_snapshot_dir: database/snapshots   # default, relative to the project root
+
+Usage:
+    snapshot = DatabaseSnapshot(app, db)
+    snapshot.restore()              # SQLite: reset to the seeded template
+    with snapshot.reset():          # tests: SQLite restore or Postgres rollback
+        ...
+"""
+from typing import Optional, Callable, Iterable, List
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import glob
+import hashlib
+import inspect
+import os
+import random
+import shutil
+import sqlite3
+
+from sqlorm import Engine, migrate
+from sqlorm.engine import parse_uri
+
+
+SAVEPOINT = "db_snapshot"
+# Linux ioctl to share the source file's extents with the destination (copy-on-write clone)
+FICLONE = 0x40049409
+SQLITE_SIDECARS = ("-wal", "-shm", "-journal")
+
+
+def sqlite_path(uri: str) -> Optional[str]:
+    """File path of a sqlite:// URI, None for other databases and in-memory SQLite"""
+    module, args, _ = parse_uri(uri)
+    if module != "sqlite" or not args or args[0] == ":memory:":
+        return None
+    return args[0]
+
+
+def fingerprint(paths: Iterable[str], *extra: str) -> str:
+    """Short hash of the files (name and content) and extra strings"""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    for value in extra:
+        digest.update(value.encode())
+    return digest.hexdigest()[:16]
+
+
+def clone_file(src: str, dst: str) -> str:
+    """Copy src to dst, as a copy-on-write reflink when possible. Returns "reflink" or "copy"."""
+    try:
+        import fcntl
+        with open(src, "rb") as source, open(dst, "wb") as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        return "reflink"
+    except (ImportError, OSError):
+        shutil.copyfile(src, dst)
+        return "copy"
+
+
+def remove_sqlite_files(path: str):
+    """Delete a SQLite database and its WAL/shared-memory/journal files"""
+    for filename in (path, *(path + suffix for suffix in SQLITE_SIDECARS)):
+        if os.path.exists(filename):
+            os.remove(filename)
+
+
+def build_template(path: str, setup: Callable[[Engine], None]):
+    """
+    Create the SQLite database at path by running setup(engine) on an empty one.
+    The database is built under a temporary name and moved into place, so
+    concurrent builders (e.g. pytest-xdist workers) never see a partial template.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    remove_sqlite_files(tmp)
+    engine = Engine.from_uri(f"sqlite://{tmp}", fine_tune=True, foreign_keys=True)
+    try:
+        setup(engine)
+    finally:
+        # Closing the last connection checkpoints the WAL into the database file
+        engine.disconnect_all()
+    os.replace(tmp, path)
+    remove_sqlite_files(tmp)
+
+
+def restore_template(template: str, target: str) -> str:
+    """Replace the SQLite database at target with a copy of template. Connections to it must be closed."""
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    method = clone_file(template, tmp)
+    remove_sqlite_files(target)
+    os.replace(tmp, target)
+    return method
+
+
+class _SavepointConnection:
+    """DBAPI connection proxy turning commits and rollbacks into savepoint operations"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def _execute(self, *statements: str):
+        cursor = self._conn.cursor()
+        for stmt in statements:
+            cursor.execute(stmt)
+        cursor.close()
+
+    def commit(self):
+        self._execute(f"RELEASE SAVEPOINT {SAVEPOINT}", f"SAVEPOINT {SAVEPOINT}")
+
+    def rollback(self):
+        self._execute(f"ROLLBACK TO SAVEPOINT {SAVEPOINT}")
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def savepoint_rollback(engine: Engine):
+    """
+    Run everything inside the block on one connection, in a transaction rolled back at the end.
+
+    Sessions opened on the engine share the connection: commits release and
+    re-create a savepoint, rollbacks return to it, so the code under test
+    behaves as usual but nothing it writes outlives the block. Connections are
+    not thread-safe, so the block must not use the engine from other threads.
+    """
+    conn = engine.connect()
+    wrapped = _SavepointConnection(conn)
+    try:
+        if isinstance(conn, sqlite3.Connection):
+            # sqlite3 doesn't open transactions for SAVEPOINT: an outermost savepoint would commit on release
+            conn.execute("BEGIN")
+        wrapped._execute(f"SAVEPOINT {SAVEPOINT}")
+    except Exception:
+        engine.disconnect(conn)
+        raise
+
+    engine.connect = lambda from_pool=True: wrapped
+    engine.disconnect = lambda conn, force=False: None
+    try:
+        yield engine
+    finally:
+        del engine.connect
+        del engine.disconnect
+        conn.rollback()
+        engine.disconnect(conn)
+
+
+def seed_test_data(now: Optional[datetime] = None, seed: int = 0):
+    """Data of a fresh dev/test database: 3 users and 20 approved timeline entries from the past week"""
+    from app.models import User, TimelineEntry
+
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    users = [User.create(email=email) for email in ("user1@test.com", "user2@test.com", "admin@test.com")]
+
+    for i in range(20):
+        timestamp = now - timedelta(days=rng.randint(0, 7), hours=rng.randint(0, 23), minutes=rng.randint(0, 59))
+        user = rng.choice(users)
+        TimelineEntry.create(
+            user_id=user.id,
+            timestamp=timestamp,
+            status='approved',
+            caption=f"Timeline entry {i+1} from {user.email}",
+            photo_url=None
+        )
+    return users
+
+
+class DatabaseSnapshot:
+    """Builds and restores migrated, seeded template databases"""
+
+    def __init__(self, app=None, db=None):
+        self.app = None
+        self.db = None
+        self.directory = None
+        self.seed = seed_test_data
+        self._prepared = False
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        """Initialize with Flask app"""
+        self.app = app
+        self.db = db
+        self.directory = app.config.get("DB_SNAPSHOT_DIR") or os.path.join(
+            os.path.dirname(app.root_path), "database", "snapshots")
+
+    @property
+    def database_path(self) -> Optional[str]:
+        """Path of the app's SQLite database, None when it can't be snapshotted (Postgres, in-memory)"""
+        return sqlite_path(self.app.config.get("SQLORM_URI") or "")
+
+    def key(self, seeded: bool = True) -> str:
+        """Hash of everything the template's content depends on"""
+        migrations = [path for path in glob.glob(os.path.join(self.db.migrations_folder, "*"))
+                      if os.path.isfile(path)]
+        models = {inspect.getsourcefile(model) for model in self.db.Model.__model_registry__.values()}
+        seed = inspect.getsource(self.seed) if seeded else "empty"
+        return fingerprint([*migrations, *models], seed, datetime.utcnow().date().isoformat())
+
+    def template_path(self, seeded: bool = True) -> str:
+        return os.path.join(self.directory, f"template-{self.key(seeded)}.db")
+
+    def _populate(self, seeded: bool):
+        """Migrate the database of the current session (and seed it)"""
+        migrate(path=self.db.migrations_folder, logger=self.app.logger)
+        if seeded:
+            self.seed()
+
+    def build(self, seeded: bool = True, force: bool = False) -> str:
+        """Create the template database unless it's up to date. Returns its path."""
+        path = self.template_path(seeded)
+        if os.path.exists(path) and not force:
+            return path
+
+        def setup(engine):
+            with self.app.app_context(), engine:
+                self._populate(seeded)
+
+        build_template(path, setup)
+        self.prune()
+        return path
+
+    def prune(self) -> List[str]:
+        """Delete outdated templates (built for other migrations, models, seed or day)"""
+        current = {self.template_path(True), self.template_path(False)}
+        removed = []
+        for path in glob.glob(os.path.join(self.directory, "template-*.db")):
+            if path not in current:
+                remove_sqlite_files(path)
+                removed.append(path)
+        return removed
+
+    def restore(self, seeded: bool = True) -> str:
+        """Reset the app's SQLite database to the template (building it first if needed)"""
+        target = self.database_path
+        if not target:
+            raise RuntimeError("Snapshots require a SQLite database file (use savepoint_rollback() on Postgres)")
+        template = self.build(seeded)
+        self.db.engines.disconnect_all()
+        return restore_template(template, target)
+
+    def prepare(self):
+        """Migrate and seed a non-SQLite database once per process, if it's empty"""
+        if self._prepared:
+            return
+        from app.models import User
+        self.db.migrate()
+        with self.app.app_context(), self.db:
+            if not User.find_one():
+                self.seed()
+        self._prepared = True
+
+    @contextmanager
+    def reset(self):
+        """Give the block a freshly seeded database: a restored SQLite file, or a rolled-back Postgres transaction"""
+        if self.database_path:
+            self.restore()
+            yield
+            return
+        self.prepare()
+        with savepoint_rollback(self.db.engine):
+            yield
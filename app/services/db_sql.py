@@ -0,0 +1,68 @@
+"""
+Raw SQL helpers for sqlorm transactions.
+
+Services that write in bulk run plain SQL on `with db as tx:` transactions.
+Statements are written with ? markers and converted for the driver of the
+transaction (sqlite3 takes ?, psycopg %s), like benchmarks/dataset.py does.
+Raw rows aren't hydrated into models: SQLite returns timestamps and dates as
+ISO strings, to_datetime / to_date convert them for both drivers.
+
+Usage:
+    from app.services.db_sql import execute, executemany, placeholders
+    with db as tx:
+        deleted = execute(tx, "DELETE FROM cartitem WHERE id IN (%s)" % placeholders(3), [1, 2, 3])
+        updated = executemany(tx, 'UPDATE "user" SET subscription_tier = ? WHERE id = ?', rows)
+"""
+from typing import Any, Iterable, List, Sequence
+from datetime import date, datetime
+
+from sqlorm.engine import Transaction
+
+
+def sql(tx, stmt: str) -> str:
+    """stmt, written with ? markers, in the paramstyle of the transaction's driver"""
+    if "?" not in stmt or tx.session.engine.dbapi.paramstyle == "qmark":
+        return stmt
+    return stmt.replace("%", "%%").replace("?", "%s")
+
+
+def placeholders(count: int) -> str:
+    """"?, ?, ?" for an IN list of count values"""
+    return ", ".join(["?"] * count)
+
+
+def execute(tx, stmt: str, params: Sequence[Any] = ()) -> int:
+    """Execute a statement and return the number of affected rows"""
+    cursor = tx.cursor(sql(tx, stmt), list(params))
+    try:
+        return max(cursor.rowcount, 0)
+    finally:
+        cursor.close()
+
+
+def executemany(tx, stmt: str, rows: Iterable[Sequence[Any]]) -> int:
+    """tx.executemany() (so query listeners see it), returning the number of affected rows"""
+    counts: List[int] = []
+
+    def count(sender, cursor, **kwargs):
+        counts.append(cursor.rowcount)
+
+    with Transaction.after_execute.connected_to(count, sender=tx):
+        tx.executemany(sql(tx, stmt), list(rows))
+    return max(sum(counts), 0)
+
+
+def to_datetime(value) -> datetime:
+    """datetime from a raw column value (None stays None)"""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def to_date(value) -> date:
+    """date from a raw DATE or TIMESTAMP column value (None stays None)"""
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
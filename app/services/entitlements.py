@@ -0,0 +1,96 @@
+"""
+Subscription entitlements.
+
+Plans are mapped to integer tiers once, users carry a precomputed
+`subscription_tier` (written only by webhook processing) and products carry a
+`required_tier`, so "can this user buy product X" is an integer comparison and
+catalog pages can filter gated products in SQL.
+
+Tiers:
+    0 = no subscription, 1 = basic, 2 = pro, 3 = enterprise
+
+Price ids are mapped to plans from config (merged over the defaults below):
+    stripe_price_plans:
+      price_1Pxxx: pro
+"""
+from typing import Optional, Dict
+
+
+TIER_NONE = 0
+
+PLAN_TIERS = {
+    'basic': 1,
+    'pro': 2,
+    'enterprise': 3,
+}
+
+# Subscription statuses that grant access to the plan's tier
+ENTITLED_STATUSES = ('active', 'trialing')
+
+# Price ids used by the pricing page and test fixtures
+DEFAULT_PRICE_PLANS = {
+    'price_test_basic_monthly': 'basic',
+    'price_test_pro_monthly': 'pro',
+    'price_test_enterprise_monthly': 'enterprise',
+}
+
+
+def plan_tier(plan: Optional[str]) -> int:
+    """Tier required/granted by a plan name (0 for none/unknown)"""
+    if not plan:
+        return TIER_NONE
+    return PLAN_TIERS.get(plan.lower(), TIER_NONE)
+
+
+def subscription_tier(plan: Optional[str], status: Optional[str]) -> int:
+    """Effective tier for a plan in a given subscription status"""
+    if status not in ENTITLED_STATUSES:
+        return TIER_NONE
+    return plan_tier(plan)
+
+
+class Entitlements:
+    """
+    Resolves price ids to plans/tiers and answers purchase checks.
+
+    Usage:
+        from app.services.entitlements import entitlements
+        if entitlements.can_purchase(current_user, product):
+            ...
+    """
+
+    def __init__(self, app=None):
+        self.price_plans: Dict[str, str] = dict(DEFAULT_PRICE_PLANS)
+
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Load price id -> plan mapping from config"""
+        self.price_plans = dict(DEFAULT_PRICE_PLANS)
+        for price_id, plan in (app.config.get('STRIPE_PRICE_PLANS') or {}).items():
+            self.register_price(price_id, plan)
+
+    def register_price(self, price_id: str, plan: str):
+        """Map a Stripe price id to a plan name"""
+        self.price_plans[price_id] = plan.lower()
+
+    def plan_for_price(self, price_id: Optional[str]) -> Optional[str]:
+        """Plan name for a Stripe price id, or None if unknown"""
+        if not price_id:
+            return None
+        return self.price_plans.get(price_id)
+
+    def user_tier(self, user) -> int:
+        """Precomputed tier of a user (0 for anonymous users)"""
+        if not user or not getattr(user, 'is_authenticated', False):
+            return TIER_NONE
+        return user.subscription_tier or TIER_NONE
+
+    def can_purchase(self, user, product) -> bool:
+        """Whether the user's tier covers the product's required tier"""
+        return self.user_tier(user) >= (product.required_tier or TIER_NONE)
+
+
+# Global instance (initialized in app factory)
+entitlements = Entitlements()
@@ -0,0 +1,182 @@
+"""
+Streaming admin exports (CSV / JSONL).
+
+Rows are fetched YIELD_PER at a time (fetchmany) and encoded in small chunks
+by a generator, and the response is sent with chunked transfer encoding.
+On PostgreSQL the query runs in a named (server-side) cursor, so the result
+set stays on the server and memory is bounded by YIELD_PER. sqlite3 cursors
+step through the result as they are fetched.
+
+Datasets:
+    orders    one row per order item, joined with its order (orders without items included)
+    users     account and subscription fields (no password hashes)
+    timeline  timeline entries
+
+Date ranges filter the indexed timestamp column of each dataset
+(order.created_at, user.signup_at, timelineentry.timestamp).
+
+Usage:
+    from app.services.exports import stream_export
+    chunks = stream_export('orders', 'csv', start=date(2024, 1, 1), end=date(2024, 2, 1))
+"""
+from typing import Optional, Dict, Any, Iterator, List
+from datetime import date, datetime, timedelta
+import csv
+import io
+import json
+
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# Rows fetched per cursor round trip / encoded per yielded chunk
+YIELD_PER = 1000
+CHUNK_ROWS = 500
+
+
+# Per dataset: (output column, SQL expression) pairs, FROM clause,
+# indexed timestamp column for date ranges, ORDER BY
+DATASETS = {
+    'orders': (
+        [
+            ('order_id', '"order".id'),
+            ('order_number', '"order".order_number'),
+            ('user_id', '"order".user_id'),
+            ('status', '"order".status'),
+            ('total_amount', '"order".total_amount'),
+            ('stripe_payment_intent_id', '"order".stripe_payment_intent_id'),
+            ('stripe_payment_status', '"order".stripe_payment_status'),
+            ('created_at', '"order".created_at'),
+            ('order_item_id', 'orderitem.id'),
+            ('product_id', 'orderitem.product_id'),
+            ('product_name', 'orderitem.product_name'),
+            ('quantity', 'orderitem.quantity'),
+            ('price_at_purchase', 'orderitem.price_at_purchase'),
+        ],
+        '"order" LEFT OUTER JOIN orderitem ON orderitem.order_id = "order".id',
+        '"order".created_at',
+        '"order".created_at, "order".id, orderitem.id',
+    ),
+    'users': (
+        [(name, name) for name in (
+            'id', 'email', 'is_admin', 'signup_at', 'last_login_at', 'stripe_customer_id',
+            'subscription_status', 'subscription_plan', 'subscription_ends_at',
+        )],
+        '"user"',
+        'signup_at',
+        'signup_at, id',
+    ),
+    'timeline': (
+        [(name, name) for name in (
+            'id', 'user_id', 'timestamp', 'status', 'caption', 'photo_url', 'product_id', 'created_at',
+        )],
+        'timelineentry',
+        'timestamp',
+        'timestamp, id',
+    ),
+}
+
+
+def dataset_columns(dataset: str) -> List[str]:
+    """Column names of the rows of a dataset"""
+    return [name for name, _ in DATASETS[dataset][0]]
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    """Parse a YYYY-MM-DD query parameter (None if empty). Raises ValueError if malformed."""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def iter_rows(dataset: str, start: Optional[date] = None, end: Optional[date] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream rows of a dataset as dicts, oldest first.
+    `start` is inclusive, `end` is inclusive of the whole day.
+    """
+    from hyperflask.factory import db
+    from app.services.db_sql import sql
+    from app.services.query_plans import is_sqlite
+
+    columns, from_clause, timestamp_column, order_by = DATASETS[dataset]
+    select = ', '.join(f'{expr} AS "{name}"' for name, expr in columns)
+    where = []
+    params = []
+    if start:
+        where.append(f'{timestamp_column} >= ?')
+        params.append(datetime.combine(start, datetime.min.time()))
+    if end:
+        where.append(f'{timestamp_column} < ?')
+        params.append(datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    stmt = f'SELECT {select} FROM {from_clause}'
+    if where:
+        stmt += f' WHERE {" AND ".join(where)}'
+    stmt += f' ORDER BY {order_by}'
+
+    names = [name for name, _ in columns]
+    with db as tx:
+        if is_sqlite(tx):
+            cursor = tx.cursor(sql(tx, stmt), params)
+        else:
+            # psycopg client-side cursors load the whole result on execute
+            cursor = tx.session.connect().cursor(name=f'export_{dataset}')
+            cursor.itersize = YIELD_PER
+            cursor.execute(sql(tx, stmt), params)
+        try:
+            while True:
+                rows = cursor.fetchmany(YIELD_PER)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(names, row))
+        finally:
+            cursor.close()
+
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def stream_export(dataset: str, fmt: str, start: Optional[date] = None, end: Optional[date] = None) -> Iterator[str]:
+    """Encode a dataset as CSV or JSONL, yielding chunks of CHUNK_ROWS rows"""
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown export dataset: {dataset}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    buffer = io.StringIO()
+    writer = None
+    pending = 0
+
+    if fmt == 'csv':
+        # The header is written even when the dataset is empty
+        writer = csv.DictWriter(buffer, fieldnames=dataset_columns(dataset))
+        writer.writeheader()
+
+    for row in iter_rows(dataset, start, end):
+        if writer is not None:
+            writer.writerow({key: _jsonable(value) for key, value in row.items()})
+        else:
+            buffer.write(json.dumps({key: _jsonable(value) for key, value in row.items()}))
+            buffer.write('\n')
+
+        pending += 1
+        if pending >= CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_filename(dataset: str, fmt: str, start: Optional[date] = None, end: Optional[date] = None) -> str:
+    """e.g. orders_2024-01-01_2024-01-31.csv"""
+    parts = [dataset]
+    if start or end:
+        parts.append(start.isoformat() if start else 'start')
+        parts.append(end.isoformat() if end else datetime.utcnow().date().isoformat())
+    return f"{'_'.join(parts)}.{fmt}"
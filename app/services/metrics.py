@@ -0,0 +1,587 @@
+"""
+Prometheus metrics, served at /metrics in the text exposition format.
+
+Covers:
+    http_requests_total, http_request_duration_seconds     per page route
+    db_queries_total, db_query_duration_seconds             per statement type (from query_stats)
+    db_pool_*                                               pooled engines (see db_pool.py)
+    dramatiq_queue_messages, dramatiq_queue_oldest_seconds  tasks.db broker, read at scrape time
+    dramatiq_tasks_total, dramatiq_task_duration_seconds,
+    dramatiq_task_wait_seconds                              per actor, from a broker middleware
+    cache_requests_total, cache_hit_ratio                   plan catalog, query fingerprints
+    stripe_requests_total, stripe_request_duration_seconds,
+    stripe_errors_total                                     StripeService calls
+
+Hot path: counters and histograms are sharded per thread (each thread only
+ever writes its own dict), so recording takes no lock. Shards are summed
+when a snapshot is taken.
+
+Multiple processes: every process (web workers, dramatiq workers) writes its
+snapshot to <metrics_dir>/<pid>.json every metrics_flush_interval seconds.
+/metrics sums its own live values with the other processes' files. Counters
+of exited processes are kept so totals never go backwards; their gauges are
+dropped. Clear the directory when deploying (the default lives in the temp
+dir, which containers start with empty).
+
+Config:
+    metrics_enabled: true
+    metrics_dir: /tmp/app-metrics     # default: <tempdir>/<app name>-metrics
+    metrics_flush_interval: 5         # seconds
+    metrics_token: secret             # optional, required as "Authorization: Bearer <token>"
+
+Usage:
+    from app.services.metrics import metrics
+    metrics.cache_lookup('plan_catalog', hit=True)
+    with metrics.stripe_call('list_prices'):
+        ...
+"""
+from typing import Optional, Dict, Any, List, Iterable, Tuple, Callable
+from bisect import bisect_left
+from contextlib import contextmanager
+import atexit
+import glob
+import hmac
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from dramatiq import Middleware
+from flask import g, request
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+STATEMENT_TYPES = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+class _Metric:
+    """Base for sharded metrics: one dict per thread, summed on collect"""
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards: List[Dict[Tuple, Any]] = []
+
+    def _shard(self) -> Dict[Tuple, Any]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            self._shards.append(values)  # list.append is atomic, no lock needed
+            return values
+
+    def reset(self):
+        """Drop all values (also used in a forked child, which must not re-report its parent's)"""
+        self._local = threading.local()
+        self._shards = []
+
+    def family(self) -> Dict[str, Any]:
+        return {'type': self.type, 'help': self.help, 'labels': list(self.labels), 'samples': self.collect()}
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, labels: Tuple = (), amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def collect(self) -> List[List]:
+        totals: Dict[Tuple, float] = {}
+        for shard in list(self._shards):
+            for labels, value in dict(shard).items():
+                totals[labels] = totals.get(labels, 0) + value
+        return [[list(labels), value] for labels, value in totals.items()]
+
+
+class Histogram(_Metric):
+    """Samples are [per-bucket counts (not cumulative) ..., +Inf count, sum]"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, labels: Tuple = ()):
+        shard = self._shard()
+        row = shard.get(labels)
+        if row is None:
+            row = shard[labels] = [0] * (len(self.buckets) + 2)
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def collect(self) -> List[List]:
+        totals: Dict[Tuple, List[float]] = {}
+        for shard in list(self._shards):
+            for labels, row in dict(shard).items():
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = list(row)
+                else:
+                    for i, value in enumerate(row):
+                        total[i] += value
+        return [[list(labels), row] for labels, row in totals.items()]
+
+    def family(self) -> Dict[str, Any]:
+        return dict(super().family(), buckets=list(self.buckets))
+
+
+class MetricsRegistry:
+    """Named metrics plus collectors called at snapshot time"""
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+        # Per-process collectors go into the snapshot files and are summed across processes
+        self.collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, Any]]]]] = []
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def _register(self, metric: _Metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, Dict[str, Any]]]]):
+        """collector() yields (name, family) pairs, computed when a snapshot is taken"""
+        self.collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        families = {name: metric.family() for name, metric in self.metrics.items()}
+        for collector in self.collectors:
+            families.update(collector())
+        return families
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric.reset()
+
+
+def merge(snapshots: Iterable[Tuple[Dict[str, Dict[str, Any]], bool]]) -> Dict[str, Dict[str, Any]]:
+    """Sum (snapshot, process_alive) pairs by metric and labels; gauges of exited processes are skipped"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for families, alive in snapshots:
+        for name, family in families.items():
+            if family['type'] == 'gauge' and not alive:
+                continue
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = dict(family, samples={})
+            samples = target['samples']
+            for labels, value in family['samples']:
+                key = tuple(labels)
+                if key not in samples:
+                    samples[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    samples[key] = [a + b for a, b in zip(samples[key], value)]
+                else:
+                    samples[key] += value
+    for family in merged.values():
+        family['samples'] = [[list(labels), value] for labels, value in family['samples'].items()]
+    return merged
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _as_bool(value) -> bool:
+    """Config flag from YAML (a bool) or an environment variable ("1", "true", "yes", "on")"""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(families: Dict[str, Dict[str, Any]]) -> str:
+    """Prometheus text exposition format"""
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        labels = family['labels']
+        for values, value in sorted(family['samples'], key=lambda sample: [str(v) for v in sample[0]]):
+            if family['type'] != 'histogram':
+                lines.append(f"{name}{_format_labels(labels, values)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*family['buckets'], float("inf")], value[:-1]):
+                cumulative += count
+                le = _format_labels(labels, values, f'le="{_format_value(float(bound))}"')
+                lines.append(f"{name}_bucket{le} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels, values)} {_format_value(float(value[-1]))}")
+            lines.append(f"{name}_count{_format_labels(labels, values)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def statement_type(stmt) -> str:
+    """First keyword of a statement (SELECT, INSERT, ...), OTHER for anything else"""
+    words = str(stmt).split(None, 1)
+    verb = words[0].upper() if words else ""
+    return verb if verb in STATEMENT_TYPES else "OTHER"
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def queue_depth(broker_url: Optional[str]) -> Tuple[Dict[Tuple[str, str], int], Dict[str, float]]:
+    """
+    Messages per (queue, state) and age of the oldest queued message per queue,
+    read from a dramatiq-sqlite database (queued and consumed messages only).
+    """
+    if not broker_url or ("://" in broker_url and not broker_url.startswith("sqlite://")):
+        return {}, {}
+    # hyperflask strips the scheme from dramatiq_broker: sqlite://... URLs
+    path = broker_url[len("sqlite://"):] if broker_url.startswith("sqlite://") else broker_url
+    if not os.path.exists(path):
+        return {}, {}
+
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=1)
+    try:
+        rows = conn.execute(
+            "SELECT queue_name, state, COUNT(*), MIN(mtime) FROM dramatiq_messages"
+            " WHERE state IN ('queued', 'consumed') GROUP BY queue_name, state"
+        ).fetchall()
+    except sqlite3.Error:
+        return {}, {}
+    finally:
+        conn.close()
+
+    now = time.time()
+    depth = {(queue, state): count for queue, state, count, _ in rows}
+    oldest = {queue: max(now - mtime, 0.0) for queue, state, _, mtime in rows if state == 'queued'}
+    return depth, oldest
+
+
+class Metrics:
+    """
+    Application metrics and the /metrics exposition.
+
+    Usage:
+        metrics.init_app(app)
+        text = metrics.render()
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.directory: Optional[str] = None
+        self.flush_interval = 5.0
+        self.token: Optional[str] = None
+        self.broker_url: Optional[str] = None
+        self.broker = None
+        self.engines: Callable[[], List[Dict[str, Any]]] = lambda: []
+        self._flusher: Optional[threading.Thread] = None
+        self._task_starts: Dict[str, float] = {}
+
+        self.registry = registry = MetricsRegistry()
+        self.requests = registry.counter(
+            "http_requests_total", "HTTP requests by page route, method and status", ("route", "method", "status"))
+        self.request_duration = registry.histogram(
+            "http_request_duration_seconds", "HTTP request latency by page route", ("route",))
+        self.queries = registry.counter(
+            "db_queries_total", "SQL statements executed by statement type", ("type",))
+        self.query_duration = registry.histogram(
+            "db_query_duration_seconds", "SQL statement latency by statement type", ("type",), QUERY_BUCKETS)
+        self.tasks = registry.counter(
+            "dramatiq_tasks_total", "Processed dramatiq messages by actor and outcome", ("actor", "queue", "outcome"))
+        self.task_duration = registry.histogram(
+            "dramatiq_task_duration_seconds", "Dramatiq actor run time", ("actor", "queue"), TASK_BUCKETS)
+        self.task_wait = registry.histogram(
+            "dramatiq_task_wait_seconds", "Time from enqueue (or eta) to processing", ("actor", "queue"), TASK_BUCKETS)
+        self.cache_requests = registry.counter(
+            "cache_requests_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result"))
+        self.stripe_requests = registry.counter(
+            "stripe_requests_total", "Outbound Stripe calls by operation", ("operation",))
+        self.stripe_duration = registry.histogram(
+            "stripe_request_duration_seconds", "Outbound Stripe call latency by operation", ("operation",))
+        self.stripe_errors = registry.counter(
+            "stripe_errors_total", "Failed Stripe calls by operation and error", ("operation", "error"))
+        registry.add_collector(self._collect_pools)
+        registry.add_collector(self._collect_lru_caches)
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, db=None):
+        """Initialize with Flask app"""
+        from app.services.query_stats import add_listener
+
+        self.app = app
+        self.enabled = _as_bool(app.config.get("METRICS_ENABLED", True))
+        if not self.enabled:
+            return
+
+        self.directory = app.config.get("METRICS_DIR") or os.path.join(
+            tempfile.gettempdir(), f"{app.name}-metrics")
+        self.flush_interval = float(app.config.get("METRICS_FLUSH_INTERVAL", 5))
+        self.token = app.config.get("METRICS_TOKEN")
+
+        if db is not None:
+            from app.services.db_pool import get_pool_stats
+            self.engines = lambda: get_pool_stats(db)
+
+        app.before_request(self.start_request)
+        app.after_request(self.end_request)
+        add_listener(self.record_query)
+
+        broker = getattr(app, "dramatiq_broker", None)
+        if broker is not None:
+            self.broker = broker
+            self.broker_url = getattr(broker, "db_url", None)
+            broker.add_middleware(TaskMetricsMiddleware(self))
+
+        if self.directory and self.flush_interval > 0:
+            os.makedirs(self.directory, exist_ok=True)
+            self._start_flusher()
+
+    # Recording (hot path, no locks)
+
+    def start_request(self):
+        from app.services.server_timing import ENVIRON_KEY
+        g.metrics_start = request.environ.get(ENVIRON_KEY) or time.perf_counter()
+
+    def end_request(self, response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else "<unmatched>"
+            self.requests.inc((route, request.method, str(response.status_code)))
+            self.request_duration.observe(time.perf_counter() - start, (route,))
+        return response
+
+    def record_query(self, stmt, seconds: float):
+        kind = statement_type(stmt)
+        self.queries.inc((kind,))
+        self.query_duration.observe(seconds, (kind,))
+
+    def cache_lookup(self, cache: str, hit: bool):
+        self.cache_requests.inc((cache, "hit" if hit else "miss"))
+
+    @contextmanager
+    def stripe_call(self, operation: str):
+        """Time an outbound Stripe call and count its errors"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.stripe_errors.inc((operation, type(e).__name__))
+            raise
+        finally:
+            self.stripe_requests.inc((operation,))
+            self.stripe_duration.observe(time.perf_counter() - start, (operation,))
+
+    # Per-process collectors
+
+    def _collect_pools(self):
+        pools = self.engines()
+        if not pools:
+            return
+
+        def family(type, help, labels, samples, **extra):
+            return {'type': type, 'help': help, 'labels': labels, 'samples': samples, **extra}
+
+        yield "db_pool_connections", family("gauge", "Pooled connections by state", ["pool", "state"], [
+            [[p['pool'], state], p[state]] for p in pools for state in ("in_use", "idle")])
+        yield "db_pool_max_connections", family("gauge", "Pool max_size", ["pool"], [
+            [[p['pool']], p['max_size']] for p in pools])
+        yield "db_pool_waiting", family("gauge", "Threads waiting for a connection", ["pool"], [
+            [[p['pool']], p['waiting']] for p in pools])
+        yield "db_pool_timeouts_total", family("counter", "Acquires that timed out", ["pool"], [
+            [[p['pool']], p['timeouts']] for p in pools])
+
+        samples = []
+        for p in pools:
+            cumulative = list(p['acquire_buckets'].values())
+            counts = [b - a for a, b in zip([0, *cumulative], cumulative)]
+            samples.append([[p['pool']], [*counts, p['acquire_seconds_total']]])
+        bounds = [float(bound) for bound in pools[0]['acquire_buckets'] if bound != '+Inf']
+        yield "db_pool_acquire_seconds", family("histogram", "Connection acquire latency", ["pool"], samples,
+                                                buckets=bounds)
+
+    def _collect_lru_caches(self):
+        from app.services.query_stats import _fingerprint
+
+        info = _fingerprint.cache_info()
+        yield "cache_lru_requests_total", {
+            'type': 'counter', 'help': 'In-process LRU cache lookups by cache and result',
+            'labels': ['cache', 'result'],
+            'samples': [[['query_fingerprint', 'hit'], info.hits], [['query_fingerprint', 'miss'], info.misses]],
+        }
+
+    # Scrape-time collectors (shared state, not summed across processes)
+
+    def _collect_queues(self):
+        if hasattr(self.broker, "queue_depth"):
+            # Brokers outside tasks.db (PostgresBroker) report their own depth
+            depth, oldest = self.broker.queue_depth()
+        else:
+            depth, oldest = queue_depth(self.broker_url)
+        yield "dramatiq_queue_messages", {
+            'type': 'gauge', 'help': 'Messages in the broker by queue and state (queued/consumed)',
+            'labels': ['queue', 'state'],
+            'samples': [[[queue, state], count] for (queue, state), count in depth.items()],
+        }
+        yield "dramatiq_queue_oldest_seconds", {
+            'type': 'gauge', 'help': 'Age of the oldest queued message', 'labels': ['queue'],
+            'samples': [[[queue], age] for queue, age in oldest.items()],
+        }
+
+    def _cache_ratios(self, families: Dict[str, Dict[str, Any]]):
+        lookups: Dict[str, Dict[str, float]] = {}
+        for name in ("cache_requests_total", "cache_lru_requests_total"):
+            for (cache, result), value in families.get(name, {}).get('samples', []):
+                lookups.setdefault(cache, {}).setdefault(result, 0)
+                lookups[cache][result] += value
+        families["cache_hit_ratio"] = {
+            'type': 'gauge', 'help': 'Cache hits / lookups since the processes started', 'labels': ['cache'],
+            'samples': [[[cache], counts.get('hit', 0) / sum(counts.values())]
+                        for cache, counts in lookups.items() if sum(counts.values())],
+        }
+
+    # Cross-process aggregation
+
+    def _path(self, pid: Optional[int] = None) -> str:
+        return os.path.join(self.directory, f"{pid or os.getpid()}.json")
+
+    def flush(self):
+        """Write this process' snapshot for the other processes' /metrics"""
+        if not self.directory:
+            return
+        path = self._path()
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.registry.snapshot(), f)
+        os.replace(tmp, path)
+
+    def _start_flusher(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(self.flush_interval)
+                try:
+                    self.flush()
+                except Exception as e:
+                    if self.app:
+                        self.app.logger.warning(f"Metrics flush failed: {e}")
+
+        self._flusher = threading.Thread(target=run, name="metrics-flush", daemon=True)
+        self._flusher.start()
+
+    def _after_fork(self):
+        # Values recorded before the fork belong to the parent's file
+        self.registry.reset()
+        self._task_starts = {}
+        self._flusher = None
+        if self.enabled and self.directory and self.flush_interval > 0:
+            self._start_flusher()
+
+    def _other_processes(self) -> Iterable[Tuple[Dict[str, Dict[str, Any]], bool]]:
+        if not self.directory:
+            return
+        own = os.getpid()
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                pid = int(os.path.basename(path)[:-len(".json")])
+            except ValueError:
+                continue
+            if pid == own:
+                continue
+            try:
+                with open(path) as f:
+                    yield json.load(f), _process_alive(pid)
+            except (OSError, ValueError):
+                continue  # being replaced or truncated, picked up on the next scrape
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """Metric families summed across processes, plus broker queue depth"""
+        families = merge([(self.registry.snapshot(), True), *self._other_processes()])
+        families.update(self._collect_queues())
+        self._cache_ratios(families)
+        return families
+
+    def render(self) -> str:
+        return render(self.collect())
+
+    def authorized(self, req) -> bool:
+        """Check the bearer token when metrics_token is set"""
+        if not self.token:
+            return True
+        header = req.headers.get("Authorization", "")
+        return hmac.compare_digest(header, f"Bearer {self.token}")
+
+
+class TaskMetricsMiddleware(Middleware):
+    """Dramatiq middleware recording per-actor run time, queue wait and outcome"""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    def before_process_message(self, broker, message):
+        now = time.time()
+        ready_at = message.options.get("eta", message.message_timestamp) / 1000
+        labels = (message.actor_name, message.queue_name)
+        self.metrics.task_wait.observe(max(now - ready_at, 0.0), labels)
+        self.metrics._task_starts[message.message_id] = time.perf_counter()
+
+    def after_process_message(self, broker, message, *, result=None, exception=None):
+        start = self.metrics._task_starts.pop(message.message_id, None)
+        labels = (message.actor_name, message.queue_name)
+        self.metrics.tasks.inc((*labels, "failed" if exception is not None else "done"))
+        if start is not None:
+            self.metrics.task_duration.observe(time.perf_counter() - start, labels)
+
+    def after_skip_message(self, broker, message):
+        self.metrics._task_starts.pop(message.message_id, None)
+        self.metrics.tasks.inc((message.actor_name, message.queue_name, "skipped"))
+
+
+# Global instance (initialized in app factory)
+metrics = Metrics()
+
+
+
+@atexit.register
+def _flush_at_exit():
+    if metrics.enabled:
+        metrics.flush()
+
+
+os.register_at_fork(after_in_child=metrics._after_fork)
@@ -0,0 +1,256 @@
+"""
+On-disk compile cache for .jpy pages and templates.
+
+Nothing from app/pages is ever written to __pycache__: jinjapy's loader
+rebuilds the frontmatter source from the .jpy file and compiles it again on
+every runpy.run_module call (each page request), and every worker process
+parses and compiles each Jinja template (page bodies, layout.html) the first
+time it renders it. On a fresh container that is hundreds of milliseconds of
+compilation spread over the first requests.
+
+Two caches under page_cache_dir fix this:
+
+- frontmatter code objects, marshalled to <sha256 of path + source>.<python tag>.pyc.
+  A changed page has a new hash, so stale entries are never loaded; code
+  objects are also kept in memory, so repeated requests don't even unmarshal.
+- Jinja bytecode, through a FileSystemBytecodeCache on app.jinja_env. Jinja
+  keys it by template name and checks a source checksum on load.
+
+`hyperflask warm-page-cache` compiles every page and app/templates file into
+the cache; the Dockerfile runs it right after `hyperflask build` and copies
+the cache into the runtime image. Pages that don't compile are reported and
+skipped, they fail at request time as they would without the cache. Writes
+that fail (read-only filesystem) are ignored, the page is then compiled in
+memory as before.
+
+Config:
+    page_cache: true
+    page_cache_dir: .cache/pages    # relative to the project root
+"""
+from typing import Optional, Dict, Any, List, Tuple
+import hashlib
+import importlib.util
+import marshal
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from jinja2 import FileSystemBytecodeCache, TemplateSyntaxError
+from jinjapy import JinjapyPackageFinder, JinjapyFileLoader
+
+
+DEFAULT_DIR = os.path.join(".cache", "pages")
+
+
+def _write_atomic(path: str, data: bytes):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class CodeCache:
+    """Compiled code objects keyed by a hash of the filename and source"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.tag = sys.implementation.cache_tag
+        self._memory: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(filename: str, source: str) -> str:
+        # The filename is part of the key: it is baked into the code object (tracebacks)
+        return hashlib.sha256(f"{filename}\0{source}".encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.{self.tag}.pyc")
+
+    def load(self, key: str):
+        try:
+            with open(self.path(key), "rb") as f:
+                return marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+    def store(self, key: str, code) -> bool:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            _write_atomic(self.path(key), marshal.dumps(code))
+            return True
+        except OSError:
+            return False
+
+    def compile(self, source: str, filename: str):
+        """Code object for source, from memory, disk or a fresh compile (then stored)"""
+        key = self.key(filename, source)
+        code = self._memory.get(key)
+        if code is not None:
+            return code
+        code = self.load(key)
+        with self._lock:
+            if code is None:
+                self.misses += 1
+                code = compile(source, filename, "exec", dont_inherit=True)
+                self.store(key, code)
+            else:
+                self.hits += 1
+            self._memory[key] = code
+        return code
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"directory": self.directory, "in_memory": len(self._memory), "hits": self.hits, "misses": self.misses}
+
+
+def list_pages(finder: JinjapyPackageFinder) -> List[Tuple[str, str]]:
+    """(module name, template name) of every .jpy page in a jinjapy package"""
+    pages = []
+    for root, dirs, files in os.walk(finder.path):
+        dirs[:] = [d for d in dirs if d != "__pycache__"]
+        for filename in sorted(files):
+            name, _, ext = filename.rpartition(".")
+            if ext in finder.file_exts:
+                relname = os.path.relpath(os.path.join(root, name), finder.path)
+                pages.append((f"{finder.package_name}.{relname.replace(os.sep, '.')}",
+                              f"{finder.template_prefix or ''}{relname}.{ext}"))
+    return pages
+
+
+class CachedFileLoader(JinjapyFileLoader):
+    """jinjapy page loader compiling the frontmatter through a CodeCache"""
+
+    def __init__(self, fullname, filename, template, cache: CodeCache):
+        super().__init__(fullname, filename, template)
+        self.cache = cache
+
+    def get_code(self, fullname):
+        return self.cache.compile(self.get_data(self.filename), self.filename)
+
+
+class CachedPackageFinder(JinjapyPackageFinder):
+    """JinjapyPackageFinder handing out CachedFileLoader for .jpy modules"""
+
+    def __init__(self, finder: JinjapyPackageFinder, cache: CodeCache):
+        super().__init__(finder.package_name, finder.path, finder.template_prefix,
+                         finder.file_exts, finder.name_generator)
+        self.cache = cache
+
+    def find_spec(self, fullname, path, target=None):
+        spec = super().find_spec(fullname, path, target)
+        if spec is not None and type(spec.loader) is JinjapyFileLoader:
+            loader = spec.loader
+            spec.loader = CachedFileLoader(loader.fullname, loader.filename, loader.template, self.cache)
+        return spec
+
+
+class PageBytecodeCache(FileSystemBytecodeCache):
+    """FileSystemBytecodeCache that keeps rendering when the cache can't be written"""
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
+class PageCache:
+    """Installs the frontmatter and Jinja bytecode caches, and warms them"""
+
+    def __init__(self, app=None):
+        self.directory: Optional[str] = None
+        self.code_cache: Optional[CodeCache] = None
+        self.finders: List[JinjapyPackageFinder] = []
+        self.app = None
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize with Flask app"""
+        self.app = app
+        app.cli.command("warm-page-cache")(self._warm_command)
+        # Finders registered by flask-file-routes (and components) for packages of this app
+        root = os.path.join(os.path.abspath(app.root_path), "")
+        self.finders = [finder for finder in sys.meta_path
+                        if isinstance(finder, JinjapyPackageFinder) and os.path.abspath(finder.path).startswith(root)]
+        if not app.config.get("PAGE_CACHE", True):
+            return
+
+        self.directory = os.path.join(os.path.dirname(app.root_path), app.config.get("PAGE_CACHE_DIR", DEFAULT_DIR))
+        jinja_dir = os.path.join(self.directory, "jinja")
+        try:
+            os.makedirs(jinja_dir, exist_ok=True)
+        except OSError:
+            pass
+        if os.path.isdir(jinja_dir):
+            app.jinja_env.bytecode_cache = PageBytecodeCache(jinja_dir)
+
+        self.code_cache = CodeCache(self.directory)
+        for i, finder in enumerate(self.finders):
+            self.finders[i] = CachedPackageFinder(finder, self.code_cache)
+            sys.meta_path[sys.meta_path.index(finder)] = self.finders[i]
+
+    def pages(self) -> List[Tuple[str, str]]:
+        """(module name, template name) of every page of the app"""
+        return [page for finder in self.finders for page in list_pages(finder)]
+
+    def warm(self) -> Dict[str, Any]:
+        """
+        Compile every page frontmatter (into the cache) and every page and
+        app template (into the bytecode cache and the Jinja environment)
+        """
+        start = time.perf_counter()
+        errors: List[str] = []
+        pages = self.pages()
+        modules = [module_name for module_name, _ in pages] if self.code_cache is not None else []
+        for module_name in modules:
+            spec = importlib.util.find_spec(module_name)
+            try:
+                spec.loader.get_code(module_name)
+            except SyntaxError as e:
+                errors.append(f"{module_name}: {e}")
+
+        env = self.app.jinja_env
+        templates = [template for _, template in pages]
+        if self.app.jinja_loader:
+            templates.extend(self.app.jinja_loader.list_templates())
+        for name in templates:
+            try:
+                env.get_template(name)
+            except TemplateSyntaxError as e:
+                errors.append(f"{name}: {e}")
+
+        return {
+            "modules": len(modules),
+            "templates": len(templates),
+            "errors": errors,
+            "directory": self.directory,
+            "elapsed_seconds": time.perf_counter() - start,
+        }
+
+    def _warm_command(self):
+        """Compile pages and templates into the page cache"""
+        if self.code_cache is None:
+            print("Page cache is disabled (page_cache: false)")
+            return
+        stats = self.warm()
+        print(f"✓ Cached {stats['modules']} page modules and {stats['templates']} templates "
+              f"in {stats['directory']} ({stats['elapsed_seconds'] * 1000:.0f}ms)")
+        for error in stats["errors"]:
+            print(f"⚠️  Not cached, {error}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        if self.code_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.code_cache.get_stats()}
+
+
+# Global instance (initialized in app factory)
+page_cache = PageCache()
@@ -0,0 +1,195 @@
+"""
+Subscription plan catalog synced from Stripe prices.
+
+A periodiq job (app/cron.py) fetches active recurring prices with their
+products from Stripe (or the mock) and stores them in the `plan` table.
+Each process keeps the catalog in memory with a price_id -> plan index and
+reloads it from the table when it is older than `plan_catalog_ttl`, so the
+pricing page and webhook processing never call Stripe per request.
+
+Plan metadata comes from the Stripe product:
+    metadata.plan         plan name used for entitlements (defaults to the lowercased product name)
+    metadata.highlighted  "true" to mark the plan as most popular
+    marketing_features    feature list shown on the pricing page
+
+Config:
+    plan_catalog_ttl: 60                  # seconds before a process reloads the table
+    plan_catalog_sync_cron: "*/15 * * * *"
+"""
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import datetime
+import threading
+import time
+
+from app.services.entitlements import entitlements
+from app.services.metrics import metrics
+from app.services.stripe_service import stripe_service
+
+
+CURRENCY_SYMBOLS = {'usd': '$', 'eur': '€', 'gbp': '£'}
+
+
+def format_amount(amount: int, currency: str) -> str:
+    """Display price, e.g. 900 usd -> "$9", 950 eur -> "€9.50" """
+    value = f"{amount // 100}" if amount % 100 == 0 else f"{amount / 100:.2f}"
+    symbol = CURRENCY_SYMBOLS.get(currency.lower())
+    return f"{symbol}{value}" if symbol else f"{value} {currency.upper()}"
+
+
+def plan_from_price(price: Dict[str, Any]) -> Dict[str, Any]:
+    """Plan row values from a Stripe price with its product expanded"""
+    product = price['product']
+    metadata = product.get('metadata') or {}
+    recurring = price.get('recurring') or {}
+    interval = recurring.get('interval', 'month')
+    if (recurring.get('interval_count') or 1) > 1:
+        interval = f"{recurring['interval_count']} {interval}s"
+
+    return {
+        'price_id': price['id'],
+        'plan': (metadata.get('plan') or product['name']).lower(),
+        'name': product['name'],
+        'amount': price.get('unit_amount') or 0,
+        'currency': price.get('currency', 'usd'),
+        'interval': interval,
+        'features': '\n'.join(f['name'] for f in product.get('marketing_features') or []),
+        'highlighted': str(metadata.get('highlighted', '')).lower() == 'true',
+    }
+
+
+def _catalog_entry(row) -> Dict[str, Any]:
+    """In-memory plan dict, shaped for the pricing page"""
+    return {
+        'price_id': row.price_id,
+        'plan': row.plan,
+        'name': row.name,
+        'amount': row.amount,
+        'price': format_amount(row.amount, row.currency),
+        'period': row.interval,
+        'features': row.features.splitlines() if row.features else [],
+        'highlighted': bool(row.highlighted),
+    }
+
+
+class PlanCatalog:
+    """
+    In-memory plan catalog backed by the `plan` table.
+
+    Usage:
+        from app.services.plan_catalog import plan_catalog
+        plans = plan_catalog.plans                  # ordered by price, for the pricing page
+        plan = plan_catalog.get('price_1Pxxx')      # O(1) lookup
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        self.ttl = 60
+        # (ordered plans, price_id index) swapped as a single reference
+        self._catalog: Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]] = ([], {})
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read TTL from config and drop any cached catalog"""
+        self.app = app
+        self.ttl = float(app.config.get('PLAN_CATALOG_TTL', 60))
+        self._catalog = ([], {})
+        self._loaded_at = None
+
+    def sync(self) -> int:
+        """
+        Fetch active prices from Stripe and upsert them into the plan table.
+        Prices no longer returned by Stripe are deactivated. Returns the number of active plans.
+        """
+        from hyperflask.factory import db
+        from app.models import Plan
+
+        prices = stripe_service.list_prices()
+        now = datetime.utcnow()
+        seen = set()
+
+        with db:
+            existing = {row.price_id: row for row in Plan.find_all()}
+            for price in prices:
+                values = plan_from_price(price)
+                seen.add(values['price_id'])
+                row = existing.get(values['price_id'])
+                if row:
+                    for key, value in values.items():
+                        setattr(row, key, value)
+                    row.is_active = True
+                    row.synced_at = now
+                    row.save()
+                else:
+                    Plan.create(is_active=True, synced_at=now, **values)
+            for price_id, row in existing.items():
+                if price_id not in seen and row.is_active:
+                    row.is_active = False
+                    row.save()
+
+        self.load()
+        return len(seen)
+
+    def load(self):
+        """(Re)load the catalog from the plan table and register prices for entitlements"""
+        from app.models import Plan
+
+        rows = Plan.find_all(is_active=True, order_by='amount')
+        plans = [_catalog_entry(row) for row in rows]
+        index = {plan['price_id']: plan for plan in plans}
+
+        for plan in plans:
+            entitlements.register_price(plan['price_id'], plan['plan'])
+
+        self._catalog = (plans, index)
+        self._loaded_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+            metrics.cache_lookup('plan_catalog', hit=True)
+            return
+        # One reload per process per TTL; other threads keep serving the old catalog
+        if not self._lock.acquire(blocking=self._loaded_at is None):
+            metrics.cache_lookup('plan_catalog', hit=True)
+            return
+        try:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+                metrics.cache_lookup('plan_catalog', hit=False)
+                self.load()
+                if not self._catalog[0] and stripe_service.is_enabled():
+                    # Empty table (fresh install): sync once instead of showing no plans
+                    try:
+                        self.sync()
+                    except Exception as e:
+                        if self.app:
+                            self.app.logger.warning(f"Plan catalog sync failed: {e}")
+        finally:
+            self._lock.release()
+
+    @property
+    def plans(self) -> List[Dict[str, Any]]:
+        """Active plans ordered by price"""
+        self._ensure_fresh()
+        return self._catalog[0]
+
+    def get(self, price_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Plan for a Stripe price id, or None if unknown"""
+        if not price_id:
+            return None
+        self._ensure_fresh()
+        return self._catalog[1].get(price_id)
+
+    def plan_for_price(self, price_id: Optional[str]) -> Optional[str]:
+        """
+        Plan name for a Stripe price id, or None if unknown.
+        Falls back to the config mapping for prices no longer in the catalog.
+        """
+        plan = self.get(price_id)
+        return plan['plan'] if plan else entitlements.plan_for_price(price_id)
+
+
+# Global instance (initialized in app factory)
+plan_catalog = PlanCatalog()
@@ -0,0 +1,83 @@
+"""
+Query plan inspection.
+
+Runs EXPLAIN on a statement and reports tables read with a full scan:
+- SQLite: `SCAN <table>` without an index in EXPLAIN QUERY PLAN. An index
+  walk (`SCAN <table> USING INDEX ...`) is accepted when the statement has a
+  LIMIT, since it stops after a few rows.
+- PostgreSQL: `Seq Scan` nodes in EXPLAIN (FORMAT JSON). Sequential scans are
+  disabled for the EXPLAIN, so on small (test) tables the planner still
+  picks an index whenever one can serve the query.
+
+Used by tests/test_query_plans.py to keep hot queries on their indexes.
+
+Usage:
+    from app.services.query_plans import explain, full_scans
+    plan = explain(tx, "SELECT * FROM product WHERE is_active = ?", [True])
+    assert not full_scans(plan)
+"""
+from typing import Any, Dict, Iterable, List, Optional
+import json
+import re
+
+
+SQLITE_SCAN = re.compile(r"^SCAN (?P<table>[^\s(]\S*)(?P<rest>.*)$")
+HAS_LIMIT = re.compile(r"\bLIMIT\b", re.I)
+
+
+def is_sqlite(tx) -> bool:
+    return tx.session.engine.dbapi.__name__.endswith("sqlite")
+
+
+def explain(tx, stmt: str, params: Optional[Iterable[Any]] = None) -> Dict[str, Any]:
+    """Plan of a statement: {'dialect', 'stmt', 'nodes'} with one node per table access"""
+    stmt = str(stmt)
+    if is_sqlite(tx):
+        rows = tx.fetchall(f"EXPLAIN QUERY PLAN {stmt}", params)
+        nodes = [{'detail': row[3]} for row in rows]
+        return {'dialect': 'sqlite', 'stmt': stmt, 'nodes': nodes}
+
+    tx.execute("SET LOCAL enable_seqscan = off")
+    plan = tx.fetchscalar(f"EXPLAIN (FORMAT JSON) {stmt}", params)
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return {'dialect': 'postgresql', 'stmt': stmt, 'nodes': list(_walk_pg_plan(plan[0]['Plan']))}
+
+
+def _walk_pg_plan(node):
+    yield {'detail': node.get('Node Type'), 'table': node.get('Relation Name'),
+           'index': node.get('Index Name')}
+    for child in node.get('Plans', []):
+        yield from _walk_pg_plan(child)
+
+
+def full_scans(plan: Dict[str, Any], allow: Iterable[str] = ()) -> List[str]:
+    """Tables read with a full scan (tables in `allow` are ignored)"""
+    allow = set(allow)
+    scans = []
+    for node in plan['nodes']:
+        if plan['dialect'] == 'sqlite':
+            m = SQLITE_SCAN.match(node['detail'])
+            if not m:
+                continue
+            table, rest = m.group('table'), m.group('rest')
+            if 'USING' in rest and (HAS_LIMIT.search(plan['stmt']) or 'COVERING INDEX' in rest):
+                continue
+        else:
+            if node['detail'] != 'Seq Scan':
+                continue
+            table = node['table']
+        if table not in allow:
+            scans.append(table)
+    return scans
+
+
+def uses_index(plan: Dict[str, Any], index: str) -> bool:
+    """Whether the plan reads through `index`"""
+    for node in plan['nodes']:
+        if plan['dialect'] == 'sqlite':
+            if re.search(rf"\b(INDEX|USING) {re.escape(index)}\b", node['detail']):
+                return True
+        elif node.get('index') == index:
+            return True
+    return False
@@ -0,0 +1,225 @@
+"""
+Per-request SQL statistics and N+1 detection.
+
+Every statement executed through sqlorm (Transaction.before_execute /
+after_execute signals) is counted, timed and reduced to a fingerprint: the
+statement with literals, placeholders and IN lists normalized, so queries
+that differ only in their parameters share one shape. A SELECT shape
+repeated n_plus_one_threshold times or more in a request is reported as a
+likely N+1 (a query in a loop, e.g. `entry.user` in a template).
+
+Each request gets a one-line summary in the log (a warning when an N+1 is
+detected or the request exceeds query_budget) and, when enabled, a header:
+    X-DB-Queries: count=12; time_ms=4.1; repeated=SELECT ... FROM product WHERE id = ? (x8)
+
+Config:
+    query_stats_header: true          # default: debug mode only
+    query_n_plus_one_threshold: 5
+    query_budget: 30                  # warn above this many statements per request
+
+Tests declare per-page budgets with query_budget():
+    with query_budget(8):
+        client.get('/shop')
+"""
+from typing import Callable, Optional, List, Tuple
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+import re
+import threading
+import time
+
+from flask import g
+from sqlorm.engine import Transaction
+
+
+N_PLUS_ONE_THRESHOLD = 5
+HEADER = "X-DB-Queries"
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|:\w+|\$\d+|\?")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.I)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(stmt) -> str:
+    """Statement shape: literals and placeholders become ?, IN lists collapse, whitespace is squashed"""
+    return _fingerprint(str(stmt))
+
+
+@lru_cache(maxsize=4096)
+def _fingerprint(stmt: str) -> str:
+    # Parametrized statements repeat verbatim, so most lookups are cache hits
+    shape = _STRING.sub("?", stmt)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("IN (...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryCollector:
+    """Statements executed while the collector is active"""
+
+    def __init__(self, n_plus_one_threshold: int = N_PLUS_ONE_THRESHOLD):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, stmt, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[fingerprint(stmt)] += 1
+
+    @property
+    def repeated(self) -> List[Tuple[str, int]]:
+        """SELECT shapes run at least n_plus_one_threshold times, most frequent first"""
+        return [
+            (shape, count) for shape, count in self.shapes.most_common()
+            if count >= self.n_plus_one_threshold and shape.upper().startswith(("SELECT", "WITH"))
+        ]
+
+    def summary(self) -> str:
+        parts = [f"count={self.count}", f"time_ms={self.seconds * 1000:.1f}"]
+        parts.extend(f"repeated={shape} (x{count})" for shape, count in self.repeated)
+        return "; ".join(parts)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """More statements ran than the declared budget"""
+
+
+_local = threading.local()
+# Callables (stmt, seconds) notified of every statement, e.g. the slow query log
+_listeners: List[Callable[[str, float], None]] = []
+
+
+def _collectors() -> List[QueryCollector]:
+    if not hasattr(_local, "collectors"):
+        _local.collectors = []
+    return _local.collectors
+
+
+def _timers() -> List[float]:
+    if not hasattr(_local, "timers"):
+        _local.timers = []
+    return _local.timers
+
+
+def _before_execute(tx, **kwargs):
+    if _listeners or _collectors():
+        _timers().append(time.perf_counter())
+
+
+def _after_execute(tx, stmt=None, **kwargs):
+    timers = _timers()
+    if not timers:
+        return
+    elapsed = time.perf_counter() - timers.pop()
+    for collector in _collectors():
+        collector.record(stmt, elapsed)
+    for listener in _listeners:
+        listener(stmt, elapsed)
+
+
+def _handle_error(tx, **kwargs):
+    if _timers():
+        _timers().pop()
+
+
+def connect_signals():
+    """Listen to sqlorm's execute signals (idempotent)"""
+    Transaction.before_execute.connect(_before_execute, weak=False)
+    Transaction.after_execute.connect(_after_execute, weak=False)
+    Transaction.handle_error.connect(_handle_error, weak=False)
+
+
+def add_listener(listener: Callable[[str, float], None]):
+    """Call listener(stmt, seconds) after every statement"""
+    connect_signals()
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[str, float], None]):
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+@contextmanager
+def collect_queries(n_plus_one_threshold: int = N_PLUS_ONE_THRESHOLD):
+    """Collect statements executed by this thread inside the block"""
+    connect_signals()
+    collector = QueryCollector(n_plus_one_threshold)
+    _collectors().append(collector)
+    try:
+        yield collector
+    finally:
+        _collectors().remove(collector)
+
+
+@contextmanager
+def query_budget(max_queries: int, allow_repeated: bool = False):
+    """Fail (QueryBudgetExceeded) if the block runs more than max_queries statements or an N+1"""
+    with collect_queries() as collector:
+        yield collector
+    if collector.count > max_queries:
+        raise QueryBudgetExceeded(f"{collector.count} queries, budget is {max_queries}: {collector.summary()}")
+    if not allow_repeated and collector.repeated:
+        raise QueryBudgetExceeded(f"Repeated queries (N+1): {collector.summary()}")
+
+
+class QueryStats:
+    """Per-request query counting, reported in a log line and an optional header"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.header = False
+        self.threshold = N_PLUS_ONE_THRESHOLD
+        self.budget = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize with Flask app"""
+        self.app = app
+        self.header = app.config.get("QUERY_STATS_HEADER", app.debug)
+        self.threshold = int(app.config.get("QUERY_N_PLUS_ONE_THRESHOLD", N_PLUS_ONE_THRESHOLD))
+        budget = app.config.get("QUERY_BUDGET")
+        self.budget = int(budget) if budget else None
+
+        connect_signals()
+        app.before_request(self.start_request)
+        app.after_request(self.report_request)
+        app.teardown_request(self.end_request)
+
+    def start_request(self):
+        g.query_stats = QueryCollector(self.threshold)
+        _collectors().append(g.query_stats)
+
+    def end_request(self, exc=None):
+        collector = g.pop("query_stats", None)
+        if collector in _collectors():
+            _collectors().remove(collector)
+
+    def report_request(self, response):
+        from flask import request
+
+        collector: Optional[QueryCollector] = g.get("query_stats")
+        if collector is None:
+            return response
+
+        if self.header:
+            response.headers[HEADER] = collector.summary()
+
+        over_budget = self.budget is not None and collector.count > self.budget
+        if collector.repeated or over_budget:
+            self.app.logger.warning(f"DB queries {request.method} {request.path}: {collector.summary()}")
+        elif collector.count:
+            self.app.logger.debug(f"DB queries {request.method} {request.path}: {collector.summary()}")
+        return response
+
+
+# Global instance (initialized in app factory)
+query_stats = QueryStats()
@@ -0,0 +1,279 @@
+"""
+Daily sales and engagement rollups.
+
+A periodiq job (app/cron.py) keeps two compact tables up to date:
+    dailyproductsales  revenue / units / orders per product per day (paid orders)
+    dailyproductposts  timeline entries mentioning a product per day
+
+Each run only looks at source rows changed since the last watermark
+(Order.updated_at, TimelineEntry.id), works out which days they touch,
+then rebuilds just those days: raw rows are fetched with one query and
+grouped with NumPy (np.unique + np.bincount) instead of a GROUP BY over
+the whole history. Rebuilding a day is idempotent, so overlapping runs
+or a replayed window are harmless.
+
+Usage:
+    from app.services.rollups import run_rollups
+    stats = run_rollups()
+"""
+from typing import Optional, Dict, Any, List, Iterable, Sequence, Set, Tuple
+from datetime import date, datetime, timedelta
+import time
+
+from app.services.admin_stats import PAID_ORDER_STATUSES
+
+
+SALES = 'daily_product_sales'
+POSTS = 'daily_product_posts'
+
+# Days rebuilt per query, bounds memory on the first (full) run
+WINDOW_DAYS = 31
+
+# Re-read this much before the timestamp watermark to catch late commits
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+
+def aggregate_by_day(days: Sequence, keys: Sequence[int], **values: Sequence) -> List[Dict[str, Any]]:
+    """
+    Group rows by (day, key) and sum each value column.
+
+    Returns one dict per group with 'day' (date), 'key', 'rows' (row count)
+    and the summed columns, ordered by day then key.
+    """
+    import numpy as np
+
+    if len(days) == 0:
+        return []
+
+    day_numbers = np.asarray(days, dtype='datetime64[D]').astype(np.int64)
+    pairs = np.stack([day_numbers, np.asarray(keys, dtype=np.int64)], axis=1)
+    groups, inverse = np.unique(pairs, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    counts = np.bincount(inverse, minlength=len(groups))
+    sums = {
+        name: np.bincount(inverse, weights=np.asarray(column, dtype=np.float64), minlength=len(groups))
+        for name, column in values.items()
+    }
+
+    group_days = groups[:, 0].astype('datetime64[D]').astype(object)
+    return [
+        dict(
+            day=group_days[i],
+            key=int(groups[i, 1]),
+            rows=int(counts[i]),
+            **{name: int(round(total[i])) for name, total in sums.items()},
+        )
+        for i in range(len(groups))
+    ]
+
+
+def day_windows(days: Iterable[date], window_days: int = WINDOW_DAYS) -> List[Tuple[date, date]]:
+    """Split a set of days into [first, last] spans of at most window_days days"""
+    windows = []
+    for day in sorted(set(days)):
+        if windows and (day - windows[-1][0]).days < window_days:
+            windows[-1][1] = day
+        else:
+            windows.append([day, day])
+    return [tuple(window) for window in windows]
+
+
+def _day_bounds(first: date, last: date) -> Tuple[datetime, datetime]:
+    return datetime.combine(first, datetime.min.time()), datetime.combine(last + timedelta(days=1), datetime.min.time())
+
+
+def _get_watermark(tx, name: str) -> Tuple[Optional[int], Optional[datetime]]:
+    """(last_id, last_timestamp) of a rollup, (None, None) before its first run"""
+    from app.services.db_sql import sql, to_datetime
+
+    row = tx.fetchone(sql(tx, 'SELECT last_id, last_timestamp FROM rollupwatermark WHERE name = ?'), [name])
+    if row is None:
+        return None, None
+    return row[0], to_datetime(row[1])
+
+
+def _set_watermark(tx, name: str, last_id: Optional[int] = None, last_timestamp: Optional[datetime] = None):
+    from app.services.db_sql import execute
+
+    now = datetime.utcnow()
+    updated = execute(tx, 'UPDATE rollupwatermark SET last_id = COALESCE(?, last_id), '
+                          'last_timestamp = COALESCE(?, last_timestamp), updated_at = ? WHERE name = ?',
+                      [last_id, last_timestamp, now, name])
+    if not updated:
+        execute(tx, 'INSERT INTO rollupwatermark (name, last_id, last_timestamp, updated_at) VALUES (?, ?, ?, ?)',
+                [name, last_id, last_timestamp, now])
+
+
+def _replace_days(tx, table: str, columns: Sequence[str], first: date, last: date, rows: List[Sequence]):
+    from app.services.db_sql import sql, placeholders
+
+    tx.execute(sql(tx, f'DELETE FROM {table} WHERE day >= ? AND day <= ?'), [first, last])
+    if rows:
+        tx.executemany(sql(tx, f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders(len(columns))})'),
+                       rows)
+
+
+def rollup_sales() -> Dict[str, int]:
+    """Rebuild sales rollups for days with orders changed since the watermark"""
+    from hyperflask.factory import db
+    from app.services.db_sql import sql, placeholders, to_datetime
+
+    paid = placeholders(len(PAID_ORDER_STATUSES))
+    with db as tx:
+        _, last_timestamp = _get_watermark(tx, SALES)
+        since = last_timestamp - WATERMARK_OVERLAP if last_timestamp else None
+
+        if since:
+            changed = tx.fetchall(sql(tx, 'SELECT created_at, updated_at FROM "order" WHERE updated_at > ?'), [since])
+        else:
+            changed = tx.fetchall('SELECT created_at, updated_at FROM "order"')
+
+        dirty_days: Set[date] = {to_datetime(created_at).date() for created_at, _ in changed}
+        high_water = max((to_datetime(updated_at) for _, updated_at in changed if updated_at), default=None)
+
+        rows_written = 0
+        for first, last in day_windows(dirty_days):
+            start, end = _day_bounds(first, last)
+            items = tx.fetchall(sql(tx,
+                'SELECT "order".created_at, orderitem.product_id, product.category, '
+                'orderitem.quantity, orderitem.price_at_purchase '
+                'FROM orderitem JOIN "order" ON "order".id = orderitem.order_id '
+                'LEFT OUTER JOIN product ON product.id = orderitem.product_id '
+                f'WHERE "order".created_at >= ? AND "order".created_at < ? AND "order".status IN ({paid})'),
+                [start, end, *PAID_ORDER_STATUSES])
+
+            categories = {product_id: category for _, product_id, category, _, _ in items}
+            groups = aggregate_by_day(
+                [to_datetime(created_at) for created_at, *_ in items],
+                [product_id for _, product_id, *_ in items],
+                units=[quantity for *_, quantity, _ in items],
+                revenue=[quantity * price for *_, quantity, price in items],
+            )
+            rows = [
+                (g['day'], g['key'], categories.get(g['key']), g['rows'], g['units'], g['revenue'])
+                for g in groups
+            ]
+            _replace_days(tx, 'dailyproductsales', ('day', 'product_id', 'category', 'orders', 'units', 'revenue'),
+                          first, last, rows)
+            rows_written += len(rows)
+
+        if high_water:
+            _set_watermark(tx, SALES, last_timestamp=high_water)
+
+    return {'days': len(dirty_days), 'rows': rows_written}
+
+
+def rollup_posts() -> Dict[str, int]:
+    """Rebuild post-count rollups for days with timeline entries added since the watermark"""
+    from hyperflask.factory import db
+    from app.services.db_sql import sql, to_datetime
+
+    with db as tx:
+        last_id, _ = _get_watermark(tx, POSTS)
+
+        new_entries = tx.fetchall(sql(tx, 'SELECT id, timestamp FROM timelineentry '
+                                          'WHERE id > ? AND product_id IS NOT NULL'), [last_id or 0])
+        dirty_days: Set[date] = {to_datetime(timestamp).date() for _, timestamp in new_entries}
+
+        rows_written = 0
+        for first, last in day_windows(dirty_days):
+            start, end = _day_bounds(first, last)
+            entries = tx.fetchall(sql(tx, 'SELECT timestamp, product_id FROM timelineentry '
+                                          'WHERE timestamp >= ? AND timestamp < ? AND product_id IS NOT NULL'),
+                                  [start, end])
+
+            groups = aggregate_by_day([to_datetime(t) for t, _ in entries], [p for _, p in entries])
+            rows = [(g['day'], g['key'], g['rows']) for g in groups]
+            _replace_days(tx, 'dailyproductposts', ('day', 'product_id', 'posts'), first, last, rows)
+            rows_written += len(rows)
+
+        if new_entries:
+            _set_watermark(tx, POSTS, last_id=max(entry_id for entry_id, _ in new_entries))
+
+    return {'days': len(dirty_days), 'rows': rows_written}
+
+
+def run_rollups() -> Dict[str, Any]:
+    """Run all rollups, returning per-rollup stats and elapsed time"""
+    start = time.perf_counter()
+    stats = {SALES: rollup_sales(), POSTS: rollup_posts()}
+    stats['elapsed_seconds'] = time.perf_counter() - start
+    return stats
+
+
+# Chart queries: small GROUP BYs over the rollup tables only
+
+def _since(days: int) -> date:
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+
+def revenue_by_day(days: int = 30) -> List[Dict[str, Any]]:
+    """Revenue per day for the last `days` days (days without sales included as 0)"""
+    from hyperflask.factory import db
+    from app.services.db_sql import sql, to_date
+
+    since = _since(days)
+    with db as tx:
+        totals = {to_date(day): revenue for day, revenue in tx.fetchall(sql(tx,
+            'SELECT day, sum(revenue) FROM dailyproductsales WHERE day >= ? GROUP BY day'), [since])}
+
+    return [
+        {'day': day, 'revenue': int(totals.get(day) or 0)}
+        for day in (since + timedelta(days=i) for i in range(days))
+    ]
+
+
+def revenue_by_category(days: int = 30) -> List[Dict[str, Any]]:
+    """Revenue per product category for the last `days` days, highest first"""
+    from hyperflask.factory import db
+    from app.services.db_sql import sql
+
+    with db as tx:
+        rows = tx.fetchall(sql(tx,
+            'SELECT category, sum(revenue) AS revenue FROM dailyproductsales WHERE day >= ? '
+            'GROUP BY category ORDER BY revenue DESC'), [_since(days)])
+
+    return [{'category': category or 'Uncategorized', 'revenue': int(total or 0)} for category, total in rows]
+
+
+def top_products(days: int = 30, limit: int = 10) -> List[Dict[str, Any]]:
+    """Products by revenue for the last `days` days, with their post counts"""
+    from hyperflask.factory import db
+    from app.services.db_sql import sql, placeholders
+
+    since = _since(days)
+    with db as tx:
+        rows = tx.fetchall(sql(tx,
+            'SELECT dailyproductsales.product_id, product.name, sum(dailyproductsales.revenue) AS revenue, '
+            'sum(dailyproductsales.units) FROM dailyproductsales '
+            'LEFT OUTER JOIN product ON product.id = dailyproductsales.product_id '
+            'WHERE dailyproductsales.day >= ? GROUP BY dailyproductsales.product_id, product.name '
+            'ORDER BY revenue DESC LIMIT ?'), [since, limit])
+        product_ids = [product_id for product_id, *_ in rows]
+        posts = dict(tx.fetchall(sql(tx,
+            'SELECT product_id, sum(posts) FROM dailyproductposts '
+            f'WHERE day >= ? AND product_id IN ({placeholders(len(product_ids))}) GROUP BY product_id'),
+            [since, *product_ids])) if rows else {}
+
+    return [
+        {'product_id': product_id, 'name': name or f'#{product_id}', 'revenue': int(total or 0),
+         'units': int(units or 0), 'posts': int(posts.get(product_id) or 0)}
+        for product_id, name, total, units in rows
+    ]
+
+
+def posts_by_product(days: int = 30, limit: int = 10) -> List[Dict[str, Any]]:
+    """Most mentioned products in timeline entries for the last `days` days"""
+    from hyperflask.factory import db
+    from app.services.db_sql import sql
+
+    with db as tx:
+        rows = tx.fetchall(sql(tx,
+            'SELECT dailyproductposts.product_id, product.name, sum(dailyproductposts.posts) AS posts '
+            'FROM dailyproductposts LEFT OUTER JOIN product ON product.id = dailyproductposts.product_id '
+            'WHERE dailyproductposts.day >= ? GROUP BY dailyproductposts.product_id, product.name '
+            'ORDER BY posts DESC LIMIT ?'), [_since(days), limit])
+
+    return [{'product_id': product_id, 'name': name or f'#{product_id}', 'posts': int(total or 0)}
+            for product_id, name, total in rows]
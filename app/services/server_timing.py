@@ -0,0 +1,167 @@
+"""
+Server-Timing breakdown of page requests.
+
+Each request is split into phases, from marks taken by a WSGI wrapper and
+flask-file-routes' page signals:
+
+    route        request start -> page module execution (context, URL matching, before_request hooks)
+    frontmatter  the .jpy Python block
+    template     the Jinja body (and layout)
+    serialize    rendered page -> response ready (make_response, after_request hooks)
+    db           SQL time (from query_stats), subtracted from the phase it ran in
+    total
+
+Responses for pages that return early (redirects, page.respond, json_response)
+have no template phase. Routes that aren't .jpy pages get a single "handler" phase.
+
+The breakdown is sent as a header, viewable in the browser devtools network tab:
+    Server-Timing: route;dur=0.3, frontmatter;dur=2.1, db;dur=4.0, template;dur=6.2, serialize;dur=0.2, total;dur=12.8
+
+and aggregated per page route (count, mean per phase, total p50/p95/p99) for
+/admin/timings. Aggregates are per worker process.
+
+Config:
+    server_timing_header: true   # default: debug mode only
+"""
+from typing import Optional, Dict, Any, List, Tuple
+import threading
+import time
+
+from flask import g, request
+from flask_file_routes.view import before_page_module_execute, before_page_module_render, after_page_module_render
+
+from app.services.slow_queries import LatencyHistogram
+
+
+HEADER = "Server-Timing"
+ENVIRON_KEY = "server_timing.start"
+PHASES = ("route", "frontmatter", "template", "serialize", "handler", "db")
+
+# Phase starting at each mark
+_MARK_PHASES = {
+    "start": "route",
+    "execute": "frontmatter",
+    "render": "template",
+    "rendered": "serialize",
+}
+
+
+def _db_seconds() -> float:
+    collector = g.get("query_stats")
+    return collector.seconds if collector is not None else 0.0
+
+
+def _mark(name: str):
+    marks = g.get("server_timing_marks")
+    if marks is not None:
+        marks.append((name, time.perf_counter(), _db_seconds()))
+
+
+def breakdown(marks: List[Tuple[str, float, float]]) -> Dict[str, float]:
+    """Phase durations in seconds from (name, time, db_seconds) marks ordered from 'start' to 'end'"""
+    phases: Dict[str, float] = {}
+    is_page = any(name == "execute" for name, _, _ in marks)
+    for (name, start, db_start), (_, end, db_end) in zip(marks, marks[1:]):
+        phase = _MARK_PHASES[name] if is_page else "handler"
+        db = db_end - db_start
+        phases[phase] = phases.get(phase, 0.0) + max(end - start - db, 0.0)
+        phases["db"] = phases.get("db", 0.0) + db
+    phases["total"] = marks[-1][1] - marks[0][1]
+    return phases
+
+
+def format_header(phases: Dict[str, float]) -> str:
+    names = [name for name in (*PHASES, "total") if name in phases]
+    return ", ".join(f"{name};dur={phases[name] * 1000:.1f}" for name in names)
+
+
+class ServerTiming:
+    """Per-request phase timings, sent as Server-Timing and aggregated per route"""
+
+    def __init__(self, app=None):
+        self.header = False
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize with Flask app"""
+        self.header = app.config.get("SERVER_TIMING_HEADER", app.debug)
+
+        wsgi_app = app.wsgi_app
+
+        def timed_wsgi_app(environ, start_response):
+            environ[ENVIRON_KEY] = time.perf_counter()
+            return wsgi_app(environ, start_response)
+
+        app.wsgi_app = timed_wsgi_app
+        app.before_request(self.start_request)
+        app.after_request(self.end_request)
+        before_page_module_execute.connect(self._on_execute, weak=False)
+        before_page_module_render.connect(self._on_render, weak=False)
+        after_page_module_render.connect(self._on_rendered, weak=False)
+
+    def _on_execute(self, sender, **kwargs):
+        _mark("execute")
+
+    def _on_render(self, sender, **kwargs):
+        _mark("render")
+
+    def _on_rendered(self, sender, **kwargs):
+        _mark("rendered")
+
+    def start_request(self):
+        start = request.environ.get(ENVIRON_KEY, time.perf_counter())
+        g.server_timing_marks = [("start", start, 0.0)]
+
+    def end_request(self, response):
+        marks = g.pop("server_timing_marks", None)
+        if not marks:
+            return response
+        marks.append(("end", time.perf_counter(), _db_seconds()))
+        phases = breakdown(marks)
+
+        if self.header:
+            response.headers[HEADER] = format_header(phases)
+        self.record(request.url_rule.rule if request.url_rule else "<unmatched>", phases)
+        return response
+
+    def record(self, route: str, phases: Dict[str, float]):
+        with self._lock:
+            entry = self.pages.get(route)
+            if entry is None:
+                entry = self.pages[route] = {'count': 0, 'phases': dict.fromkeys(PHASES, 0.0),
+                                             'histogram': LatencyHistogram()}
+            entry['count'] += 1
+            for phase, seconds in phases.items():
+                if phase != "total":
+                    entry['phases'][phase] += seconds
+            entry['histogram'].observe(phases["total"])
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Per-route mean phase times and total latency percentiles in milliseconds, slowest total first"""
+        with self._lock:
+            rows = []
+            for route, entry in self.pages.items():
+                histogram = entry['histogram']
+                rows.append({
+                    'route': route,
+                    'count': entry['count'],
+                    **{f'{phase}_ms': seconds / entry['count'] * 1000 for phase, seconds in entry['phases'].items()},
+                    'total_ms': histogram.total * 1000,
+                    'mean_ms': histogram.total / histogram.count * 1000,
+                    'p50_ms': histogram.percentile(0.50) * 1000,
+                    'p95_ms': histogram.percentile(0.95) * 1000,
+                    'p99_ms': histogram.percentile(0.99) * 1000,
+                })
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self.pages.clear()
+
+
+# Global instance (initialized in app factory)
+server_timing = ServerTiming()
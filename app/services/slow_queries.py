@@ -0,0 +1,136 @@
+"""
+Slow query log and per-fingerprint latency histograms.
+
+Every statement (see app/services/query_stats.py) is reduced to its
+fingerprint and recorded in an in-memory table:
+count, total/max time, the page that last ran it, and a log-bucketed
+latency histogram from which p50/p95/p99 are estimated (within one bucket,
+about 25%). Memory is bounded: at most slow_query_max_fingerprints shapes
+are tracked; when full, the least used shape is evicted.
+
+Statements slower than slow_query_ms are logged with the page path:
+    Slow query (412.3ms) GET /shop: SELECT * FROM product WHERE is_active = ? ORDER BY ...
+
+Stats are per process (each gunicorn worker keeps its own table) and are
+shown to admins at /admin/slow-queries.
+
+Config:
+    slow_query_ms: 200
+    slow_query_max_fingerprints: 500
+"""
+from typing import Optional, Dict, Any, List
+import bisect
+import threading
+
+from flask import has_request_context, request
+
+from app.services.query_stats import add_listener, fingerprint
+
+
+# Histogram bucket upper bounds: 0.1ms, x1.25 per bucket, up to ~65s
+BUCKETS = tuple(0.0001 * 1.25 ** i for i in range(61))
+
+
+class LatencyHistogram:
+    """Fixed log-spaced buckets, constant memory per fingerprint"""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (capped at the max seen)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(BUCKETS[i] if i < len(BUCKETS) else self.max, self.max)
+        return self.max
+
+
+class SlowQueryLog:
+    """Per-fingerprint query latency with a slow query log"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.threshold = 0.2
+        self.max_fingerprints = 500
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self.evicted = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize with Flask app"""
+        self.app = app
+        self.threshold = float(app.config.get("SLOW_QUERY_MS", 200)) / 1000
+        self.max_fingerprints = int(app.config.get("SLOW_QUERY_MAX_FINGERPRINTS", 500))
+        add_listener(self.record)
+
+    def record(self, stmt, seconds: float):
+        shape = fingerprint(stmt)
+        page = f"{request.method} {request.path}" if has_request_context() else None
+
+        with self._lock:
+            entry = self.stats.get(shape)
+            if entry is None:
+                if len(self.stats) >= self.max_fingerprints:
+                    self._evict()
+                entry = self.stats[shape] = {'histogram': LatencyHistogram(), 'page': None, 'slow': 0}
+            entry['histogram'].observe(seconds)
+            if page:
+                entry['page'] = page
+            if seconds >= self.threshold:
+                entry['slow'] += 1
+
+        if seconds >= self.threshold and self.app:
+            self.app.logger.warning(f"Slow query ({seconds * 1000:.1f}ms) {page or '-'}: {shape}")
+
+    def _evict(self):
+        least_used = min(self.stats, key=lambda shape: self.stats[shape]['histogram'].count)
+        del self.stats[least_used]
+        self.evicted += 1
+
+    def report(self, order_by: str = 'total_ms', limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """Per-fingerprint stats in milliseconds, slowest first"""
+        with self._lock:
+            rows = [
+                {
+                    'fingerprint': shape,
+                    'page': entry['page'],
+                    'count': entry['histogram'].count,
+                    'slow': entry['slow'],
+                    'total_ms': entry['histogram'].total * 1000,
+                    'mean_ms': entry['histogram'].total / entry['histogram'].count * 1000,
+                    'p50_ms': entry['histogram'].percentile(0.50) * 1000,
+                    'p95_ms': entry['histogram'].percentile(0.95) * 1000,
+                    'p99_ms': entry['histogram'].percentile(0.99) * 1000,
+                    'max_ms': entry['histogram'].max * 1000,
+                }
+                for shape, entry in self.stats.items()
+            ]
+        rows.sort(key=lambda row: row[order_by], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.evicted = 0
+
+
+# Global instance (initialized in app factory)
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,80 @@
+"""
+SQLite production profile: tuned pragmas, a reader pool and a single writer.
+
+With WAL, any number of readers can run alongside one writer, but two
+writers contend for the database lock (SQLITE_BUSY, busy_timeout spins).
+This profile makes that explicit:
+
+- writer: the default engine (db.engine), one connection per process, so
+  writers queue in the pool instead of spinning on the file lock. Used by
+  `with db:` transactions, POST requests, actors and scripts.
+- readers: a pool of query_only connections registered with the "reader"
+  tag. GET/HEAD requests run on them (see app/services/db_router.py), so
+  timeline and shop renders never wait behind a cart write.
+
+Every connection gets the same pragmas on connect:
+    journal_mode=WAL, synchronous=NORMAL, mmap_size, cache_size,
+    busy_timeout, temp_store=MEMORY (+ foreign_keys, journal_size_limit)
+
+Config (see config_sqlite.yml):
+    sqlite_profile: true
+    sqlite_readers: 4              # reader connections per process
+    sqlite_writer_timeout: 30      # seconds to wait for the writer
+    sqlite_pragmas:                # overrides of SQLITE_PRAGMAS
+      cache_size: -131072
+"""
+from typing import Optional, Dict, Any, Tuple
+
+from app.services.db_pool import PooledEngine, replace_engine
+
+
+READER_TAG = "reader"
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # durable at checkpoints, safe with WAL
+    "mmap_size": "268435456",  # 256mb of the file memory-mapped
+    "cache_size": "-65536",  # 64mb page cache per connection (negative = KiB)
+    "busy_timeout": "5000",  # ms
+    "temp_store": "MEMORY",
+    "journal_size_limit": "67108864",  # 64mb
+    "foreign_keys": "ON",
+}
+
+
+def sqlite_pragmas(config) -> Dict[str, str]:
+    """SQLITE_PRAGMAS with overrides from the sqlite_pragmas config mapping"""
+    pragmas = dict(SQLITE_PRAGMAS)
+    pragmas.update({key: str(value) for key, value in (config.get("SQLITE_PRAGMAS") or {}).items()})
+    return pragmas
+
+
+def create_sqlite_engines(db, uri: str, pragmas: Dict[str, str], readers: int = 4,
+                          writer_timeout: float = 30) -> Tuple[PooledEngine, PooledEngine]:
+    """Writer (single connection) and reader pool engines for a SQLite file"""
+    writer = PooledEngine.from_engine(
+        db.create_engine(uri, fine_tune=False, pragma=dict(pragmas)),
+        min_size=0, max_size=1, acquire_timeout=writer_timeout, name="writer",
+    )
+    reader = PooledEngine.from_engine(
+        db.create_engine(uri, fine_tune=False, pragma=dict(pragmas, query_only="ON")),
+        min_size=0, max_size=readers, acquire_timeout=writer_timeout, name=READER_TAG,
+    )
+    return writer, reader
+
+
+def install_sqlite_profile(app, db) -> Optional[Tuple[PooledEngine, PooledEngine]]:
+    """Replace the default SQLite engine with a tuned writer and register a reader pool"""
+    uri = app.config.get("SQLORM_URI") or ""
+    if not app.config.get("SQLITE_PROFILE") or not uri.startswith("sqlite://") or ":memory:" in uri:
+        return None
+
+    writer, reader = create_sqlite_engines(
+        db, uri, sqlite_pragmas(app.config),
+        readers=int(app.config.get("SQLITE_READERS", 4)),
+        writer_timeout=float(app.config.get("SQLITE_WRITER_TIMEOUT", 30)),
+    )
+    db.engine.disconnect_all()
+    replace_engine(db, db.engine, writer)
+    db.engines.register(reader, [READER_TAG])
+    return writer, reader
@@ -0,0 +1,331 @@
+"""
+Local Stripe-compatible HTTP stand-in for load testing.
+
+Wraps MockStripeAPI in a small HTTP server that speaks the subset of the
+Stripe REST API used by StripeService, so checkout can be load-tested with
+real network round trips instead of in-process calls.
+
+Supported endpoints (form-encoded, like the Stripe SDK sends them):
+- POST   /v1/customers
+- GET    /v1/prices                            (product always expanded)
+- POST   /v1/checkout/sessions
+- GET    /v1/checkout/sessions/<id>
+- POST   /v1/checkout/sessions/<id>/complete   (mock only: simulates payment)
+- GET    /v1/subscriptions/<id>
+- DELETE /v1/subscriptions/<id>
+- GET    /_mock/stats                          (request/error counters)
+- POST   /_mock/config                         (change latency/error rate at runtime)
+
+Events created by the mock (checkout completed, subscription deleted) are
+delivered to `webhook_url` with a real HMAC Stripe-Signature header.
+
+Usage:
+    python -m app.services.stripe_mock_server --port 12111 \\
+        --latency-ms 250 --latency-jitter-ms 100 --error-rate 0.05 \\
+        --webhook-url http://localhost:5000/webhooks/stripe
+
+Then run the app in test mode against it:
+    stripe_mode: test
+    stripe_api_base: http://localhost:12111
+"""
+from typing import Optional, Dict, Any, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+import json
+import queue
+import random
+import re
+import threading
+import time
+
+from app.services.stripe_service import MockStripeAPI, generate_webhook_signature
+
+
+def parse_stripe_form(body: str) -> Dict[str, Any]:
+    """
+    Decode Stripe's bracketed form encoding into nested dicts/lists.
+    e.g. "line_items[0][price]=price_1" -> {'line_items': [{'price': 'price_1'}]}
+    """
+    data: Dict[str, Any] = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        parts = re.findall(r'[^\[\]]+', key)
+        target = data
+        for i, part in enumerate(parts):
+            last = i == len(parts) - 1
+            if last:
+                target[part] = value
+            else:
+                target = target.setdefault(part, {})
+
+    def listify(obj):
+        # Dicts whose keys are all indexes ("0", "1", ...) become lists
+        if isinstance(obj, dict):
+            obj = {k: listify(v) for k, v in obj.items()}
+            if obj and all(k.isdigit() for k in obj):
+                return [obj[k] for k in sorted(obj, key=int)]
+        return obj
+
+    return listify(data)
+
+
+class MockStripeServer:
+    """
+    HTTP server exposing a MockStripeAPI with latency and failure injection.
+
+    Usage:
+        server = MockStripeServer(port=0, latency_ms=200, error_rate=0.1).start()
+        ... point stripe.api_base at server.url ...
+        server.stop()
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 12111,
+        api: Optional[MockStripeAPI] = None,
+        latency_ms: float = 0,
+        latency_jitter_ms: float = 0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        webhook_url: Optional[str] = None,
+        webhook_secret: str = 'whsec_mock',
+        seed: Optional[int] = None,
+    ):
+        self.api = api or MockStripeAPI()
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+
+        self.stats = {
+            'requests': 0,
+            'injected_errors': 0,
+            'webhooks_delivered': 0,
+            'webhooks_failed': 0,
+        }
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._webhooks = queue.Queue()
+        self._thread = None
+        self._webhook_thread = None
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MockStripeServer':
+        """Serve in a background thread (for tests and embedded load runs)"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        self._start_webhook_worker()
+        return self
+
+    def serve_forever(self):
+        """Serve in the current thread (CLI usage)"""
+        self._start_webhook_worker()
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self._webhooks.put(None)
+
+    def configure(self, **options):
+        """Update latency/error injection settings while running"""
+        casts = {'latency_ms': float, 'latency_jitter_ms': float, 'error_rate': float, 'error_status': int}
+        for key, cast in casts.items():
+            if key in options:
+                setattr(self, key, cast(options[key]))
+
+    # Fault injection
+
+    def _inject_latency(self):
+        if not self.latency_ms and not self.latency_jitter_ms:
+            return
+        with self._lock:
+            jitter = self._random.uniform(-self.latency_jitter_ms, self.latency_jitter_ms)
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000.0)
+
+    def _should_fail(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    # API dispatch
+
+    def handle(self, method: str, path: str, params: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Route a request to the mock API. Returns (status, body)."""
+        with self._lock:
+            self.stats['requests'] += 1
+
+        if path == '/_mock/stats' and method == 'GET':
+            return 200, dict(self.stats)
+        if path == '/_mock/config' and method == 'POST':
+            self.configure(**params)
+            return 200, {'latency_ms': self.latency_ms, 'latency_jitter_ms': self.latency_jitter_ms,
+                         'error_rate': self.error_rate, 'error_status': self.error_status}
+
+        self._inject_latency()
+        if self._should_fail():
+            with self._lock:
+                self.stats['injected_errors'] += 1
+            return self.error_status, _error('api_error', 'Injected failure from mock Stripe server')
+
+        with self._lock:
+            if method == 'POST' and path == '/v1/customers':
+                return 200, self.api.create_customer(params.get('email'), params.get('metadata'))
+
+            if method == 'GET' and path == '/v1/prices':
+                return 200, self.api.list_prices()
+
+            if method == 'POST' and path == '/v1/checkout/sessions':
+                line_items = params.get('line_items') or [{}]
+                if not line_items[0].get('price'):
+                    return 400, _error('invalid_request_error', 'Missing required param: line_items[0][price].')
+                return 200, self.api.create_checkout_session(
+                    customer_email=params.get('customer_email'),
+                    price_id=line_items[0]['price'],
+                    success_url=params.get('success_url'),
+                    cancel_url=params.get('cancel_url'),
+                    mode=params.get('mode', 'subscription'),
+                    customer_id=params.get('customer'),
+                )
+
+            match = re.fullmatch(r'/v1/checkout/sessions/([^/]+)(/complete)?', path)
+            if match:
+                session_id, complete = match.groups()
+                if session_id not in self.api.checkout_sessions:
+                    return 404, _error('invalid_request_error', f'No such checkout.session: {session_id}')
+                if complete and method == 'POST':
+                    session = self.api.complete_checkout_session(session_id)
+                    self._webhooks.put(self.api.events[-1])
+                    return 200, session
+                if method == 'GET':
+                    return 200, self.api.checkout_sessions[session_id]
+
+            match = re.fullmatch(r'/v1/subscriptions/([^/]+)', path)
+            if match:
+                subscription_id = match.group(1)
+                if subscription_id not in self.api.subscriptions:
+                    return 404, _error('invalid_request_error', f'No such subscription: {subscription_id}')
+                if method == 'GET':
+                    return 200, self.api.subscriptions[subscription_id]
+                if method == 'DELETE':
+                    subscription = self.api.cancel_subscription(subscription_id)
+                    self._webhooks.put(self.api.events[-1])
+                    return 200, subscription
+
+        return 404, _error('invalid_request_error', f'Unrecognized request URL ({method}: {path})')
+
+    # Webhook delivery
+
+    def _start_webhook_worker(self):
+        if self._webhook_thread:
+            return
+        self._webhook_thread = threading.Thread(target=self._deliver_webhooks, daemon=True)
+        self._webhook_thread.start()
+
+    def _deliver_webhooks(self):
+        import requests
+
+        while True:
+            event = self._webhooks.get()
+            if event is None:
+                return
+            if not self.webhook_url:
+                continue
+
+            payload = json.dumps(event).encode('utf-8')
+            headers = {
+                'Content-Type': 'application/json',
+                'Stripe-Signature': generate_webhook_signature(payload, self.webhook_secret),
+            }
+            try:
+                response = requests.post(self.webhook_url, data=payload, headers=headers, timeout=10)
+                ok = response.status_code < 300
+            except requests.RequestException:
+                ok = False
+            with self._lock:
+                self.stats['webhooks_delivered' if ok else 'webhooks_failed'] += 1
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _dispatch(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode('utf-8') if length else ''
+                if self.headers.get('Content-Type', '').startswith('application/json') and body:
+                    params = json.loads(body)
+                else:
+                    params = parse_stripe_form(body or url.query)
+
+                status, data = server.handle(self.command, url.path, params)
+
+                payload = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.send_header('Request-Id', f"req_mock_{int(time.time() * 1000000)}")
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_DELETE = _dispatch
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def _error(error_type: str, message: str) -> Dict[str, Any]:
+    """Stripe-shaped error body"""
+    return {'error': {'type': error_type, 'message': message}}
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local Stripe-compatible HTTP stand-in for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12111)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Mean added latency per API call")
+    parser.add_argument("--latency-jitter-ms", type=float, default=0, help="Uniform +/- jitter around the mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API calls that fail (0.0-1.0)")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status used for injected failures")
+    parser.add_argument("--webhook-url", default=None, help="Where to deliver signed webhook events")
+    parser.add_argument("--webhook-secret", default="whsec_mock")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible latency/failures")
+
+    args = parser.parse_args(argv)
+
+    server = MockStripeServer(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        webhook_url=args.webhook_url,
+        webhook_secret=args.webhook_secret,
+        seed=args.seed,
+    )
+    print(f"🧪 Mock Stripe server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
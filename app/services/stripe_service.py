@@ -8,11 +8,89 @@ Modes:
 
 Enable/disable via config: stripe_enabled: true/false
 """
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, List
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
 import secrets
 import hashlib
 import hmac
+import threading
+import time
+
+from app.services.metrics import metrics
+
+
+class StripeTimeoutError(RuntimeError):
+    """An outbound Stripe call exceeded its deadline"""
+
+
+class StripeBusyError(RuntimeError):
+    """Too many outbound Stripe calls are already in flight"""
+
+
+def generate_webhook_signature(payload: bytes, secret: str, timestamp: Optional[int] = None) -> str:
+    """
+    Build a Stripe-Signature header value for a webhook payload.
+    Uses the same scheme as Stripe: HMAC-SHA256 over "{timestamp}.{payload}".
+    """
+    if timestamp is None:
+        timestamp = int(time.time())
+    signed_payload = f"{timestamp}.".encode('utf-8') + payload
+    signature = hmac.new(secret.encode('utf-8'), signed_payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def verify_webhook_signature(payload: bytes, sig_header: str, secret: str, tolerance: int = 300) -> bool:
+    """
+    Verify a Stripe-Signature header against the payload.
+    Returns False on a missing/invalid signature or a timestamp outside the tolerance.
+    """
+    try:
+        parts = dict(item.split('=', 1) for item in sig_header.split(','))
+        timestamp = int(parts['t'])
+        signature = parts['v1']
+    except (ValueError, KeyError):
+        return False
+
+    if tolerance and abs(time.time() - timestamp) > tolerance:
+        return False
+
+    expected = generate_webhook_signature(payload, secret, timestamp).split('v1=', 1)[1]
+    return hmac.compare_digest(expected, signature)
+
+
+# Products/prices served by the mock (these match the test-mode price ids in the docs)
+MOCK_CATALOG = [
+    {
+        'product': {
+            'id': 'prod_mock_basic',
+            'name': 'Basic',
+            'metadata': {'plan': 'basic'},
+            'marketing_features': ['10 timeline entries per month', 'Basic support', 'Email notifications'],
+        },
+        'price': {'id': 'price_test_basic_monthly', 'unit_amount': 900},
+    },
+    {
+        'product': {
+            'id': 'prod_mock_pro',
+            'name': 'Pro',
+            'metadata': {'plan': 'pro', 'highlighted': 'true'},
+            'marketing_features': ['Unlimited timeline entries', 'Priority support', 'Email notifications',
+                                   'Advanced analytics', 'Custom branding'],
+        },
+        'price': {'id': 'price_test_pro_monthly', 'unit_amount': 2900},
+    },
+    {
+        'product': {
+            'id': 'prod_mock_enterprise',
+            'name': 'Enterprise',
+            'metadata': {'plan': 'enterprise'},
+            'marketing_features': ['Everything in Pro', 'Dedicated account manager', 'Custom integrations',
+                                   'SLA guarantee', 'Advanced security'],
+        },
+        'price': {'id': 'price_test_enterprise_monthly', 'unit_amount': 9900},
+    },
+]
 
 
 class MockStripeAPI:
@@ -26,14 +104,40 @@ class MockStripeAPI:
         self.subscriptions = {}
         self.checkout_sessions = {}
         self.events = []
+        self.products = {}
+        self.prices = {}
+
+        for entry in MOCK_CATALOG:
+            product = dict(entry['product'], object='product', active=True)
+            product['marketing_features'] = [{'name': name} for name in product['marketing_features']]
+            self.products[product['id']] = product
+            self.prices[entry['price']['id']] = dict(
+                entry['price'],
+                object='price',
+                active=True,
+                currency='usd',
+                type='recurring',
+                recurring={'interval': 'month', 'interval_count': 1},
+                product=product['id'],
+            )
+
+    def list_prices(self, active: bool = True) -> Dict[str, Any]:
+        """List prices with their product expanded (like expand=['data.product'])"""
+        data = [
+            dict(price, product=self.products[price['product']])
+            for price in self.prices.values()
+            if not active or price['active']
+        ]
+        return {'object': 'list', 'url': '/v1/prices', 'data': data, 'has_more': False}
 
     def create_checkout_session(
         self,
-        customer_email: str,
+        customer_email: Optional[str],
         price_id: str,
         success_url: str,
         cancel_url: str,
-        mode: str = 'subscription'
+        mode: str = 'subscription',
+        customer_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """Create a mock checkout session"""
         session_id = f"cs_test_{secrets.token_hex(16)}"
@@ -41,6 +145,7 @@ class MockStripeAPI:
         session = {
             'id': session_id,
             'object': 'checkout.session',
+            'customer': customer_id,
             'customer_email': customer_email,
             'mode': mode,
             'status': 'open',
@@ -48,7 +153,7 @@ class MockStripeAPI:
             'success_url': success_url,
             'cancel_url': cancel_url,
             'line_items': [{'price': price_id, 'quantity': 1}],
-            'metadata': {},
+            'metadata': {'price_id': price_id},
         }
 
         self.checkout_sessions[session_id] = session
@@ -103,8 +208,13 @@ class MockStripeAPI:
         if not session:
             raise ValueError(f"Checkout session {session_id} not found")
 
-        # Create customer
-        customer = self.create_customer(session['customer_email'])
+        # Reuse the session's customer, or create one like Stripe does
+        customer_id = session.get('customer')
+        if customer_id and customer_id not in self.customers:
+            self.customers[customer_id] = {
+                'id': customer_id, 'object': 'customer', 'email': session['customer_email'], 'metadata': {},
+            }
+        customer = self.customers[customer_id] if customer_id else self.create_customer(session['customer_email'])
 
         # Create subscription
         price_id = session['line_items'][0]['price']
@@ -113,6 +223,7 @@ class MockStripeAPI:
         # Update session
         session['status'] = 'complete'
         session['customer'] = customer['id']
+        session['customer_details'] = {'email': customer['email']}
         session['subscription'] = subscription['id']
         session['payment_status'] = 'paid'
 
@@ -151,9 +262,14 @@ class MockStripeAPI:
     def construct_event(self, payload: bytes, sig_header: str, secret: str) -> Dict[str, Any]:
         """
         Mock webhook signature verification.
-        In mock mode, we just parse the payload without real verification.
+        In mock mode, we just parse the payload without real verification,
+        unless the header carries a real signature (e.g. sent by the local
+        HTTP stand-in in stripe_mock_server.py), in which case it is checked.
         """
         import json
+        if sig_header and 'v1=' in sig_header:
+            if not verify_webhook_signature(payload, sig_header, secret):
+                raise ValueError("Invalid webhook signature")
         try:
             return json.loads(payload)
         except json.JSONDecodeError:
@@ -167,6 +283,19 @@ class StripeService:
     Usage:
         service = StripeService(app)
         session = service.create_checkout_session(...)
+
+    Outbound calls can also run on a bounded thread pool with a deadline,
+    so web workers are not pinned on slow Stripe round trips:
+        session = service.call(service.create_checkout_session, ..., timeout=5)
+        future = service.submit(service.create_checkout_session, ...)
+
+    Concurrent create_checkout_session calls for the same customer and price
+    are coalesced into a single Stripe call (see single_flight).
+
+    Config:
+        stripe_call_timeout: 10    # seconds, per-call deadline
+        stripe_max_workers: 8      # executor threads per process
+        stripe_max_pending: 32     # in-flight calls before StripeBusyError
     """
 
     def __init__(self, app=None):
@@ -175,6 +304,13 @@ class StripeService:
         self.enabled = False
         self._stripe_module = None
         self._mock_api = None
+        self.call_timeout = 10
+        self.max_workers = 8
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(32)
+        self._inflight: Dict[Any, Future] = {}
+        self._inflight_lock = threading.Lock()
 
         if app:
             self.init_app(app)
@@ -184,6 +320,9 @@ class StripeService:
         self.app = app
         self.enabled = app.config.get('stripe_enabled', False)
         self.mode = app.config.get('stripe_mode', 'mock')
+        self.call_timeout = float(app.config.get('STRIPE_CALL_TIMEOUT', 10))
+        self.max_workers = int(app.config.get('STRIPE_MAX_WORKERS', 8))
+        self._slots = threading.BoundedSemaphore(int(app.config.get('STRIPE_MAX_PENDING', 32)))
 
         if not self.enabled:
             return
@@ -196,15 +335,125 @@ class StripeService:
                 import stripe
                 self._stripe_module = stripe
                 stripe.api_key = app.config.get('stripe_secret_key')
+                # Point the SDK at a local stand-in (see stripe_mock_server.py) for load tests
+                if app.config.get('STRIPE_API_BASE'):
+                    stripe.api_base = app.config.get('STRIPE_API_BASE')
+                # Enforce the deadline at the HTTP level too, since a running thread can't be interrupted
+                if hasattr(stripe, 'RequestsClient'):
+                    stripe.default_http_client = stripe.RequestsClient(timeout=self.call_timeout)
             except ImportError:
                 raise ImportError(
                     "Stripe SDK not installed. Install with: pip install -e '.[stripe]'"
                 )
 
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='stripe'
+                )
+            return self._executor
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Run an outbound call on the bounded executor.
+        Raises StripeBusyError instead of queueing when all slots are taken.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise StripeBusyError("Too many Stripe calls in flight, try again shortly")
+        try:
+            future = self._get_executor().submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def call(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run an outbound call on the executor and wait at most `timeout` seconds"""
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout or self.call_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise StripeTimeoutError("Stripe did not respond in time")
+
+    def single_flight(self, key: Any, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn once for concurrent callers with the same key.
+        The first caller makes the call; the others wait for and share its result (or exception).
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def create_checkout_session_async(self, checkout_request_id: int, **session_kwargs) -> Future:
+        """
+        Create a checkout session in the background and record the outcome on
+        the CheckoutRequest row, which the HTMX flow polls (/checkout/status).
+        """
+        app = self.app
+
+        def run():
+            try:
+                session = self.create_checkout_session(**session_kwargs)
+                result = {'status': 'ready', 'session_id': session['id'], 'checkout_url': session['url']}
+            except Exception as e:
+                result = {'status': 'failed', 'error': str(e)}
+
+            with app.app_context():
+                from hyperflask.factory import db
+                from app.models import CheckoutRequest
+                from app.services.db_sql import execute
+                try:
+                    with db:
+                        checkout_request = CheckoutRequest.get(checkout_request_id)
+                        if checkout_request and checkout_request.status == 'pending':
+                            for key, value in result.items():
+                                setattr(checkout_request, key, value)
+                            checkout_request.save()
+                except Exception as e:
+                    # Nobody reads the future: don't leave the request pending until the poll deadline
+                    app.logger.warning(f"Saving checkout request {checkout_request_id} failed: {e}")
+                    with db as tx:
+                        execute(tx, "UPDATE checkoutrequest SET status = 'failed', error = ? "
+                                    "WHERE id = ? AND status = 'pending'",
+                                [f"Could not save the checkout session: {e}", checkout_request_id])
+                    raise
+
+        return self.submit(run)
+
     def is_enabled(self) -> bool:
         """Check if Stripe is enabled"""
         return self.enabled
 
+    def warm_up(self):
+        """Start the executor and load the SDK resources, so the first checkout doesn't pay for it"""
+        if not self.enabled:
+            return
+        self._get_executor()
+        if self._stripe_module is not None:
+            stripe = self._stripe_module
+            # Attribute access imports the SDK's lazily loaded resource modules
+            (stripe.checkout.Session, stripe.Price, stripe.Subscription, stripe.Webhook, stripe.error)
+
     def get_publishable_key(self) -> Optional[str]:
         """Get publishable key for frontend"""
         if not self.enabled:
@@ -217,34 +466,70 @@ class StripeService:
         price_id: str,
         success_url: str,
         cancel_url: str,
-        mode: str = 'subscription'
+        mode: str = 'subscription',
+        customer_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Create a Stripe Checkout session.
         Works in mock, test, and live modes.
+
+        Pass the user's stored `customer_id` to reuse their Stripe customer
+        instead of having Checkout create a new one. Concurrent calls for the
+        same customer and price share one session.
         """
         if not self.enabled:
             raise RuntimeError("Stripe is not enabled")
 
-        if self.mode == 'mock':
-            return self._mock_api.create_checkout_session(
-                customer_email=customer_email,
-                price_id=price_id,
-                success_url=success_url,
-                cancel_url=cancel_url,
-                mode=mode
-            )
-        else:
-            # Real Stripe API call
-            session = self._stripe_module.checkout.Session.create(
-                customer_email=customer_email,
-                payment_method_types=['card'],
-                line_items=[{'price': price_id, 'quantity': 1}],
-                mode=mode,
-                success_url=success_url,
-                cancel_url=cancel_url,
-            )
-            return session
+        key = ('checkout', customer_id or customer_email, price_id, mode)
+        return self.single_flight(
+            key, self._create_checkout_session,
+            customer_email, price_id, success_url, cancel_url, mode, customer_id
+        )
+
+    def _create_checkout_session(self, customer_email, price_id, success_url, cancel_url, mode, customer_id):
+        with metrics.stripe_call('create_checkout_session'):
+            if self.mode == 'mock':
+                return self._mock_api.create_checkout_session(
+                    customer_email=None if customer_id else customer_email,
+                    price_id=price_id,
+                    success_url=success_url,
+                    cancel_url=cancel_url,
+                    mode=mode,
+                    customer_id=customer_id
+                )
+            else:
+                # Stripe accepts either an existing customer or an email, not both
+                customer_params = {'customer': customer_id} if customer_id else {'customer_email': customer_email}
+
+                # Real Stripe API call
+                session = self._stripe_module.checkout.Session.create(
+                    **customer_params,
+                    payment_method_types=['card'],
+                    line_items=[{'price': price_id, 'quantity': 1}],
+                    mode=mode,
+                    success_url=success_url,
+                    cancel_url=cancel_url,
+                    # Lets webhook processing resolve the plan without another API call
+                    metadata={'price_id': price_id},
+                )
+                return session
+
+    def list_prices(self) -> List[Dict[str, Any]]:
+        """Active recurring prices with their product expanded"""
+        if not self.enabled:
+            raise RuntimeError("Stripe is not enabled")
+
+        with metrics.stripe_call('list_prices'):
+            if self.mode == 'mock':
+                return self._mock_api.list_prices()['data']
+            else:
+                prices = self._stripe_module.Price.list(
+                    active=True,
+                    type='recurring',
+                    expand=['data.product'],
+                    limit=100,
+                )
+                return list(prices.auto_paging_iter())
 
     def construct_webhook_event(self, payload: bytes, sig_header: str) -> Dict[str, Any]:
         """
@@ -274,10 +559,12 @@ class StripeService:
             return None
 
         if self.mode == 'mock':
-            return self._mock_api.subscriptions.get(subscription_id)
+            with metrics.stripe_call('get_subscription'):
+                return self._mock_api.subscriptions.get(subscription_id)
         else:
             try:
-                return self._stripe_module.Subscription.retrieve(subscription_id)
+                with metrics.stripe_call('get_subscription'):
+                    return self._stripe_module.Subscription.retrieve(subscription_id)
             except self._stripe_module.error.StripeError:
                 return None
 
@@ -286,10 +573,11 @@ class StripeService:
         if not self.enabled:
             raise RuntimeError("Stripe is not enabled")
 
-        if self.mode == 'mock':
-            return self._mock_api.cancel_subscription(subscription_id)
-        else:
-            return self._stripe_module.Subscription.delete(subscription_id)
+        with metrics.stripe_call('cancel_subscription'):
+            if self.mode == 'mock':
+                return self._mock_api.cancel_subscription(subscription_id)
+            else:
+                return self._stripe_module.Subscription.delete(subscription_id)
 
     # Helper methods for testing
     def _complete_mock_checkout(self, session_id: str) -> Dict[str, Any]:
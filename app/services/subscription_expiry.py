@@ -0,0 +1,110 @@
+"""
+Subscription expiry reconciliation.
+
+Subscriptions end through Stripe webhooks. If a customer.subscription.deleted
+event is missed, the user keeps an active status (and tier) forever, and
+checking subscription_ends_at on every gated request would add a query to
+each page. Instead, a periodiq job (app/cron.py) reconciles in bulk:
+
+1. optionally re-verifies a bounded sample of the expired subscriptions
+   against Stripe (StripeService.get_subscription) and writes what Stripe
+   reports, so renewals whose webhook was missed are kept
+2. flips every remaining active/trialing subscription whose
+   subscription_ends_at passed more than the grace period ago to
+   'canceled' with tier 0, in one set-based UPDATE
+
+Both queries are served by ix_user_subscription_status_ends_at. The grace
+period leaves time for the renewal webhook Stripe sends at period end.
+
+Config:
+    subscription_expiry_grace_hours: 24
+    subscription_verify_limit: 20     # Stripe lookups per run, 0 = don't verify
+    subscription_expiry_cron: "7 * * * *"
+
+Usage:
+    from app.services.subscription_expiry import expire_subscriptions
+    stats = expire_subscriptions(grace=timedelta(hours=24), verify_limit=20)
+    stats['expired'], stats['renewed']
+"""
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import datetime, timedelta
+import time
+
+from app.services.db_sql import placeholders
+from app.services.entitlements import ENTITLED_STATUSES, TIER_NONE
+
+
+EXPIRED_STATUS = 'canceled'
+GRACE_PERIOD = timedelta(hours=24)
+VERIFY_LIMIT = 20
+
+# Entitled subscriptions whose period ended before the cutoff (params: *ENTITLED_STATUSES, cutoff)
+EXPIRED = f"subscription_status IN ({placeholders(len(ENTITLED_STATUSES))}) AND subscription_ends_at < ?"
+
+
+def verify_with_stripe(cutoff: datetime, limit: int = VERIFY_LIMIT) -> Dict[str, int]:
+    """
+    Look up to `limit` expired subscriptions (oldest first) up in Stripe and
+    store their current status and period end. Returns verified/renewed counts.
+    """
+    from hyperflask.factory import db
+    from app.services.db_sql import sql
+    from app.services.stripe_service import stripe_service
+
+    if limit <= 0 or not stripe_service.is_enabled():
+        return {'verified': 0, 'renewed': 0}
+
+    with db as tx:
+        sample = tx.fetchall(sql(tx, f'SELECT id, stripe_subscription_id FROM "user" WHERE {EXPIRED} '
+                                     'AND stripe_subscription_id IS NOT NULL ORDER BY subscription_ends_at LIMIT ?'),
+                             [*ENTITLED_STATUSES, cutoff, limit])
+
+    rows: List[Tuple] = []
+    renewed = 0
+    for user_id, subscription_id in sample:
+        subscription = stripe_service.get_subscription(subscription_id)
+        if not subscription:
+            continue
+        status = subscription.get('status')
+        period_end = subscription.get('current_period_end')
+        ends_at = datetime.utcfromtimestamp(period_end) if period_end else None
+        entitled = status in ENTITLED_STATUSES and ends_at is not None and ends_at >= cutoff
+        renewed += entitled
+        rows.append((
+            status if entitled or status not in ENTITLED_STATUSES else EXPIRED_STATUS,
+            ends_at,
+            entitled,
+            user_id,
+        ))
+
+    if rows:
+        with db as tx:
+            tx.executemany(sql(tx, 'UPDATE "user" SET subscription_status = ?, '
+                                   'subscription_ends_at = COALESCE(?, subscription_ends_at), '
+                                   f'subscription_tier = CASE WHEN ? THEN subscription_tier ELSE {TIER_NONE} END '
+                                   'WHERE id = ?'), rows)
+
+    return {'verified': len(rows), 'renewed': renewed}
+
+
+def expire_subscriptions(grace: timedelta = GRACE_PERIOD, verify_limit: int = VERIFY_LIMIT,
+                         now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Verify a sample with Stripe, then flip all other expired subscriptions with one UPDATE"""
+    from hyperflask.factory import db
+    from app.services.db_sql import execute
+
+    start = time.perf_counter()
+    cutoff = (now or datetime.utcnow()) - grace
+
+    verified = verify_with_stripe(cutoff, verify_limit)
+
+    with db as tx:
+        expired = execute(tx, f'UPDATE "user" SET subscription_status = ?, subscription_tier = ? WHERE {EXPIRED}',
+                          [EXPIRED_STATUS, TIER_NONE, *ENTITLED_STATUSES, cutoff])
+
+    return {
+        'expired': expired,
+        **verified,
+        'cutoff': cutoff,
+        'elapsed_seconds': time.perf_counter() - start,
+    }
@@ -0,0 +1,334 @@
+"""
+Dramatiq brokers for the task queue: a tuned SQLite broker and a PostgreSQL broker.
+
+dramatiq-sqlite claims one message per poll (a SELECT and an UPDATE, each
+its own transaction), acks each message in its own transaction and sleeps
+100ms whenever the queue looks empty. Under load, the web processes
+enqueueing and the workers polling contend for the tasks.db write lock.
+
+SQLiteBroker keeps the same table (metrics and existing tasks.db files work
+unchanged) and:
+- tunes the connection: WAL, synchronous=NORMAL, a larger page cache and
+  busy_timeout, temp_store in memory
+- claims up to the free prefetch slots (worker threads x 2 by default, see
+  dramatiq_queue_prefetch) in a single UPDATE ... RETURNING, using a partial
+  index over queued messages, in enqueue order
+- buffers acks and nacks and writes them in one transaction per poll (or
+  every BATCH_SIZE messages)
+
+PostgresBroker stores messages in the main PostgreSQL database (no extra
+file to share between containers), claims batches with FOR UPDATE SKIP
+LOCKED, and wakes idle consumers with LISTEN/NOTIFY instead of polling.
+Each consumer holds two connections (claims/acks and LISTEN).
+
+Config:
+    dramatiq_broker: app.services.task_broker:SQLiteBroker
+    dramatiq_broker_url: sqlite://database/tasks.db
+
+    # with sqlorm_uri on PostgreSQL (requires psycopg 3)
+    dramatiq_broker: app.services.task_broker:PostgresBroker
+    dramatiq_broker_url: ${DATABASE_URL}
+
+Throughput: python -m benchmarks.tasks (see benchmarks/tasks.py)
+"""
+from typing import Dict, List, Tuple
+from collections import deque
+import json
+import logging
+import threading
+import time
+
+import dramatiq_sqlite
+from dramatiq import Message
+from dramatiq.broker import Broker, Consumer, MessageProxy
+from dramatiq.common import compute_backoff, current_millis, dq_name
+from dramatiq_sqlite import Database, tidy4json
+
+
+logger = logging.getLogger(__name__)
+
+# Most messages claimed per poll, and acks buffered before a forced write
+BATCH_SIZE = 100
+# Sleep between polls of an empty SQLite queue, in seconds
+POLL_INTERVAL = 0.1
+# PostgreSQL NOTIFY channel, the payload is the queue name
+CHANNEL = "dramatiq"
+
+
+class TunedDatabase(Database):
+    """dramatiq-sqlite connection with pragmas for many concurrent enqueuers and workers"""
+
+    concurrent_workload_pragmas = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",  # durable at checkpoints, safe with WAL
+        "busy_timeout": "10000",  # ms, writers wait for the lock instead of failing
+        "cache_size": "-16384",  # 16mb (negative = KiB)
+        "temp_store": "MEMORY",
+        "mmap_size": "134217728",  # 128mb
+        "journal_size_limit": "67108864",  # 64mb
+        "wal_autocheckpoint": "1000",  # pages
+    }
+
+    def init_schema(self):
+        super().init_schema()
+        with self as cursor:
+            # Only queued messages are polled: a small index that stays in cache, in rowid (enqueue) order
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_queued ON dramatiq_messages(queue_name) WHERE state = 'queued'")
+
+    def sql(self, stmt: str) -> str:
+        return stmt
+
+
+class PostgresDatabase:
+    """psycopg connection with dramatiq-sqlite's `with db as cursor` interface"""
+
+    def __init__(self, url: str):
+        import psycopg
+        self.conn = psycopg.connect(url)
+        self.lock = threading.Lock()
+        self.cursor = None
+        self.init_schema()
+
+    def init_schema(self):
+        with self as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS dramatiq_messages (
+                    message_id TEXT PRIMARY KEY,
+                    queue_name TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    mtime BIGINT NOT NULL,
+                    seq BIGSERIAL
+                )
+            """)
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_dramatiq_queued ON dramatiq_messages(queue_name, seq)"
+                " WHERE state = 'queued'")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_dramatiq_mtime ON dramatiq_messages(mtime)")
+
+    def sql(self, stmt: str) -> str:
+        return stmt.replace("?", "%s")
+
+    __enter__ = Database.__enter__
+    __exit__ = Database.__exit__
+
+
+class BatchConsumer(Consumer):
+    """Claims messages in batches and writes acks/nacks in batches"""
+
+    CLAIM = """
+        UPDATE dramatiq_messages SET state = 'consumed', mtime = ?
+        WHERE rowid IN (
+            SELECT rowid FROM dramatiq_messages
+            WHERE queue_name = ? AND state = 'queued'
+            ORDER BY rowid LIMIT ?
+        )
+        RETURNING rowid, message
+    """
+
+    def __init__(self, *, db, queue_name: str, prefetch: int, timeout: int, batch_size: int = BATCH_SIZE):
+        self.db = db
+        self.queue_name = queue_name
+        self.prefetch = prefetch
+        self.timeout = timeout / 1000
+        self.batch_size = batch_size
+        self.misses = 0
+        self.in_processing = set()
+        self.buffer = deque()
+        # (state, message json, mtime, message_id) waiting to be written
+        self.pending: List[Tuple[str, str, int, str]] = []
+        self.lock = threading.Lock()
+
+    def __next__(self):
+        self.flush()
+        if self.buffer:
+            return MessageProxy(self.buffer.popleft())
+
+        free = self.prefetch - len(self.in_processing)
+        if free <= 0:
+            self.misses, backoff_ms = compute_backoff(self.misses, max_backoff=1000)
+            time.sleep(backoff_ms / 1000)
+            return None
+
+        messages = self.claim(min(free, self.batch_size))
+        if messages:
+            self.misses = 0
+            self.buffer.extend(messages[1:])
+            return MessageProxy(messages[0])
+
+        self.wait()
+        return None
+
+    def claim(self, limit: int) -> List[Message]:
+        """Mark up to limit queued messages as consumed, in enqueue order"""
+        with self.db as cursor:
+            cursor.execute(self.db.sql(self.CLAIM), (int(time.time()), self.queue_name, limit))
+            rows = cursor.fetchall()
+        messages = [Message.decode(payload.encode("utf-8")) for _, payload in sorted(rows, key=lambda row: row[0])]
+        with self.lock:
+            self.in_processing.update(message.message_id for message in messages)
+        if messages:
+            logger.debug("Consumed %d messages from %s.", len(messages), self.queue_name)
+        return messages
+
+    def wait(self):
+        """Called when the queue is empty, before the next poll"""
+        time.sleep(POLL_INTERVAL)
+
+    def ack(self, message):
+        self._finish(message, "done")
+
+    def nack(self, message):
+        self._finish(message, "rejected")
+
+    def _finish(self, message, state: str):
+        # Called from worker threads
+        row = (state, json.dumps(tidy4json(message)), int(time.time()), message.message_id)
+        with self.lock:
+            self.pending.append(row)
+            self.in_processing.discard(message.message_id)
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write buffered acks and nacks in one transaction"""
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if not pending:
+            return
+        try:
+            with self.db as cursor:
+                cursor.executemany(
+                    self.db.sql("UPDATE dramatiq_messages SET state = ?, message = ?, mtime = ? WHERE message_id = ?"),
+                    pending)
+        except Exception:
+            with self.lock:
+                self.pending[:0] = pending
+            raise
+
+    def requeue(self, messages):
+        message_ids = [message.message_id for message in messages]
+        message_ids.extend(message.message_id for message in self.buffer)
+        self.buffer.clear()
+        if not message_ids:
+            return
+        with self.db as cursor:
+            cursor.executemany(
+                self.db.sql("UPDATE dramatiq_messages SET state = 'queued', mtime = ?"
+                            " WHERE message_id = ? AND state = 'consumed'"),
+                [(int(time.time()), message_id) for message_id in message_ids])
+        with self.lock:
+            self.in_processing.difference_update(message_ids)
+
+    def close(self):
+        self.flush()
+        self.requeue([])
+        self.db.conn.close()
+
+
+class SQLiteBroker(dramatiq_sqlite.SQLiteBroker):
+    """dramatiq-sqlite broker with tuned pragmas and batched consumers"""
+
+    def __init__(self, *, url, results=False, batch_size: int = BATCH_SIZE, **kw):
+        super().__init__(url=url, results=results, **kw)
+        self.db.conn.close()
+        self.db = self.connect()
+        self.batch_size = batch_size
+
+    def connect(self):
+        return TunedDatabase.create(self.db_url)
+
+    def consume(self, queue_name, prefetch=1, timeout=30000):
+        return BatchConsumer(db=self.connect(), queue_name=queue_name, prefetch=prefetch, timeout=timeout,
+                             batch_size=self.batch_size)
+
+    def enqueue(self, message, *, delay=None):
+        self.emit_before("enqueue", message, delay)
+        if delay:
+            message = message.copy(queue_name=dq_name(message.queue_name))
+            message.options["eta"] = current_millis() + delay
+
+        with self.db as cursor:
+            self._insert(cursor, message)
+        self.emit_after("enqueue", message, delay)
+        return message
+
+    def _insert(self, cursor, message):
+        cursor.execute(
+            "INSERT OR REPLACE INTO dramatiq_messages (message_id, queue_name, state, message, mtime)"
+            " VALUES (?, ?, 'queued', ?, ?)",
+            (message.message_id, message.queue_name, json.dumps(tidy4json(message)), int(time.time())))
+
+
+class PostgresConsumer(BatchConsumer):
+    """Batch consumer sleeping on LISTEN instead of polling"""
+
+    CLAIM = """
+        UPDATE dramatiq_messages SET state = 'consumed', mtime = ?
+        WHERE message_id IN (
+            SELECT message_id FROM dramatiq_messages
+            WHERE queue_name = ? AND state = 'queued'
+            ORDER BY seq LIMIT ?
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING seq, message
+    """
+
+    def __init__(self, *, url: str, **kw):
+        import psycopg
+        super().__init__(**kw)
+        self.listener = psycopg.connect(url, autocommit=True)
+        self.listener.execute(f"LISTEN {CHANNEL}")
+
+    def wait(self):
+        # Wakes up on the next enqueue to any queue, or after the worker timeout to check for shutdown
+        for notify in self.listener.notifies(timeout=self.timeout, stop_after=1):
+            logger.debug("Woken up by an enqueue on %s.", notify.payload)
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.listener.close()
+
+
+class PostgresBroker(SQLiteBroker):
+    """Broker storing messages in PostgreSQL, with the same batching as SQLiteBroker"""
+
+    def __init__(self, *, url, batch_size: int = BATCH_SIZE, **kw):
+        Broker.__init__(self, **kw)
+        self.db_url = url
+        self.db = self.connect()
+        self.backend = None
+        self.batch_size = batch_size
+
+    def connect(self):
+        return PostgresDatabase(self.db_url)
+
+    def consume(self, queue_name, prefetch=1, timeout=30000):
+        return PostgresConsumer(url=self.db_url, db=self.connect(), queue_name=queue_name, prefetch=prefetch,
+                                timeout=timeout, batch_size=self.batch_size)
+
+    def _insert(self, cursor, message):
+        cursor.execute(
+            "INSERT INTO dramatiq_messages (message_id, queue_name, state, message, mtime)"
+            " VALUES (%s, %s, 'queued', %s, %s)"
+            " ON CONFLICT (message_id) DO UPDATE SET queue_name = EXCLUDED.queue_name, state = 'queued',"
+            " message = EXCLUDED.message, mtime = EXCLUDED.mtime",
+            (message.message_id, message.queue_name, json.dumps(tidy4json(message)), int(time.time())))
+        # Delivered to listening consumers when the transaction commits
+        cursor.execute("SELECT pg_notify(%s, %s)", (CHANNEL, message.queue_name))
+
+    def queue_depth(self) -> Tuple[Dict[Tuple[str, str], int], Dict[str, float]]:
+        """Messages per (queue, state) and age of the oldest queued message per queue (see metrics.queue_depth)"""
+        with self.db as cursor:
+            cursor.execute(
+                "SELECT queue_name, state, COUNT(*), MIN(mtime) FROM dramatiq_messages"
+                " WHERE state IN ('queued', 'consumed') GROUP BY queue_name, state")
+            rows = cursor.fetchall()
+        now = time.time()
+        depth = {(queue, state): count for queue, state, count, _ in rows}
+        oldest = {queue: max(now - mtime, 0.0) for queue, state, _, mtime in rows if state == 'queued'}
+        return depth, oldest
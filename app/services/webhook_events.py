@@ -0,0 +1,230 @@
+"""
+Stripe webhook event processing shared by the webhook handler and the
+replay/backfill tool (scripts/replay_webhooks.py).
+
+Events are reduced to the final subscription state per Stripe subscription,
+then applied to users with batched UPDATEs instead of one
+query + save() per event.
+
+Usage:
+    from app.services.webhook_events import process_events
+    stats = process_events(iter_jsonl_events('events.jsonl'), batch_size=500)
+"""
+from typing import Optional, Dict, Any, Callable, Iterable, Iterator, List, Tuple
+from datetime import datetime, timedelta
+import json
+import time
+
+from app.services.entitlements import entitlements, subscription_tier, PLAN_TIERS, TIER_NONE
+
+
+HANDLED_EVENT_TYPES = (
+    'checkout.session.completed',
+    'customer.subscription.updated',
+    'customer.subscription.deleted',
+)
+
+# Default subscription length when the event doesn't carry a period end
+DEFAULT_PERIOD = timedelta(days=30)
+
+
+def iter_jsonl_events(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream events from a JSONL export (one Stripe event per line). Use '-' for stdin."""
+    import sys
+
+    f = sys.stdin if path == '-' else open(path, 'r')
+    try:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _event_time(event: Dict[str, Any]) -> datetime:
+    created = event.get('created')
+    return datetime.utcfromtimestamp(created) if created else datetime.utcnow()
+
+
+def _event_price_id(obj: Dict[str, Any]) -> Optional[str]:
+    """Price id from a checkout session (metadata/line_items) or a subscription (items)"""
+    price_id = (obj.get('metadata') or {}).get('price_id')
+    if price_id:
+        return price_id
+    line_items = obj.get('line_items')
+    if isinstance(line_items, list) and line_items:
+        return line_items[0].get('price')
+    items = (obj.get('items') or {}).get('data') or []
+    if items:
+        price = items[0].get('price')
+        return price.get('id') if isinstance(price, dict) else price
+    return None
+
+
+def coalesce_subscription_events(
+    events: Iterable[Dict[str, Any]],
+    plan_for_price: Optional[Callable[[Optional[str]], Optional[str]]] = None,
+) -> Tuple[Dict[str, Dict[str, Any]], int]:
+    """
+    Reduce a stream of events to the final state per subscription id.
+
+    Returns (states, events_read). Each state holds the user columns to write
+    plus the lookup keys ('customer_id' and/or 'email' from checkout, 'subscription_id'). Events
+    older than what was already applied for a subscription are ignored, so
+    out-of-order exports still converge on the latest state.
+
+    `plan_for_price` resolves price ids to plans (defaults to the entitlements
+    config mapping; process_events uses the synced plan catalog).
+    """
+    plan_for_price = plan_for_price or entitlements.plan_for_price
+    states: Dict[str, Dict[str, Any]] = {}
+    events_read = 0
+
+    for event in events:
+        events_read += 1
+        event_type = event.get('type')
+        if event_type not in HANDLED_EVENT_TYPES:
+            continue
+
+        obj = event['data']['object']
+        created = event.get('created') or 0
+
+        if event_type == 'checkout.session.completed':
+            subscription_id = obj.get('subscription')
+            # Sessions created for an existing customer only carry the email in customer_details
+            email = obj.get('customer_email') or (obj.get('customer_details') or {}).get('email')
+            if not (email or obj.get('customer')) or not subscription_id:
+                continue
+        else:
+            subscription_id = obj['id']
+
+        state = states.setdefault(subscription_id, {'subscription_id': subscription_id, 'fields': {}, 'created': -1})
+
+        if event_type == 'checkout.session.completed':
+            # Link info is kept whatever the order: it is how we find the user
+            if obj.get('customer'):
+                state['customer_id'] = obj['customer']
+            if email:
+                state['email'] = email
+            state['fields']['stripe_customer_id'] = obj.get('customer')
+            state['fields']['stripe_subscription_id'] = subscription_id
+
+        if created < state['created']:
+            continue
+        state['created'] = created
+
+        fields = state['fields']
+        plan = plan_for_price(_event_price_id(obj))
+
+        if event_type == 'checkout.session.completed':
+            fields['subscription_status'] = 'active'
+            fields['subscription_plan'] = plan or fields.get('subscription_plan') or 'basic'
+            fields['subscription_ends_at'] = _event_time(event) + DEFAULT_PERIOD
+            state.pop('ends_at_if_unset', None)
+
+        elif event_type == 'customer.subscription.updated':
+            fields['subscription_status'] = obj['status']
+            if plan:
+                fields['subscription_plan'] = plan
+            if 'current_period_end' in obj:
+                fields['subscription_ends_at'] = datetime.utcfromtimestamp(obj['current_period_end'])
+                state.pop('ends_at_if_unset', None)
+
+        elif event_type == 'customer.subscription.deleted':
+            fields['subscription_status'] = 'canceled'
+            # Only set end date if not already set
+            if 'canceled_at' in obj and 'subscription_ends_at' not in fields:
+                state['ends_at_if_unset'] = datetime.utcfromtimestamp(obj['canceled_at'])
+
+        # Entitlement tier follows the final status/plan. When the plan isn't known
+        # from the events (entitled status, no price), it is derived from the stored plan.
+        if fields['subscription_status'] in ('active', 'trialing') and 'subscription_plan' not in fields:
+            fields.pop('subscription_tier', None)
+            state['tier_from_stored_plan'] = True
+        else:
+            fields['subscription_tier'] = subscription_tier(fields.get('subscription_plan'), fields['subscription_status'])
+            state.pop('tier_from_stored_plan', None)
+
+    return states, events_read
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+# Entitlement tier of the stored plan, for states whose plan isn't known from the events
+STORED_PLAN_TIER = 'CASE subscription_plan %s ELSE %d END' % (
+    ' '.join('WHEN %s THEN %d' % (_quote(plan), tier) for plan, tier in PLAN_TIERS.items()),
+    TIER_NONE,
+)
+
+# How a state finds its user, first lookup whose keys the state has wins.
+# Checkouts match the Stripe customer; the email is only used when no user has
+# that customer id yet (first checkout), since another account may carry the
+# Stripe customer's current email.
+LOOKUPS = (
+    (('customer_id', 'email'), 'id = COALESCE((SELECT id FROM "user" WHERE stripe_customer_id = ?), '
+                               '(SELECT id FROM "user" WHERE email = ? AND stripe_customer_id IS NULL))'),
+    (('customer_id',), 'stripe_customer_id = ?'),
+    (('email',), 'email = ?'),
+    (('subscription_id',), 'stripe_subscription_id = ?'),
+)
+
+
+def apply_subscription_states(states: Iterable[Dict[str, Any]], batch_size: int = 500) -> int:
+    """
+    Write coalesced states to the user table with batched UPDATEs.
+    States are grouped by shape (lookup key + columns) so each batch is a
+    single executemany. Returns the number of rows updated.
+    """
+    from hyperflask.factory import db
+    from app.services.db_sql import executemany
+
+    groups: Dict[Tuple, List[List[Any]]] = {}
+    for state in states:
+        keys, where = next(lookup for lookup in LOOKUPS if all(k in state for k in lookup[0]))
+        columns = tuple(sorted(state['fields']))
+        shape = (where, columns, 'ends_at_if_unset' in state, 'tier_from_stored_plan' in state)
+        params = [state['fields'][name] for name in columns]
+        if 'ends_at_if_unset' in state:
+            params.append(state['ends_at_if_unset'])
+        params.extend(state[k] for k in keys)
+        groups.setdefault(shape, []).append(params)
+
+    rows_updated = 0
+    for (where, columns, ends_at_if_unset, tier_from_stored_plan), rows in groups.items():
+        assignments = [f'{name} = ?' for name in columns]
+        if ends_at_if_unset:
+            assignments.append('subscription_ends_at = COALESCE(subscription_ends_at, ?)')
+        if tier_from_stored_plan:
+            assignments.append(f'subscription_tier = {STORED_PLAN_TIER}')
+        stmt = f'UPDATE "user" SET {", ".join(assignments)} WHERE {where}'
+
+        for start in range(0, len(rows), batch_size):
+            with db as tx:
+                rows_updated += executemany(tx, stmt, rows[start:start + batch_size])
+
+    return rows_updated
+
+
+def process_events(events: Iterable[Dict[str, Any]], batch_size: int = 500) -> Dict[str, Any]:
+    """Coalesce and apply events, returning throughput stats"""
+    from app.services.plan_catalog import plan_catalog
+
+    start = time.perf_counter()
+    states, events_read = coalesce_subscription_events(events, plan_for_price=plan_catalog.plan_for_price)
+    coalesced = time.perf_counter()
+    rows_updated = apply_subscription_states(states.values(), batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'events_read': events_read,
+        'subscriptions': len(states),
+        'rows_updated': rows_updated,
+        'coalesce_seconds': coalesced - start,
+        'apply_seconds': elapsed - (coalesced - start),
+        'elapsed_seconds': elapsed,
+        'events_per_second': events_read / elapsed if elapsed else float(events_read),
+    }
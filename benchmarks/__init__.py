@@ -0,0 +1,9 @@
+"""
+Page latency benchmarks against a large seeded database.
+
+    python -m benchmarks --scale small                # run, compare with benchmarks/baselines/small.json
+    python -m benchmarks --scale small --update-baseline
+
+See benchmarks/pages.py for the benchmarked requests and benchmarks/dataset.py
+for the seeded data.
+"""
@@ -0,0 +1,164 @@
+"""
+Run the page latency benchmarks.
+
+Usage:
+    python -m benchmarks --scale small                      # seed (once) and compare with the baseline
+    python -m benchmarks --scale large --iterations 50
+    python -m benchmarks --scale small --update-baseline    # record benchmarks/baselines/small.json
+    python -m benchmarks --only /shop --only /admin         # some pages
+    python -m benchmarks --database-uri postgresql://localhost/bench
+
+The benchmark database (database/bench-<scale>.db by default) is seeded on
+the first run and reused afterwards; pass --reseed to rebuild it. Exits with
+status 1 when a page regressed against the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+
+
+def parse_args(argv=None):
+    from benchmarks.dataset import SCALES
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Page latency benchmarks")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    for table in ("users", "products", "entries", "orders"):
+        parser.add_argument(f"--{table}", type=int, help=f"override the number of {table} for the scale")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the dataset")
+    parser.add_argument("--database-uri", help="default: sqlite://database/bench-<scale>.db")
+    parser.add_argument("--reseed", action="store_true", help="delete and reseed the benchmark database (SQLite)")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--only", action="append", metavar="ROUTE", help="benchmark only these page routes")
+    parser.add_argument("--baseline", help="default: benchmarks/baselines/<scale>.json")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed latency growth (0.25 = +25%%)")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="ignore latency changes smaller than this")
+    parser.add_argument("--output", help="also write the results to this file")
+    return parser.parse_args(argv)
+
+
+def prepare_database(app, db, counts, seed, reseed):
+    """Migrate, then seed unless the database already holds products"""
+    from benchmarks.dataset import generate
+
+    if reseed and db.engine.dbapi.__name__.endswith("sqlite"):
+        path = app.config["SQLORM_URI"][len("sqlite://"):]
+        db.engine.disconnect_all()
+        if os.path.exists(path):
+            os.remove(path)
+
+    db.migrate()
+    with app.app_context(), db.engine as tx:
+        if tx.fetchscalar('SELECT COUNT(*) FROM "product"'):
+            return None
+        print(f"🌱 Seeding {counts} ...")
+        start = datetime.utcnow()
+        inserted = generate(tx, counts, seed=seed)
+    print(f"✓ Seeded {sum(inserted.values())} rows in {(datetime.utcnow() - start).total_seconds():.1f}s")
+    return inserted
+
+
+def benchmark_ids(db):
+    """Ids the benchmarked URLs refer to: the benchmark user's cart and a popular product"""
+    with db.engine as tx:
+        # User 1 is the seeded admin, user 2 the benchmarked regular user
+        user_id = tx.fetchscalar('SELECT id FROM "user" WHERE id > 1 ORDER BY id LIMIT 1')
+        cart = tx.fetchall('SELECT id, user_id FROM "cartitem" ORDER BY id LIMIT 10')
+        product_id = tx.fetchscalar('SELECT product_id FROM "orderitem" GROUP BY product_id '
+                                    'ORDER BY COUNT(*) DESC LIMIT 1')
+    own = [row[0] for row in cart if row[1] == user_id] or [0]
+    other = [row[0] for row in cart if row[1] != user_id] or [0]
+    return {
+        'user_id': user_id or 1,
+        'admin_id': 1,
+        'product_id': product_id or 1,
+        'cart_item_id': own[0],
+        'other_cart_item_id': other[0],
+        'today': datetime.utcnow().date().isoformat(),
+    }
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from benchmarks.dataset import SCALES
+    from benchmarks.pages import BENCHMARKS, compare, run_benchmark
+
+    counts = dict(SCALES[args.scale])
+    for table in counts:
+        if getattr(args, table) is not None:
+            counts[table] = getattr(args, table)
+
+    # Must be set before the app loads its config
+    os.environ["FLASK_SQLORM_URI"] = args.database_uri or f"sqlite://database/bench-{args.scale}.db"
+    from hyperflask.factory import create_app, db
+    app = create_app(ROOT)
+
+    prepare_database(app, db, counts, args.seed, args.reseed)
+    ids = benchmark_ids(db)
+
+    clients = {None: app.test_client(), "user": app.test_client(), "admin": app.test_client()}
+    login(clients["user"], ids['user_id'])
+    login(clients["admin"], ids['admin_id'])
+
+    results = {}
+    for benchmark in BENCHMARKS:
+        if args.only and benchmark.route not in args.only:
+            continue
+        result = run_benchmark(clients[benchmark.user], benchmark, ids, args.iterations, args.warmup)
+        results[benchmark.name] = result
+        print(f"{benchmark.name:<60} {result['status']:>4} p50 {result['p50_ms']:>8.1f}ms "
+              f"p99 {result['p99_ms']:>8.1f}ms {result['queries']:>4} queries")
+
+    report = {
+        'meta': {
+            'scale': args.scale, 'counts': counts, 'seed': args.seed, 'iterations': args.iterations,
+            'python': platform.python_version(), 'machine': platform.machine(),
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        },
+        'pages': results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    baseline_path = args.baseline or os.path.join(BASELINES_DIR, f"{args.scale}.json")
+    if args.update_baseline:
+        with open(baseline_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Baseline written to {baseline_path}")
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print(f"\nNo baseline at {baseline_path}, run with --update-baseline to record one")
+        return 0
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline['pages'], args.tolerance, args.min_ms)
+    if not regressions:
+        print(f"\n✓ No regressions against {baseline_path}")
+        return 0
+
+    print(f"\n❌ {len(regressions)} regression(s) against {baseline_path}:")
+    for r in regressions:
+        print(f"  {r['page']}: {r['metric']} {r['baseline']} -> {r['current']}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+"""
+Deterministic synthetic data for scale testing and benchmarks.
+
+Generates rows for every model in app/models.py with production-like skew:
+    - popular products: product picks follow a Zipf distribution (a few products get most orders and posts)
+    - power users: user activity follows a Zipf distribution too
+    - long-tail categories: a handful of big categories and many small ones
+    - growth: activity is denser in recent days than at the start of the history
+
+Rows come from one random.Random per table, seeded from `seed` and the
+table name, so a given seed, scale and `now` always produce the same rows
+(and changing the size of one table doesn't reshuffle the others). Derived
+tables (daily rollups, admin stats, rollup watermarks) are computed from the
+generated rows, so they match what the periodic jobs would produce.
+
+Rows are streamed to the database without model instances: COPY on
+PostgreSQL (psycopg), batched multi-row executemany elsewhere, all in the
+caller's transaction.
+
+Usage:
+    from benchmarks.dataset import SCALES, generate
+    with db.engine as tx:
+        counts = generate(tx, SCALES['medium'], seed=42)
+
+or from the command line, see scripts/generate_data.py.
+"""
+from typing import Optional, Dict, List, Iterable, Iterator, Sequence, Tuple, Callable
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import itertools
+import random
+
+from app.services.admin_stats import PAID_ORDER_STATUSES, STAT_NAMES
+from app.services.entitlements import ENTITLED_STATUSES, subscription_tier
+from app.services.rollups import POSTS, SALES
+
+
+# Base entity counts; cart items, order items, checkout requests and rollups follow from them
+SCALES = {
+    'tiny': {'users': 200, 'products': 500, 'entries': 5_000, 'orders': 2_000},
+    'small': {'users': 5_000, 'products': 10_000, 'entries': 100_000, 'orders': 50_000},
+    'medium': {'users': 20_000, 'products': 20_000, 'entries': 500_000, 'orders': 150_000},  # ~1M rows
+    'large': {'users': 50_000, 'products': 100_000, 'entries': 1_000_000, 'orders': 500_000},
+}
+
+CATEGORIES = ['mugs', 'posters', 'shirts', 'stickers', 'books', 'prints', 'bags', 'hats'] + \
+    [f'category-{i}' for i in range(1, 33)]
+ORDER_STATUSES = ['paid', 'completed', 'shipped', 'pending', 'canceled']
+ORDER_STATUS_WEIGHTS = [55, 20, 10, 10, 5]
+SUBSCRIPTION_STATUSES = [None, 'active', 'trialing', 'past_due', 'canceled']
+SUBSCRIPTION_STATUS_WEIGHTS = [70, 18, 4, 2, 6]
+PLANS = ['basic', 'pro', 'enterprise']
+PLAN_WEIGHTS = [60, 32, 8]
+COUNTRIES = ['US', 'US', 'US', 'GB', 'DE', 'FR', 'CA', 'NL', 'AU', 'JP']
+
+# Zipf exponents: higher = more concentrated on the top ranks
+PRODUCT_SKEW = 1.1
+USER_SKEW = 0.9
+CATEGORY_SKEW = 1.3
+
+HISTORY_DAYS = 365
+BATCH_SIZE = 5_000
+
+
+def zipf_cum_weights(n: int, s: float) -> List[float]:
+    """Cumulative weights of ranks 1..n under a Zipf(s) law, for Random.choices"""
+    return list(itertools.accumulate(1.0 / rank ** s for rank in range(1, n + 1)))
+
+
+class SkewedPicker:
+    """Draws ids 1..n with Zipf popularity; which ids are popular is itself random"""
+
+    def __init__(self, rng: random.Random, n: int, s: float):
+        self.ids = list(range(1, n + 1))
+        rng.shuffle(self.ids)
+        self.cum_weights = zipf_cum_weights(n, s)
+        self.rng = rng
+
+    def pick(self, k: int = 1) -> List[int]:
+        return self.rng.choices(self.ids, cum_weights=self.cum_weights, k=k)
+
+    def one(self) -> int:
+        return self.pick()[0]
+
+
+def table_rng(seed: int, table: str) -> random.Random:
+    return random.Random(f"{seed}:{table}")
+
+
+def recent_timestamp(rng: random.Random, now: datetime, days: int = HISTORY_DAYS) -> datetime:
+    """Random time in the last `days` days, denser towards `now`"""
+    return now - timedelta(seconds=int(days * 86400 * rng.random() ** 1.5))
+
+
+class BatchWriter:
+    """Streams rows into tables: COPY on psycopg, batched executemany otherwise"""
+
+    def __init__(self, tx, batch_size: int = BATCH_SIZE):
+        self.tx = tx
+        self.batch_size = batch_size
+        dbapi = tx.session.engine.dbapi
+        self.copy = dbapi.__name__.startswith("psycopg") and not dbapi.__name__.startswith("psycopg2")
+        self.placeholder = "?" if dbapi.paramstyle == "qmark" else "%s"
+        self.counts: Dict[str, int] = {}
+
+    def write(self, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+        count = self._copy(table, columns, rows) if self.copy else self._insert(table, columns, rows)
+        self.counts[table] = self.counts.get(table, 0) + count
+        return count
+
+    def _insert(self, table, columns, rows) -> int:
+        marks = ", ".join([self.placeholder] * len(columns))
+        stmt = f'INSERT INTO "{table}" ({", ".join(columns)}) VALUES ({marks})'
+        count = 0
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                return count
+            self.tx.executemany(stmt, batch)
+            count += len(batch)
+
+    def _copy(self, table, columns, rows) -> int:
+        count = 0
+        cursor = self.tx.cursor()
+        try:
+            with cursor.copy(f'COPY "{table}" ({", ".join(columns)}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row(row)
+                    count += 1
+        finally:
+            cursor.close()
+        return count
+
+    def reset_sequences(self):
+        """Move id sequences past the explicit ids (PostgreSQL)"""
+        if self.placeholder != "%s":
+            return
+        for table in self.counts:
+            self.tx.execute(
+                f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                f'COALESCE((SELECT MAX(id) FROM "{table}"), 1))'
+            )
+
+
+class DatasetGenerator:
+    """
+    Generates and writes a dataset of the given size.
+
+    Usage:
+        DatasetGenerator(SCALES['small'], seed=1).write(tx)
+    """
+
+    def __init__(self, counts: Dict[str, int], seed: int = 0, now: Optional[datetime] = None):
+        self.counts = counts
+        self.seed = seed
+        self.now = now or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.prices: List[int] = []
+        self.categories: List[str] = []
+        self.sales: Dict[Tuple[date, int], List[int]] = defaultdict(lambda: [0, 0, 0])  # orders, units, revenue
+        self.posts: Dict[Tuple[date, int], int] = defaultdict(int)
+        self.stats = dict.fromkeys(STAT_NAMES, 0)
+        self.last_entry_id = 0
+        self.last_order_update: Optional[datetime] = None
+
+    def users(self) -> Iterator[tuple]:
+        rng = table_rng(self.seed, 'user')
+        statuses = rng.choices(SUBSCRIPTION_STATUSES, SUBSCRIPTION_STATUS_WEIGHTS, k=self.counts['users'])
+        for i, status in enumerate(statuses, 1):
+            signup_at = recent_timestamp(rng, self.now)
+            plan = rng.choices(PLANS, PLAN_WEIGHTS)[0] if status else None
+            ends_at = self.now + timedelta(days=rng.randrange(-60, 30)) if status else None
+            if status in ENTITLED_STATUSES:
+                self.stats['users_subscribed'] += 1
+            self.stats['users_total'] += 1
+            yield (
+                i, f"user{i}@example.test", True, signup_at, signup_at, i == 1,
+                f"cus_gen_{i:08d}" if status else None, f"sub_gen_{i:08d}" if status else None,
+                status, plan, ends_at, subscription_tier(plan, status),
+            )
+
+    user_columns = ('id', 'email', 'email_validated', 'email_validated_at', 'signup_at', 'is_admin',
+                    'stripe_customer_id', 'stripe_subscription_id', 'subscription_status', 'subscription_plan',
+                    'subscription_ends_at', 'subscription_tier')
+
+    def products(self) -> Iterator[tuple]:
+        rng = table_rng(self.seed, 'product')
+        categories = SkewedPicker(rng, len(CATEGORIES), CATEGORY_SKEW)
+        for i in range(1, self.counts['products'] + 1):
+            price = int(min(max(rng.lognormvariate(7.6, 0.7), 100), 50_000))  # ~$20 median
+            category = CATEGORIES[categories.one() - 1]
+            gated = rng.random() < 0.1
+            requires = rng.choices(PLANS, PLAN_WEIGHTS)[0] if gated else None
+            created_at = recent_timestamp(rng, self.now)
+            self.prices.append(price)
+            self.categories.append(category)
+            yield (
+                i, f"{category.title()} #{i}", f"Generated product {i} in {category}", price, None, category,
+                rng.random() > 0.05, rng.randrange(0, 500), requires, subscription_tier(requires, 'active'),
+                created_at, created_at, 1,
+            )
+
+    product_columns = ('id', 'name', 'description', 'price', 'image_url', 'category', 'is_active',
+                       'stock_quantity', 'requires_subscription', 'required_tier', 'created_at', 'updated_at',
+                       'created_by_id')
+
+    def entries(self) -> Iterator[tuple]:
+        rng = table_rng(self.seed, 'timelineentry')
+        authors = SkewedPicker(rng, self.counts['users'], USER_SKEW)
+        products = SkewedPicker(rng, self.counts['products'], PRODUCT_SKEW)
+        for i in range(1, self.counts['entries'] + 1):
+            timestamp = recent_timestamp(rng, self.now)
+            product_id = products.one() if rng.random() < 0.3 else None
+            status = 'approved' if rng.random() < 0.9 else 'pending'
+            if product_id:
+                self.posts[(timestamp.date(), product_id)] += 1
+            self.stats['entries_total'] += 1
+            self.stats[f'entries_{status}'] += 1
+            self.last_entry_id = i
+            yield (i, authors.one(), timestamp, status, timestamp, None, f"Post {i}", product_id)
+
+    entry_columns = ('id', 'user_id', 'timestamp', 'status', 'created_at', 'photo_url', 'caption', 'product_id')
+
+    def orders(self) -> Tuple[Iterator[tuple], Callable[[], Iterator[tuple]]]:
+        """Orders, and a function draining the items of the orders drawn so far"""
+        rng = table_rng(self.seed, 'order')
+        buyers = SkewedPicker(rng, self.counts['users'], USER_SKEW)
+        products = SkewedPicker(rng, self.counts['products'], PRODUCT_SKEW)
+        items: List[tuple] = []
+        next_item = itertools.count(1)
+
+        def order_rows():
+            statuses = rng.choices(ORDER_STATUSES, ORDER_STATUS_WEIGHTS, k=self.counts['orders'])
+            for i, status in enumerate(statuses, 1):
+                created_at = recent_timestamp(rng, self.now)
+                updated_at = created_at + timedelta(minutes=rng.randrange(0, 4320))
+                paid = status in PAID_ORDER_STATUSES
+                total = 0
+                for product_id in products.pick(rng.choice((1, 1, 1, 2, 2, 3, 4))):
+                    quantity = rng.choice((1, 1, 1, 2, 3))
+                    price = self.prices[product_id - 1]
+                    total += quantity * price
+                    items.append((next(next_item), i, product_id, quantity, price,
+                                  f"{self.categories[product_id - 1].title()} #{product_id}"))
+                    if paid:
+                        day_sales = self.sales[(created_at.date(), product_id)]
+                        day_sales[0] += 1
+                        day_sales[1] += quantity
+                        day_sales[2] += quantity * price
+                self.stats['orders_total'] += 1
+                if paid:
+                    self.stats['orders_paid'] += 1
+                    self.stats['revenue_cents'] += total
+                self.last_order_update = max(self.last_order_update or updated_at, updated_at)
+                yield (
+                    i, buyers.one(), f"ORD-{i:09d}", status, total,
+                    f"pi_gen_{i:09d}" if status != 'pending' else None, 'succeeded' if paid else None,
+                    f"Customer {i}", f"{rng.randrange(1, 9999)} Main St", "Springfield",
+                    f"{rng.randrange(10000, 99999)}", rng.choice(COUNTRIES), created_at, updated_at,
+                )
+
+        def item_rows():
+            pending = items[:]
+            del items[:]
+            return iter(pending)
+
+        return order_rows(), item_rows
+
+    order_columns = ('id', 'user_id', 'order_number', 'status', 'total_amount', 'stripe_payment_intent_id',
+                     'stripe_payment_status', 'shipping_name', 'shipping_address', 'shipping_city',
+                     'shipping_postal_code', 'shipping_country', 'created_at', 'updated_at')
+    item_columns = ('id', 'order_id', 'product_id', 'quantity', 'price_at_purchase', 'product_name')
+
+    def cart_items(self) -> Iterator[tuple]:
+        """Open carts for ~20% of users (user 2 always has one), popular products over-represented"""
+        rng = table_rng(self.seed, 'cartitem')
+        products = SkewedPicker(rng, self.counts['products'], PRODUCT_SKEW)
+        item_id = itertools.count(1)
+        for user_id in range(2, self.counts['users'] + 1):
+            if user_id != 2 and rng.random() > 0.2:
+                continue
+            for product_id in sorted(set(products.pick(rng.randrange(1, 5)))):
+                yield (next(item_id), user_id, product_id, rng.choice((1, 1, 2)),
+                       self.now - timedelta(minutes=rng.randrange(0, 14 * 1440)))
+
+    cart_columns = ('id', 'user_id', 'product_id', 'quantity', 'added_at')
+
+    def checkout_requests(self) -> Iterator[tuple]:
+        rng = table_rng(self.seed, 'checkoutrequest')
+        for i in range(1, self.counts['users'] // 10 + 1):
+            status = rng.choices(('ready', 'failed', 'pending'), (85, 10, 5))[0]
+            session = f"cs_gen_{i:08d}" if status == 'ready' else None
+            yield (
+                i, rng.randrange(1, self.counts['users'] + 1), f"price_test_{rng.choice(PLANS)}_monthly", status,
+                session, f"https://checkout.stripe.com/gen/{session}" if session else None,
+                'Stripe did not respond in time' if status == 'failed' else None, recent_timestamp(rng, self.now, 30),
+            )
+
+    checkout_columns = ('id', 'user_id', 'price_id', 'status', 'session_id', 'checkout_url', 'error', 'created_at')
+
+    def plans(self) -> Iterator[tuple]:
+        from app.services.plan_catalog import plan_from_price
+        from app.services.stripe_service import MockStripeAPI
+
+        for i, price in enumerate(MockStripeAPI().list_prices()['data'], 1):
+            plan = plan_from_price(price)
+            yield (i, plan['price_id'], plan['plan'], plan['name'], plan['amount'], plan['currency'],
+                   plan['interval'], plan['features'], plan['highlighted'], True, self.now)
+
+    plan_columns = ('id', 'price_id', 'plan', 'name', 'amount', 'currency', 'interval', 'features',
+                    'highlighted', 'is_active', 'synced_at')
+
+    # Derived tables, written after the rows they summarize
+
+    def daily_sales(self) -> Iterator[tuple]:
+        for i, ((day, product_id), (orders, units, revenue)) in enumerate(sorted(self.sales.items()), 1):
+            yield (i, day, product_id, self.categories[product_id - 1], orders, units, revenue)
+
+    def daily_posts(self) -> Iterator[tuple]:
+        for i, ((day, product_id), posts) in enumerate(sorted(self.posts.items()), 1):
+            yield (i, day, product_id, posts)
+
+    def admin_stats(self) -> Iterator[tuple]:
+        for i, name in enumerate(STAT_NAMES, 1):
+            yield (i, name, self.stats[name], self.now)
+
+    def watermarks(self) -> Iterator[tuple]:
+        yield (1, SALES, None, self.last_order_update, self.now)
+        yield (2, POSTS, self.last_entry_id or None, None, self.now)
+
+    def write(self, tx, batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+        """Write every table in dependency order; returns rows per table"""
+        writer = BatchWriter(tx, batch_size)
+        writer.write('user', self.user_columns, self.users())
+        writer.write('product', self.product_columns, self.products())
+        writer.write('timelineentry', self.entry_columns, self.entries())
+
+        order_rows, item_rows = self.orders()
+        while True:
+            # Orders then the items drawn for them, a batch at a time to bound memory
+            batch = list(itertools.islice(order_rows, batch_size))
+            if not batch:
+                break
+            writer.write('order', self.order_columns, batch)
+            writer.write('orderitem', self.item_columns, item_rows())
+
+        writer.write('cartitem', self.cart_columns, self.cart_items())
+        writer.write('checkoutrequest', self.checkout_columns, self.checkout_requests())
+        writer.write('plan', self.plan_columns, self.plans())
+        writer.write('dailyproductsales', ('id', 'day', 'product_id', 'category', 'orders', 'units', 'revenue'),
+                     self.daily_sales())
+        writer.write('dailyproductposts', ('id', 'day', 'product_id', 'posts'), self.daily_posts())
+        writer.write('adminstat', ('id', 'name', 'value', 'refreshed_at'), self.admin_stats())
+        writer.write('rollupwatermark', ('id', 'name', 'last_id', 'last_timestamp', 'updated_at'), self.watermarks())
+        writer.reset_sequences()
+        return dict(writer.counts)
+
+
+def generate(tx, counts: Dict[str, int], seed: int = 0, now: Optional[datetime] = None,
+             batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+    """Generate a dataset of the given size (see SCALES) into empty tables; returns rows per table"""
+    return DatasetGenerator(counts, seed, now).write(tx, batch_size)
@@ -0,0 +1,139 @@
+"""
+Page latency benchmarks through the Flask test client.
+
+Every .jpy page under app/pages has an entry in BENCHMARKS (or in SKIPPED
+with the reason), which test_benchmarks.py checks so new pages aren't
+silently left out. Each request runs `warmup` times, then `iterations`
+times while its latency and SQL statement count are recorded.
+
+Results and baselines are JSON:
+    {"meta": {...}, "pages": {"GET /shop": {"status": 200, "p50_ms": 12.1, "p99_ms": 30.5,
+                                            "mean_ms": 14.0, "queries": 3}, ...}}
+
+A page regresses when its p50 or p99 grows by more than `tolerance` (and
+more than `min_ms`, so sub-millisecond noise is ignored), or when it runs
+more queries than in the baseline.
+"""
+from typing import Optional, Dict, Any, List, NamedTuple
+import glob
+import math
+import os
+import re
+import time
+
+from app.services.query_stats import collect_queries
+
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "pages")
+
+
+class PageBenchmark(NamedTuple):
+    route: str
+    url: str  # formatted with the dataset ids (see benchmark_ids)
+    method: str = "GET"
+    user: Optional[str] = None  # None (anonymous), "user" or "admin"
+    data: Optional[Dict[str, Any]] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.url}"
+
+
+BENCHMARKS = [
+    PageBenchmark("/", "/"),
+    PageBenchmark("/timeline", "/timeline", user="user"),
+    PageBenchmark("/pricing", "/pricing"),
+    PageBenchmark("/shop", "/shop"),
+    PageBenchmark("/shop", "/shop?available=1", user="user"),
+    PageBenchmark("/shop/product/<id>", "/shop/product/{product_id}"),
+    PageBenchmark("/shop/cart", "/shop/cart", user="user"),
+    PageBenchmark("/shop/cart/add", "/shop/cart/add", "POST", "user", {"product_id": "{product_id}"}),
+    PageBenchmark("/shop/cart/update", "/shop/cart/update", "POST", "user",
+                  {"cart_item_id": "{cart_item_id}", "quantity": "2"}),
+    # Another user's item: measures the lookup without deleting anything
+    PageBenchmark("/shop/cart/remove", "/shop/cart/remove", "POST", "user",
+                  {"cart_item_id": "{other_cart_item_id}"}),
+    PageBenchmark("/checkout/success", "/checkout/success?session_id=cs_bench"),
+    PageBenchmark("/checkout/cancel", "/checkout/cancel"),
+    PageBenchmark("/admin", "/admin", user="admin"),
+    PageBenchmark("/admin/sales", "/admin/sales", user="admin"),
+    PageBenchmark("/admin/export/<dataset>", "/admin/export/orders?from={today}&to={today}", user="admin"),
+    PageBenchmark("/admin/slow-queries", "/admin/slow-queries", user="admin"),
+    PageBenchmark("/admin/timings", "/admin/timings", user="admin"),
+    PageBenchmark("/admin/db-pool", "/admin/db-pool", user="admin"),
+    PageBenchmark("/metrics", "/metrics"),
+]
+
+SKIPPED = {
+    "/checkout/start": "Stripe round trip on the executor, see tests/test_stripe_mock_server.py",
+    "/checkout/create-session": "Stripe round trip, see tests/test_stripe_mock_server.py",
+    "/checkout/status": "needs a pending CheckoutRequest from /checkout/start",
+    "/webhooks/stripe": "signed Stripe events, see scripts/replay_webhooks.py",
+    "/readyz": "readiness probe, 503 while the warm-up runs, see tests/test_warmup.py",
+}
+
+
+def page_routes(pages_dir: str = PAGES_DIR) -> List[str]:
+    """URL rule of every .jpy page, e.g. shop/product/[id].jpy -> /shop/product/<id>"""
+    routes = []
+    for path in glob.glob(os.path.join(pages_dir, "**", "*.jpy"), recursive=True):
+        parts = os.path.relpath(path, pages_dir)[:-len(".jpy")].split(os.sep)
+        if parts[-1] == "index":
+            parts = parts[:-1]
+        routes.append("/" + "/".join(re.sub(r"\[(\w+)\]", r"<\1>", part) for part in parts))
+    return sorted(routes)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..1)"""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+def run_benchmark(client, benchmark: PageBenchmark, ids: Dict[str, Any],
+                  iterations: int = 30, warmup: int = 3) -> Dict[str, Any]:
+    """Latency percentiles (ms) and query count of one request"""
+    url = benchmark.url.format(**ids)
+    data = {key: str(value).format(**ids) for key, value in (benchmark.data or {}).items()}
+
+    def request():
+        response = client.open(url, method=benchmark.method, data=data or None)
+        response.close()
+        return response
+
+    for _ in range(warmup):
+        request()
+
+    timings, queries = [], []
+    for _ in range(iterations):
+        with collect_queries() as collector:
+            start = time.perf_counter()
+            response = request()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(collector.count)
+
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries': max(queries),
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            tolerance: float = 0.25, min_ms: float = 1.0) -> List[Dict[str, Any]]:
+    """Regressions of results against a baseline (pages missing from the baseline are new, not regressions)"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ('p50_ms', 'p99_ms'):
+            before, after = previous[metric], current[metric]
+            if after > before * (1 + tolerance) and after - before > min_ms:
+                regressions.append({'page': name, 'metric': metric, 'baseline': before, 'current': after})
+        if current['queries'] > previous['queries']:
+            regressions.append({'page': name, 'metric': 'queries',
+                                'baseline': previous['queries'], 'current': current['queries']})
+    return regressions
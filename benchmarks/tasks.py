@@ -0,0 +1,118 @@
+"""
+Task queue throughput: dramatiq-sqlite against the brokers in app/services/task_broker.py.
+
+Producer threads (standing in for web processes) enqueue no-op tasks while a
+dramatiq worker consumes them; the run ends when every task has been processed.
+
+Usage:
+    python -m benchmarks.tasks                                   # 5000 tasks, 4 producers, 8 worker threads
+    python -m benchmarks.tasks --messages 20000 --threads 16
+    python -m benchmarks.tasks --postgres-url postgresql://localhost/bench
+    python -m benchmarks.tasks --output task-throughput.json
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import dramatiq
+from dramatiq import Worker
+
+
+def make_broker(name, url):
+    """Broker by benchmark name: dramatiq-sqlite, sqlite or postgres"""
+    if name == "dramatiq-sqlite":
+        from dramatiq_sqlite import SQLiteBroker
+        return SQLiteBroker(url=url)
+    if name == "sqlite":
+        from app.services.task_broker import SQLiteBroker
+        return SQLiteBroker(url=url)
+    from app.services.task_broker import PostgresBroker
+    broker = PostgresBroker(url=url)
+    with broker.db as cursor:
+        cursor.execute("DELETE FROM dramatiq_messages WHERE queue_name IN ('bench', 'bench.DQ')")
+    return broker
+
+
+def run_throughput(broker, messages=5000, producers=4, threads=8, timeout=300.0):
+    """Enqueue messages from producer threads while a worker processes them. Returns rates per second."""
+    processed = []
+    finished = threading.Event()
+
+    @dramatiq.actor(broker=broker, queue_name="bench", actor_name="bench_noop")
+    def noop(i):
+        processed.append(i)
+        if len(processed) >= messages:
+            finished.set()
+
+    worker = Worker(broker, worker_threads=threads, worker_timeout=100)
+    worker.start()
+    start = time.perf_counter()
+
+    def produce(count):
+        for i in range(count):
+            noop.send(i)
+
+    counts = [messages // producers + (1 if i < messages % producers else 0) for i in range(producers)]
+    producer_threads = [threading.Thread(target=produce, args=(count,)) for count in counts]
+    for thread in producer_threads:
+        thread.start()
+    for thread in producer_threads:
+        thread.join()
+    enqueue_seconds = time.perf_counter() - start
+
+    completed = finished.wait(timeout)
+    seconds = time.perf_counter() - start
+    worker.stop()
+    broker.close()
+    if not completed:
+        raise RuntimeError(f"Only {len(processed)}/{messages} tasks processed in {timeout:.0f}s")
+
+    return {
+        'messages': messages,
+        'seconds': seconds,
+        'enqueue_per_s': messages / enqueue_seconds,
+        'processed_per_s': messages / seconds,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.tasks", description="Task queue throughput")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--producers", type=int, default=4, help="threads enqueueing concurrently")
+    parser.add_argument("--threads", type=int, default=8, help="dramatiq worker threads")
+    parser.add_argument("--postgres-url", help="also benchmark PostgresBroker on this database")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    directory = tempfile.mkdtemp(prefix="bench-tasks-")
+    brokers = [("dramatiq-sqlite", f"sqlite://{directory}/baseline.db"), ("sqlite", f"sqlite://{directory}/tuned.db")]
+    if args.postgres_url:
+        brokers.append(("postgres", args.postgres_url))
+
+    results = {}
+    try:
+        for name, url in brokers:
+            print(f"⏱️  {name}: {args.messages} tasks, {args.producers} producers, {args.threads} worker threads...")
+            results[name] = run_throughput(make_broker(name, url), args.messages, args.producers, args.threads)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"\n{'broker':<18}{'enqueue/s':>12}{'processed/s':>14}{'seconds':>10}")
+    for name, result in results.items():
+        print(f"{name:<18}{result['enqueue_per_s']:>12.0f}{result['processed_per_s']:>14.0f}{result['seconds']:>10.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {os.path.relpath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Initial creation of the database: creates the table of every model that doesn't exist yet.
+
+Until this folder existed, `hyperflask db init` created tables from the models
+(sqlorm's create_all). Doing the same here keeps fresh databases working and
+makes the migration a no-op on databases created that way. Tables are created
+with sqlorm's dialect-aware DDL, so this runs on both SQLite and PostgreSQL.
+"""
+from hyperflask.factory import db
+from sqlorm import ensure_transaction
+from sqlorm.schema import create_table
+
+import app.models  # noqa: F401 (registers the models)
+
+
+with ensure_transaction() as tx:
+    if tx.session.engine.dbapi.__name__.endswith("sqlite"):
+        existing = set(tx.fetchscalars("SELECT name FROM sqlite_master WHERE type = 'table'"))
+    else:
+        existing = set(tx.fetchscalars(
+            "SELECT table_name FROM information_schema.tables WHERE table_schema = current_schema()"))
+
+    for model in db.Model.__model_registry__.values():
+        if str(model.__mapper__.table) not in existing:
+            create_table(model.__mapper__)
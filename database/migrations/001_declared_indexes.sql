@@ -0,0 +1,26 @@
+-- Indexes declared in app/models.py (__table_args__)
+-- sqlorm does not create indexes from model declarations, so they only exist once created here.
+
+CREATE INDEX IF NOT EXISTS ix_user_signup_at ON "user" (signup_at);
+
+CREATE INDEX IF NOT EXISTS ix_timelineentry_timestamp ON timelineentry (timestamp);
+CREATE INDEX IF NOT EXISTS ix_timelineentry_user_timestamp ON timelineentry (user_id, timestamp);
+
+CREATE INDEX IF NOT EXISTS ix_product_category ON product (category);
+CREATE INDEX IF NOT EXISTS ix_product_is_active ON product (is_active);
+
+CREATE INDEX IF NOT EXISTS ix_cartitem_user ON cartitem (user_id);
+CREATE INDEX IF NOT EXISTS ix_cartitem_product ON cartitem (product_id);
+
+CREATE INDEX IF NOT EXISTS ix_order_user ON "order" (user_id);
+CREATE INDEX IF NOT EXISTS ix_order_status ON "order" (status);
+CREATE INDEX IF NOT EXISTS ix_order_number ON "order" (order_number);
+CREATE INDEX IF NOT EXISTS ix_order_created_at ON "order" (created_at);
+
+CREATE INDEX IF NOT EXISTS ix_orderitem_order ON orderitem (order_id);
+CREATE INDEX IF NOT EXISTS ix_orderitem_product ON orderitem (product_id);
+
+CREATE INDEX IF NOT EXISTS ix_checkoutrequest_user_status ON checkoutrequest (user_id, status);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_dailyproductsales_day_product ON dailyproductsales (day, product_id);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_dailyproductposts_day_product ON dailyproductposts (day, product_id);
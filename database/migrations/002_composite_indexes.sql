@@ -0,0 +1,22 @@
+-- Composite indexes for hot page and webhook queries
+-- Checked by tests/test_query_plans.py
+
+-- Timeline and homepage: approved entries, newest first
+CREATE INDEX IF NOT EXISTS ix_timelineentry_status_timestamp ON timelineentry (status, timestamp);
+CREATE INDEX IF NOT EXISTS ix_timelineentry_status_created_at ON timelineentry (status, created_at);
+-- Admin dashboard: latest entries of any status
+CREATE INDEX IF NOT EXISTS ix_timelineentry_created_at ON timelineentry (created_at);
+-- Product page: approved posts about a product
+CREATE INDEX IF NOT EXISTS ix_timelineentry_product_status_created_at ON timelineentry (product_id, status, created_at);
+
+-- Shop and homepage: active products, newest first
+CREATE INDEX IF NOT EXISTS ix_product_is_active_created_at ON product (is_active, created_at);
+
+-- Cart add / product page: is this product already in the cart of the user
+CREATE INDEX IF NOT EXISTS ix_cartitem_user_product ON cartitem (user_id, product_id);
+
+-- Stripe webhooks: subscription events are keyed by subscription id
+CREATE INDEX IF NOT EXISTS ix_user_stripe_subscription_id ON "user" (stripe_subscription_id);
+
+-- Rollups: orders changed since the watermark
+CREATE INDEX IF NOT EXISTS ix_order_updated_at ON "order" (updated_at);
@@ -0,0 +1,4 @@
+-- Abandoned cart sweeper (app/services/cart_sweeper.py): cart rows older / newer than the cutoff
+-- Checked by tests/test_query_plans.py
+
+CREATE INDEX IF NOT EXISTS ix_cartitem_added_at ON cartitem (added_at);
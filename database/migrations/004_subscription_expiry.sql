@@ -0,0 +1,5 @@
+-- Subscription expiry reconciliation (app/services/subscription_expiry.py):
+-- active/trialing subscriptions whose period ended before the cutoff
+-- Checked by tests/test_query_plans.py
+
+CREATE INDEX IF NOT EXISTS ix_user_subscription_status_ends_at ON "user" (subscription_status, subscription_ends_at);
@@ -0,0 +1,42 @@
+"""
+Entitlement tiers: adds user.subscription_tier and product.required_tier
+(app/services/entitlements.py) and backfills them.
+
+Databases created by 000_initial after the models got these columns already
+have them, so columns are only added where missing. Both are then computed
+from the text columns they replace in entitlement checks:
+    required_tier      from product.requires_subscription
+    subscription_tier  from user.subscription_plan, when subscription_status is active/trialing
+"""
+from sqlorm import ensure_transaction
+
+from app.services.entitlements import PLAN_TIERS, ENTITLED_STATUSES, TIER_NONE
+
+
+def quote(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def tier_case(column):
+    whens = " ".join(f"WHEN {quote(plan)} THEN {tier}" for plan, tier in PLAN_TIERS.items())
+    return f"CASE lower({column}) {whens} ELSE {TIER_NONE} END"
+
+
+with ensure_transaction() as tx:
+    sqlite = tx.session.engine.dbapi.__name__.endswith("sqlite")
+
+    def columns(table):
+        if sqlite:
+            return {row["name"] for row in tx.fetchall(f'PRAGMA table_info("{table}")')}
+        return set(tx.fetchscalars(
+            "SELECT column_name FROM information_schema.columns "
+            f"WHERE table_schema = current_schema() AND table_name = '{table}'"))
+
+    for table, column in (("user", "subscription_tier"), ("product", "required_tier")):
+        if column not in columns(table):
+            tx.execute(f'ALTER TABLE "{table}" ADD COLUMN {column} INTEGER DEFAULT {TIER_NONE}')
+
+    tx.execute(f"UPDATE product SET required_tier = {tier_case('requires_subscription')}")
+    statuses = ", ".join(quote(status) for status in ENTITLED_STATUSES)
+    tx.execute(f'UPDATE "user" SET subscription_tier = CASE WHEN subscription_status IN ({statuses}) '
+               f"THEN {tier_case('subscription_plan')} ELSE {TIER_NONE} END")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Generate a large, deterministic synthetic dataset for scale testing.
+
+Fills every table with skewed, production-like data (popular products,
+power users, long-tail categories), see benchmarks/dataset.py. Rows are
+bulk loaded (COPY on PostgreSQL), so a ~1M row dataset takes seconds.
+
+Usage:
+    python scripts/generate_data.py --scale medium                 # ~1M rows
+    python scripts/generate_data.py --scale large --seed 7
+    python scripts/generate_data.py --users 1000 --orders 200000   # custom sizes on top of --scale
+    python scripts/generate_data.py --now 2024-06-01               # identical rows on every run
+    python scripts/generate_data.py --scale small --truncate --confirm
+
+Tables must be empty (use --truncate to clear them first).
+"""
+import sys
+import os
+import argparse
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TABLES = ['rollupwatermark', 'adminstat', 'dailyproductposts', 'dailyproductsales', 'plan', 'checkoutrequest',
+          'cartitem', 'orderitem', 'order', 'timelineentry', 'product', 'user']
+
+
+def parse_args(argv=None):
+    from benchmarks.dataset import SCALES
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset")
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    for table in ("users", "products", "entries", "orders"):
+        parser.add_argument(f"--{table}", type=int, help=f"number of {table} (overrides --scale)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--now", type=datetime.fromisoformat, help="end of the generated history (default: today)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--truncate", action="store_true", help="delete existing rows first")
+    parser.add_argument("--confirm", action="store_true", help="don't ask before deleting")
+    return parser.parse_args(argv)
+
+
+def generate_data(argv=None):
+    from hyperflask.factory import create_app
+    from benchmarks.dataset import SCALES, generate
+
+    args = parse_args(argv)
+    counts = dict(SCALES[args.scale])
+    for table in counts:
+        if getattr(args, table) is not None:
+            counts[table] = getattr(args, table)
+
+    app = create_app()
+
+    with app.app_context():
+        from hyperflask.factory import db
+
+        with db.engine as tx:
+            if args.truncate:
+                if not args.confirm:
+                    response = input("⚠️  This will DELETE ALL DATA from the database. Continue? [y/N]: ")
+                    if response.lower() != 'y':
+                        print("❌ Cancelled")
+                        return
+                for table in TABLES:
+                    tx.execute(f'DELETE FROM "{table}"')
+            elif tx.fetchscalar('SELECT COUNT(*) FROM "user"'):
+                print("❌ The database already has users, run with --truncate to replace them")
+                return
+
+            print(f"🌱 Generating {counts} (seed {args.seed})...")
+            start = time.perf_counter()
+            inserted = generate(tx, counts, seed=args.seed, now=args.now, batch_size=args.batch_size)
+
+        elapsed = time.perf_counter() - start
+        total = sum(inserted.values())
+        for table, count in inserted.items():
+            print(f"  {table:<20} {count:>10,}")
+        print(f"✓ {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    generate_data()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Replay/backfill Stripe webhook events after an outage.
+
+Streams events from a JSONL export (one event per line), coalesces multiple
+events per subscription down to the final state and applies them to users
+with batched UPDATEs, then reports throughput.
+
+Usage:
+    python scripts/replay_webhooks.py events.jsonl
+    python scripts/replay_webhooks.py events.jsonl --batch-size 1000
+    stripe events list --limit 100 | jq -c '.data[]' | python scripts/replay_webhooks.py -
+    python scripts/replay_webhooks.py --dry-run events.jsonl    # coalesce only, no writes
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def replay_webhooks(path, batch_size=500, dry_run=False):
+    from hyperflask.factory import create_app
+    from app.services.webhook_events import (
+        iter_jsonl_events,
+        coalesce_subscription_events,
+        process_events,
+    )
+
+    app = create_app()
+
+    with app.app_context():
+        print(f"📼 Replaying webhook events from {'stdin' if path == '-' else path}...")
+
+        if dry_run:
+            states, events_read = coalesce_subscription_events(iter_jsonl_events(path))
+            print(f"✓ Read {events_read} events")
+            print(f"✓ Coalesced to {len(states)} subscription states (dry run, nothing written)")
+            return
+
+        stats = process_events(iter_jsonl_events(path), batch_size=batch_size)
+
+        print(f"✓ Read {stats['events_read']} events")
+        print(f"✓ Coalesced to {stats['subscriptions']} subscription states "
+              f"in {stats['coalesce_seconds']:.2f}s")
+        print(f"✓ Updated {stats['rows_updated']} users in {stats['apply_seconds']:.2f}s "
+              f"(batches of {batch_size})")
+        print(f"\n✅ Replay finished in {stats['elapsed_seconds']:.2f}s "
+              f"({stats['events_per_second']:.0f} events/s)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay Stripe webhook events from a JSONL export")
+    parser.add_argument("path", help="JSONL file with one Stripe event per line ('-' for stdin)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per batched UPDATE")
+    parser.add_argument("--dry-run", action="store_true", help="Coalesce events without writing")
+
+    args = parser.parse_args()
+
+    replay_webhooks(args.path, batch_size=args.batch_size, dry_run=args.dry_run)
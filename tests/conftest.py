@@ -1,8 +1,6 @@
 from hyperflask.factory import create_app
 import pytest
 import os
-from datetime import datetime, timedelta
-import random
 
 # Import Playwright fixtures
 pytest_plugins = ("pytest_playwright",)
@@ -34,46 +32,24 @@ from tests.fixtures.stripe_fixtures import (
 
 APP_ROOT = os.path.join(os.path.dirname(__file__), "..")
 
+# Tests get their own database, reset from a template before each test (never the dev database).
+# Point FLASK_SQLORM_URI at a PostgreSQL database to run them on Postgres (rolled back after each test).
+os.environ.setdefault("FLASK_SQLORM_URI", "sqlite://database/test.db")
+# No background warm-up thread racing the tests (see app/services/warmup.py)
+os.environ.setdefault("FLASK_WARMUP", "false")
+
 
 @pytest.fixture
 def app():
-    app = create_app(APP_ROOT)
-
-    with app.app_context():
-        # Seed test data
-        from app.models import User, TimelineEntry
-        from hyperflask.factory import db
-
-        # Check if data already exists
-        existing_users = list(User.find_all())
-        if len(existing_users) == 0:
-            # Create test users
-            with db:
-                user1 = User.create(email="user1@test.com")
-                user2 = User.create(email="user2@test.com")
-                admin = User.create(email="admin@test.com")
-
-                # Create timeline entries
-                users = [user1, user2, admin]
-                now = datetime.utcnow()
-
-                for i in range(20):
-                    days_ago = random.randint(0, 7)
-                    hours_ago = random.randint(0, 23)
-                    minutes_ago = random.randint(0, 59)
-
-                    timestamp = now - timedelta(days=days_ago, hours=hours_ago, minutes=minutes_ago)
-                    user = random.choice(users)
+    from hyperflask.factory import db
+    from app.services.db_snapshot import DatabaseSnapshot
 
-                    TimelineEntry.create(
-                        user_id=user.id,
-                        timestamp=timestamp,
-                        status='approved',
-                        caption=f"Timeline entry {i+1} from {user.email}",
-                        photo_url=None
-                    )
+    app = create_app(APP_ROOT)
 
-    return app
+    # Migrated and seeded test data (3 users, 20 timeline entries), copied from
+    # database/snapshots/ instead of being re-created for every test
+    with DatabaseSnapshot(app, db).reset():
+        yield app
 
 
 @pytest.fixture
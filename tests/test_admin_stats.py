@@ -0,0 +1,108 @@
+"""
+Tests for the precomputed admin dashboard stats.
+"""
+import pytest
+
+from app.services.admin_stats import STAT_NAMES, compute_stats, get_stats, refresh_stats
+
+
+SCHEMA = [
+    'CREATE TABLE "user" (id INTEGER PRIMARY KEY, subscription_status TEXT)',
+    'CREATE TABLE timelineentry (id INTEGER PRIMARY KEY, status TEXT)',
+    'CREATE TABLE "order" (id INTEGER PRIMARY KEY, status TEXT, total_amount INTEGER)',
+    'CREATE TABLE adminstat (id INTEGER PRIMARY KEY, name TEXT UNIQUE, value INTEGER, refreshed_at TIMESTAMP)',
+]
+
+
+@pytest.fixture
+def stats_db(monkeypatch):
+    """In-memory SQLite engine standing in for the app database"""
+    import hyperflask.factory
+    from sqlorm import Engine
+
+    engine = Engine.from_uri("sqlite://:memory:", max_pool_conns=1)
+    with engine as tx:
+        for stmt in SCHEMA:
+            tx.execute(stmt)
+    monkeypatch.setattr(hyperflask.factory, "db", engine)
+    return engine
+
+
+class TestAdminStats:
+    """Test SQL aggregate counters and the summary table"""
+
+    def test_compute_stats_matches_rows(self, app):
+        with app.app_context():
+            from hyperflask.factory import db
+
+            stats = compute_stats()
+
+            assert set(stats) == set(STAT_NAMES)
+            with db as tx:
+                assert stats['users_total'] == tx.fetchscalar('SELECT COUNT(*) FROM "user"')
+                assert stats['entries_total'] == tx.fetchscalar('SELECT COUNT(*) FROM timelineentry')
+                assert stats['entries_approved'] == tx.fetchscalar(
+                    "SELECT COUNT(*) FROM timelineentry WHERE status = 'approved'")
+
+    def test_revenue_counts_paid_orders_only(self, app, db_session):
+        from app.models import Order, User
+
+        with db_session:
+            user = User.find_one(order_by='id')
+            before = compute_stats()
+            Order.create(user_id=user.id, order_number='ORD-STATS-1', status='paid', total_amount=1500)
+            Order.create(user_id=user.id, order_number='ORD-STATS-2', status='pending', total_amount=900)
+
+        stats = compute_stats()
+
+        assert stats['orders_total'] == before['orders_total'] + 2
+        assert stats['orders_paid'] == before['orders_paid'] + 1
+        assert stats['revenue_cents'] == before['revenue_cents'] + 1500
+
+    def test_refresh_replaces_stored_rows(self, app):
+        with app.app_context():
+            from hyperflask.factory import db
+
+            refresh_stats()
+            refresh_stats()
+
+            with db as tx:
+                assert tx.fetchscalar('SELECT COUNT(*) FROM adminstat') == len(STAT_NAMES)
+            stats = get_stats()
+            assert stats['users_total'] >= 3
+            assert stats['refreshed_at'] is not None
+
+    def test_get_stats_before_first_refresh(self, app):
+        with app.app_context():
+            from hyperflask.factory import db
+            from app.models import AdminStat
+
+            with db as tx:
+                tx.execute('DELETE FROM adminstat')
+
+            stats = get_stats()
+
+            assert stats['users_total'] == 0
+            assert stats['refreshed_at'] is None
+            assert AdminStat.find_one() is None
+
+
+class TestAdminStatsSQL:
+    """Test the aggregate and refresh statements against SQLite"""
+
+    def test_compute_and_refresh(self, stats_db):
+        with stats_db as tx:
+            tx.executemany('INSERT INTO "user" (subscription_status) VALUES (?)', [('active',), ('trialing',), ('canceled',)])
+            tx.executemany('INSERT INTO timelineentry (status) VALUES (?)', [('approved',), ('pending',), ('approved',)])
+            tx.executemany('INSERT INTO "order" (status, total_amount) VALUES (?, ?)', [('paid', 1500), ('pending', 900)])
+
+        stats = refresh_stats()
+
+        assert stats == {
+            'users_total': 3, 'users_subscribed': 2,
+            'entries_total': 3, 'entries_approved': 2, 'entries_pending': 1,
+            'orders_total': 2, 'orders_paid': 1, 'revenue_cents': 1500,
+        }
+        refresh_stats()
+        with stats_db as tx:
+            assert dict(tx.fetchall('SELECT name, value FROM adminstat')) == stats
@@ -0,0 +1,173 @@
+"""
+Tests for the page benchmark suite (benchmarks/).
+"""
+import random
+from datetime import datetime
+
+import pytest
+from sqlorm import Engine
+
+from benchmarks.dataset import SkewedPicker, generate
+from benchmarks.pages import BENCHMARKS, SKIPPED, compare, page_routes, percentile
+from benchmarks.tasks import make_broker, run_throughput
+
+
+SCHEMA = [
+    'CREATE TABLE "user" (id INTEGER PRIMARY KEY, email TEXT, email_validated BOOLEAN, email_validated_at TIMESTAMP, '
+    'signup_at TIMESTAMP, is_admin BOOLEAN, stripe_customer_id TEXT UNIQUE, stripe_subscription_id TEXT, '
+    'subscription_status TEXT, subscription_plan TEXT, subscription_ends_at TIMESTAMP, subscription_tier INTEGER)',
+    'CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT NOT NULL, description TEXT, price INTEGER NOT NULL, '
+    'image_url TEXT, category TEXT, is_active BOOLEAN, stock_quantity INTEGER, requires_subscription TEXT, '
+    'required_tier INTEGER, created_at TIMESTAMP, updated_at TIMESTAMP, created_by_id INTEGER)',
+    'CREATE TABLE timelineentry (id INTEGER PRIMARY KEY, user_id INTEGER, timestamp TIMESTAMP, status TEXT, '
+    'created_at TIMESTAMP, photo_url TEXT, caption TEXT, product_id INTEGER)',
+    'CREATE TABLE "order" (id INTEGER PRIMARY KEY, user_id INTEGER, order_number TEXT UNIQUE, status TEXT, '
+    'total_amount INTEGER, stripe_payment_intent_id TEXT, stripe_payment_status TEXT, shipping_name TEXT, '
+    'shipping_address TEXT, shipping_city TEXT, shipping_postal_code TEXT, shipping_country TEXT, '
+    'created_at TIMESTAMP, updated_at TIMESTAMP)',
+    'CREATE TABLE orderitem (id INTEGER PRIMARY KEY, order_id INTEGER, product_id INTEGER, quantity INTEGER, '
+    'price_at_purchase INTEGER, product_name TEXT)',
+    'CREATE TABLE cartitem (id INTEGER PRIMARY KEY, user_id INTEGER, product_id INTEGER, quantity INTEGER, '
+    'added_at TIMESTAMP)',
+    'CREATE TABLE checkoutrequest (id INTEGER PRIMARY KEY, user_id INTEGER, price_id TEXT, status TEXT, '
+    'session_id TEXT, checkout_url TEXT, error TEXT, created_at TIMESTAMP)',
+    'CREATE TABLE plan (id INTEGER PRIMARY KEY, price_id TEXT UNIQUE, plan TEXT, name TEXT, amount INTEGER, '
+    'currency TEXT, interval TEXT, features TEXT, highlighted BOOLEAN, is_active BOOLEAN, synced_at TIMESTAMP)',
+    'CREATE TABLE adminstat (id INTEGER PRIMARY KEY, name TEXT UNIQUE, value INTEGER, refreshed_at TIMESTAMP)',
+    'CREATE TABLE dailyproductsales (id INTEGER PRIMARY KEY, day DATE, product_id INTEGER, category TEXT, '
+    'orders INTEGER, units INTEGER, revenue INTEGER, UNIQUE (day, product_id))',
+    'CREATE TABLE dailyproductposts (id INTEGER PRIMARY KEY, day DATE, product_id INTEGER, posts INTEGER, '
+    'UNIQUE (day, product_id))',
+    'CREATE TABLE rollupwatermark (id INTEGER PRIMARY KEY, name TEXT UNIQUE, last_id INTEGER, '
+    'last_timestamp TIMESTAMP, updated_at TIMESTAMP)',
+]
+TABLES = ['user', 'product', 'timelineentry', 'order', 'orderitem', 'cartitem', 'checkoutrequest', 'plan',
+          'adminstat', 'dailyproductsales', 'dailyproductposts', 'rollupwatermark']
+
+COUNTS = {'users': 20, 'products': 30, 'entries': 200, 'orders': 50}
+
+
+def make_engine():
+    engine = Engine.from_uri("sqlite://:memory:", max_pool_conns=1)
+    with engine as tx:
+        tx.execute(SCHEMA)
+    return engine
+
+
+@pytest.fixture
+def engine():
+    engine = make_engine()
+    yield engine
+    engine.disconnect_all()
+
+
+def dump(engine):
+    with engine as tx:
+        return {table: [tuple(row) for row in tx.fetchall(f'SELECT * FROM "{table}" ORDER BY id')] for table in TABLES}
+
+
+class TestPageCoverage:
+    """Every page is benchmarked or skipped with a reason"""
+
+    def test_all_pages_covered(self):
+        covered = {benchmark.route for benchmark in BENCHMARKS} | set(SKIPPED)
+        assert set(page_routes()) - covered == set()
+
+    def test_no_stale_entries(self):
+        assert {benchmark.route for benchmark in BENCHMARKS} | set(SKIPPED) <= set(page_routes())
+
+
+class TestComparison:
+    """Test percentiles and regression detection"""
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert percentile(values, 0.50) == 50
+        assert percentile(values, 0.99) == 99
+        assert percentile([3.0], 0.99) == 3.0
+
+    def test_compare(self):
+        baseline = {
+            'GET /shop': {'p50_ms': 10.0, 'p99_ms': 20.0, 'queries': 3},
+            'GET /': {'p50_ms': 0.5, 'p99_ms': 1.0, 'queries': 1},
+        }
+        results = {
+            'GET /shop': {'p50_ms': 11.0, 'p99_ms': 30.0, 'queries': 4},
+            'GET /': {'p50_ms': 0.9, 'p99_ms': 1.5, 'queries': 1},  # +80%, but under min_ms
+            'GET /new': {'p50_ms': 100.0, 'p99_ms': 200.0, 'queries': 50},
+        }
+
+        regressions = compare(results, baseline, tolerance=0.25, min_ms=1.0)
+
+        assert [(r['page'], r['metric']) for r in regressions] == [('GET /shop', 'p99_ms'), ('GET /shop', 'queries')]
+
+
+class TestDataset:
+    """Test the synthetic data generator"""
+
+    def test_every_table_is_filled(self, engine):
+        with engine as tx:
+            inserted = generate(tx, COUNTS, batch_size=7)
+
+        assert set(inserted) == set(TABLES)
+        assert (inserted['user'], inserted['product'], inserted['timelineentry'], inserted['order']) == (20, 30, 200, 50)
+        assert all(inserted.values())
+        with engine as tx:
+            assert tx.fetchscalar('SELECT COUNT(*) FROM orderitem') == inserted['orderitem']
+            assert tx.fetchscalar('SELECT COUNT(*) FROM cartitem WHERE user_id = 2') > 0
+
+    def test_derived_tables_match_rows(self, engine):
+        with engine as tx:
+            generate(tx, COUNTS)
+
+            mismatched = tx.fetchscalar(
+                'SELECT COUNT(*) FROM "order" o WHERE total_amount != '
+                '(SELECT SUM(quantity * price_at_purchase) FROM orderitem WHERE order_id = o.id)')
+            assert mismatched == 0
+            revenue = tx.fetchscalar(
+                "SELECT SUM(total_amount) FROM \"order\" WHERE status IN ('paid', 'shipped', 'completed')")
+            assert tx.fetchscalar("SELECT value FROM adminstat WHERE name = 'revenue_cents'") == revenue
+            assert tx.fetchscalar('SELECT SUM(revenue) FROM dailyproductsales') == revenue
+            assert tx.fetchscalar('SELECT SUM(posts) FROM dailyproductposts') == \
+                tx.fetchscalar('SELECT COUNT(*) FROM timelineentry WHERE product_id IS NOT NULL')
+
+    def test_is_deterministic(self, engine):
+        other = make_engine()
+        for e in (engine, other):
+            with e as tx:
+                generate(tx, COUNTS, seed=7, now=datetime(2024, 6, 1))
+
+        assert dump(engine) == dump(other)
+        other.disconnect_all()
+
+    def test_tables_are_seeded_independently(self, engine):
+        other = make_engine()
+        with engine as tx:
+            generate(tx, COUNTS, now=datetime(2024, 6, 1))
+        with other as tx:
+            generate(tx, dict(COUNTS, entries=50), now=datetime(2024, 6, 1))
+
+        rows, other_rows = dump(engine), dump(other)
+        assert rows['user'] == other_rows['user']
+        assert rows['order'] == other_rows['order']
+        other.disconnect_all()
+
+    def test_popularity_is_skewed(self):
+        picker = SkewedPicker(random.Random(1), 1000, 1.1)
+        picks = picker.pick(20_000)
+
+        top = sorted((picks.count(i) for i in set(picks)), reverse=True)
+        # The 10 most popular ids (1%) get a large share of the picks
+        assert sum(top[:10]) > 0.3 * len(picks)
+
+
+class TestTaskThroughput:
+    """Test the task queue benchmark"""
+
+    def test_run_throughput(self, tmp_path):
+        broker = make_broker("sqlite", f"sqlite://{tmp_path}/tasks.db")
+
+        result = run_throughput(broker, messages=100, producers=2, threads=2)
+
+        assert result['messages'] == 100
+        assert result['processed_per_s'] > 0 and result['enqueue_per_s'] > 0
@@ -0,0 +1,90 @@
+"""
+Tests for the abandoned cart sweeper.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.cart_sweeper import sweep_abandoned_carts
+
+
+@pytest.fixture
+def cart_db(monkeypatch):
+    """In-memory SQLite engine standing in for the app database"""
+    import hyperflask.factory
+    from sqlorm import Engine
+
+    engine = Engine.from_uri("sqlite://:memory:", max_pool_conns=1)
+    with engine as tx:
+        tx.execute("CREATE TABLE cartitem (id INTEGER PRIMARY KEY, user_id INTEGER, product_id INTEGER, added_at TIMESTAMP)")
+    monkeypatch.setattr(hyperflask.factory, "db", engine)
+    return engine
+
+
+def add_items(user, product, *ages_in_days):
+    from app.models import CartItem
+
+    now = datetime.utcnow()
+    return [CartItem.create(user_id=user.id, product_id=product.id, added_at=now - timedelta(days=days))
+            for days in ages_in_days]
+
+
+def cart_size(db, user_id):
+    with db as tx:
+        return tx.fetchscalar("SELECT COUNT(*) FROM cartitem WHERE user_id = ?", [user_id])
+
+
+class TestCartSweeper:
+    """Test batched deletion of abandoned carts"""
+
+    def test_deletes_abandoned_carts_only(self, app, db_session):
+        from app.models import Product, User
+
+        with db_session:
+            abandoned, active, _ = User.find_all(order_by='id', limit=3)
+            product = Product.create(name='Sweeper Mug', price=1000)
+            add_items(abandoned, product, 40, 60)
+            add_items(active, product, 45, 1)
+
+        stats = sweep_abandoned_carts(max_age=timedelta(days=30), pause=0)
+
+        assert stats['deleted'] == 2
+        assert cart_size(db_session, abandoned.id) == 0
+        # A recent item keeps the whole cart
+        assert cart_size(db_session, active.id) == 2
+
+    def test_deletes_in_batches(self, app, db_session):
+        from app.models import Product, User
+
+        with db_session:
+            user = User.find_one(order_by='id')
+            product = Product.create(name='Batch Mug', price=1000)
+            add_items(user, product, *[31 + i for i in range(7)])
+
+        stats = sweep_abandoned_carts(max_age=timedelta(days=30), batch_size=3, pause=0)
+
+        assert (stats['deleted'], stats['batches']) == (7, 3)
+        assert cart_size(db_session, user.id) == 0
+
+    def test_nothing_to_sweep(self, app):
+        with app.app_context():
+            stats = sweep_abandoned_carts(max_age=timedelta(days=30), pause=0)
+
+        assert (stats['deleted'], stats['batches']) == (0, 1)
+
+
+class TestSweepSQL:
+    """Test the batched DELETE against SQLite"""
+
+    def test_batches_and_rowcount(self, cart_db):
+        now = datetime.utcnow()
+        with cart_db as tx:
+            tx.executemany('INSERT INTO cartitem (user_id, product_id, added_at) VALUES (?, 1, ?)',
+                           [(1, now - timedelta(days=31 + i)) for i in range(5)] +
+                           [(2, now - timedelta(days=40)), (2, now - timedelta(days=1))])
+
+        stats = sweep_abandoned_carts(max_age=timedelta(days=30), batch_size=2, now=now, pause=0)
+
+        assert (stats['deleted'], stats['batches']) == (5, 3)
+        with cart_db as tx:
+            assert tx.fetchscalars('SELECT user_id FROM cartitem') == [2, 2]
@@ -0,0 +1,101 @@
+"""
+Tests for the database connection pool.
+"""
+import threading
+import time
+
+import pytest
+from sqlorm import Engine
+
+from app.services.db_pool import PooledEngine, PoolTimeoutError, pool_options
+
+
+def make_pool(**options):
+    return PooledEngine.from_engine(Engine.from_uri('sqlite://:memory:'), **options)
+
+
+class TestPooledEngine:
+    """Test acquire/release, limits and recycling"""
+
+    def test_connections_are_reused(self):
+        pool = make_pool(max_size=2)
+
+        conn = pool.connect()
+        pool.disconnect(conn)
+
+        assert pool.connect() is conn
+        stats = pool.get_stats()
+        assert (stats['acquires'], stats['connections_opened'], stats['in_use'], stats['idle']) == (2, 1, 1, 0)
+
+    def test_sessions_use_the_pool(self):
+        pool = make_pool(max_size=1)
+
+        with pool as tx:
+            assert tx.fetchscalar('SELECT 1') == 1
+        with pool as tx:
+            assert tx.fetchscalar('SELECT 2') == 2
+
+        assert pool.get_stats()['connections_opened'] == 1
+
+    def test_acquire_times_out_when_exhausted(self):
+        pool = make_pool(max_size=1, acquire_timeout=0.05)
+        pool.connect()
+
+        with pytest.raises(PoolTimeoutError):
+            pool.connect()
+
+        assert pool.get_stats()['timeouts'] == 1
+
+    def test_waiter_gets_released_connection(self):
+        pool = make_pool(max_size=1, acquire_timeout=2)
+        conn = pool.connect()
+        acquired = []
+
+        waiter = threading.Thread(target=lambda: acquired.append(pool.connect()))
+        waiter.start()
+        while pool.get_stats()['waiting'] == 0:
+            time.sleep(0.001)
+        pool.disconnect(conn)
+        waiter.join(1)
+
+        assert acquired == [conn]
+
+    def test_expired_connections_are_replaced(self):
+        pool = make_pool(max_size=2, max_lifetime=0.01)
+        conn = pool.connect()
+        time.sleep(0.02)
+        pool.disconnect(conn)
+
+        assert pool.connect() is not conn
+        stats = pool.get_stats()
+        assert (stats['connections_opened'], stats['connections_closed']) == (2, 1)
+
+    def test_prefill_opens_min_size(self):
+        pool = make_pool(min_size=3, max_size=5)
+        pool.prefill()
+
+        stats = pool.get_stats()
+        assert (stats['size'], stats['idle'], stats['in_use']) == (3, 3, 0)
+
+    def test_latency_histogram(self):
+        pool = make_pool(max_size=1)
+        pool.disconnect(pool.connect())
+
+        stats = pool.get_stats()
+        assert stats['acquire_buckets']['+Inf'] == 1
+        assert stats['acquire_seconds_max'] >= stats['acquire_seconds_avg'] > 0
+
+
+class TestPoolOptions:
+    """Test config parsing"""
+
+    def test_disabled_without_max_size(self):
+        assert pool_options({}) is None
+
+    def test_parses_env_strings(self):
+        options = pool_options({'DB_POOL_MIN_SIZE': '2', 'DB_POOL_MAX_SIZE': '10',
+                                'DB_POOL_MAX_LIFETIME': '1800', 'DB_POOL_MAX_IDLE': 0,
+                                'DB_PREPARE_THRESHOLD': '5'})
+
+        assert options == {'min_size': 2, 'max_size': 10, 'max_lifetime': 1800.0, 'max_idle': None,
+                           'acquire_timeout': 5.0, 'prepare_threshold': 5}
@@ -0,0 +1,107 @@
+"""
+Tests for read-replica routing, using two SQLite files as primary and replica.
+"""
+import pytest
+from flask import Flask, g, jsonify
+from flask.signals import appcontext_pushed, appcontext_tearing_down
+from sqlorm import Engine, EngineDispatcher
+from sqlorm.engine import session_context
+
+from app.services.db_router import DatabaseRouter, install_replicas
+
+
+class ReplicatedDB:
+    """Minimal stand-in for FlaskSQLORM: a primary engine plus per-app-context sessions"""
+
+    def __init__(self, uri):
+        self.engine = self.create_engine(uri)
+        self.engines = EngineDispatcher()
+        self.engines.register(self.engine, default=True)
+
+    def create_engine(self, uri, **kwargs):
+        return Engine.from_uri(uri, **kwargs)
+
+    def connect_to(self, app):
+        def pushed(sender, **kw):
+            g.sqlorm_session = self.engines.select().make_session()
+            session_context.push(g.sqlorm_session)
+
+        def tearing_down(sender, **kw):
+            session_context.pop()
+            g.sqlorm_session.close()
+
+        appcontext_pushed.connect(pushed, app, weak=False)
+        appcontext_tearing_down.connect(tearing_down, app, weak=False)
+
+
+def create_db_file(path, name):
+    engine = Engine.from_uri(f"sqlite://{path}")
+    with engine as tx:
+        tx.execute("CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT)")
+        tx.execute("INSERT INTO item (name) VALUES (?)", [name])
+    engine.disconnect_all()
+
+
+@pytest.fixture
+def replicated_app(tmp_path):
+    create_db_file(tmp_path / "primary.db", "primary")
+    create_db_file(tmp_path / "replica.db", "replica")
+
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.config["DB_REPLICA_URI"] = f"sqlite://{tmp_path}/replica.db"
+    db = ReplicatedDB(f"sqlite://{tmp_path}/primary.db")
+    db.connect_to(app)
+    install_replicas(app, db)
+    DatabaseRouter(app, db)
+
+    def names():
+        with g.sqlorm_session as tx:
+            return [row["name"] for row in tx.fetchall("SELECT name FROM item ORDER BY id")]
+
+    @app.route("/items", methods=["GET", "POST"])
+    def items():
+        return jsonify(names())
+
+    @app.post("/items/add")
+    def add_item():
+        with db.engine as tx:
+            tx.execute("INSERT INTO item (name) VALUES ('new')")
+        return jsonify(names())
+
+    @app.get("/items/touch")
+    def touch_then_read():
+        with db.engine as tx:
+            tx.execute("UPDATE item SET name = 'touched'")
+        return jsonify(names())
+
+    @app.get("/shop/cart")
+    def cart():
+        return jsonify(names())
+
+    return app
+
+
+class TestReplicaRouting:
+    """Test GET/POST routing and read-your-writes"""
+
+    def test_get_reads_replica(self, replicated_app):
+        assert replicated_app.test_client().get("/items").json == ["replica"]
+
+    def test_post_reads_primary(self, replicated_app):
+        assert replicated_app.test_client().post("/items").json == ["primary"]
+
+    def test_primary_paths(self, replicated_app):
+        assert replicated_app.test_client().get("/shop/cart").json == ["primary"]
+
+    def test_reads_after_write_are_sticky(self, replicated_app):
+        client = replicated_app.test_client()
+
+        assert client.post("/items/add").json == ["primary", "new"]
+        # The follow-up GET (e.g. after a redirect) still sees the write
+        assert client.get("/items").json == ["primary", "new"]
+        # Other clients keep reading from the replica
+        assert replicated_app.test_client().get("/items").json == ["replica"]
+
+    def test_write_during_get_moves_request_to_primary(self, replicated_app):
+        assert replicated_app.test_client().get("/items/touch").json == ["touched"]
@@ -0,0 +1,111 @@
+"""
+Tests for template-based database resets.
+"""
+import os
+
+from sqlorm import Engine
+
+from app.services.db_snapshot import (
+    build_template, clone_file, fingerprint, restore_template, savepoint_rollback, sqlite_path,
+)
+
+
+def create_notes(engine):
+    with engine as tx:
+        tx.execute("CREATE TABLE note (id INTEGER PRIMARY KEY, body TEXT)")
+        tx.execute("INSERT INTO note (body) VALUES ('seeded')")
+
+
+def count_notes(path):
+    engine = Engine.from_uri(f"sqlite://{path}")
+    with engine as tx:
+        count = tx.fetchscalar("SELECT COUNT(*) FROM note")
+    engine.disconnect_all()
+    return count
+
+
+class TestHelpers:
+    """Test paths, fingerprints and file cloning"""
+
+    def test_sqlite_path(self):
+        assert sqlite_path("sqlite://database/test.db") == "database/test.db"
+        assert sqlite_path("sqlite://:memory:") is None
+        assert sqlite_path("postgresql://user@localhost/app") is None
+
+    def test_fingerprint_follows_content(self, tmp_path):
+        migration = tmp_path / "001_init.sql"
+        migration.write_text("CREATE TABLE a (id INTEGER)")
+        key = fingerprint([str(migration)], "seed")
+
+        assert fingerprint([str(migration)], "seed") == key
+        assert fingerprint([str(migration)], "other seed") != key
+        migration.write_text("CREATE TABLE a (id INTEGER, name TEXT)")
+        assert fingerprint([str(migration)], "seed") != key
+
+    def test_clone_file(self, tmp_path):
+        src = tmp_path / "src.db"
+        src.write_bytes(b"x" * 10000)
+
+        assert clone_file(str(src), str(tmp_path / "dst.db")) in ("reflink", "copy")
+        assert (tmp_path / "dst.db").read_bytes() == src.read_bytes()
+
+
+class TestTemplates:
+    """Test building and restoring SQLite templates"""
+
+    def test_build_template(self, tmp_path):
+        template = str(tmp_path / "snapshots" / "template.db")
+        build_template(template, create_notes)
+
+        assert count_notes(template) == 1
+        assert os.listdir(tmp_path / "snapshots") == ["template.db"]
+
+    def test_restore_discards_changes(self, tmp_path):
+        template = str(tmp_path / "template.db")
+        target = str(tmp_path / "test.db")
+        build_template(template, create_notes)
+
+        restore_template(template, target)
+        engine = Engine.from_uri(f"sqlite://{target}", fine_tune=True)
+        with engine as tx:
+            tx.execute("INSERT INTO note (body) VALUES ('written by a test')")
+        engine.disconnect_all()
+        assert count_notes(target) == 2
+
+        restore_template(template, target)
+        assert count_notes(target) == 1
+        assert count_notes(template) == 1
+
+
+class TestSavepointRollback:
+    """Test per-test transactions for databases that can't be copied"""
+
+    def test_commits_are_rolled_back(self):
+        engine = Engine.from_uri("sqlite://:memory:", max_pool_conns=1)
+        create_notes(engine)
+
+        with savepoint_rollback(engine):
+            with engine as tx:
+                tx.execute("INSERT INTO note (body) VALUES ('committed')")
+            with engine as tx:
+                assert tx.fetchscalar("SELECT COUNT(*) FROM note") == 2
+
+        with engine as tx:
+            assert tx.fetchscalar("SELECT COUNT(*) FROM note") == 1
+        assert len(engine.pool) == 1
+
+    def test_rollback_returns_to_last_commit(self):
+        engine = Engine.from_uri("sqlite://:memory:", max_pool_conns=1)
+        create_notes(engine)
+
+        with savepoint_rollback(engine):
+            with engine as tx:
+                tx.execute("INSERT INTO note (body) VALUES ('committed')")
+            try:
+                with engine as tx:
+                    tx.execute("INSERT INTO note (body) VALUES ('failed')")
+                    raise ValueError()
+            except ValueError:
+                pass
+            with engine as tx:
+                assert tx.fetchscalars("SELECT body FROM note ORDER BY id") == ['seeded', 'committed']
@@ -0,0 +1,141 @@
+"""
+Tests for subscription entitlements (integer tiers) and their webhook updates.
+"""
+import os
+from types import SimpleNamespace
+
+from sqlorm import Engine
+from sqlorm.schema import execute_migration
+
+from app.services.entitlements import (
+    Entitlements,
+    plan_tier,
+    subscription_tier,
+)
+from app.services.webhook_events import coalesce_subscription_events
+
+
+def make_user(tier, authenticated=True):
+    return SimpleNamespace(is_authenticated=authenticated, subscription_tier=tier)
+
+
+class TestTiers:
+    """Test plan/status to tier mapping"""
+
+    def test_plan_tier(self):
+        assert plan_tier(None) == 0
+        assert plan_tier('basic') < plan_tier('pro') < plan_tier('Enterprise')
+        assert plan_tier('unknown') == 0
+
+    def test_subscription_tier_requires_entitled_status(self):
+        assert subscription_tier('pro', 'active') == plan_tier('pro')
+        assert subscription_tier('pro', 'trialing') == plan_tier('pro')
+        assert subscription_tier('pro', 'past_due') == 0
+        assert subscription_tier('pro', 'canceled') == 0
+
+
+class TestEntitlements:
+    """Test the Entitlements service"""
+
+    def test_price_mapping_from_config(self):
+        app = SimpleNamespace(config={'STRIPE_PRICE_PLANS': {'price_live_pro': 'Pro'}})
+        service = Entitlements(app)
+
+        assert service.plan_for_price('price_live_pro') == 'pro'
+        assert service.plan_for_price('price_test_basic_monthly') == 'basic'
+        assert service.plan_for_price('price_unknown') is None
+
+    def test_register_price(self):
+        service = Entitlements()
+        service.register_price('price_custom', 'Enterprise')
+
+        assert service.plan_for_price('price_custom') == 'enterprise'
+
+    def test_can_purchase_compares_tiers(self):
+        service = Entitlements()
+        pro_product = SimpleNamespace(required_tier=plan_tier('pro'))
+        free_product = SimpleNamespace(required_tier=0)
+
+        assert service.can_purchase(make_user(plan_tier('enterprise')), pro_product)
+        assert service.can_purchase(make_user(plan_tier('pro')), pro_product)
+        assert not service.can_purchase(make_user(plan_tier('basic')), pro_product)
+        assert not service.can_purchase(make_user(3, authenticated=False), pro_product)
+        assert service.can_purchase(make_user(None), free_product)
+
+
+class TestWebhookTiers:
+    """Test that webhook processing resolves plans and tiers"""
+
+    def test_checkout_uses_price_plan(self):
+        event = {
+            'type': 'checkout.session.completed',
+            'created': 100,
+            'data': {'object': {
+                'customer_email': 'a@example.com',
+                'customer': 'cus_1',
+                'subscription': 'sub_1',
+                'metadata': {'price_id': 'price_test_pro_monthly'},
+            }},
+        }
+
+        states, _ = coalesce_subscription_events([event])
+
+        assert states['sub_1']['fields']['subscription_plan'] == 'pro'
+        assert states['sub_1']['fields']['subscription_tier'] == plan_tier('pro')
+
+    def test_mock_checkout_line_items(self, mock_stripe_api):
+        session = mock_stripe_api.create_checkout_session(
+            customer_email='a@example.com',
+            price_id='price_test_enterprise_monthly',
+            success_url='https://example.com/success',
+            cancel_url='https://example.com/cancel'
+        )
+        completed = mock_stripe_api.complete_checkout_session(session['id'])
+
+        states, _ = coalesce_subscription_events(mock_stripe_api.events)
+
+        assert states[completed['subscription']]['fields']['subscription_tier'] == plan_tier('enterprise')
+
+    def test_cancel_drops_tier(self):
+        event = {
+            'type': 'customer.subscription.deleted',
+            'created': 100,
+            'data': {'object': {'id': 'sub_1', 'status': 'canceled'}},
+        }
+
+        states, _ = coalesce_subscription_events([event])
+
+        assert states['sub_1']['fields']['subscription_tier'] == 0
+
+    def test_update_without_price_uses_stored_plan(self):
+        event = {
+            'type': 'customer.subscription.updated',
+            'created': 100,
+            'data': {'object': {'id': 'sub_1', 'status': 'active'}},
+        }
+
+        states, _ = coalesce_subscription_events([event])
+
+        assert 'subscription_tier' not in states['sub_1']['fields']
+        assert states['sub_1']['tier_from_stored_plan']
+
+
+class TestTierMigration:
+    """Test the migration adding and backfilling the tier columns"""
+
+    def test_adds_and_backfills_tiers(self):
+        migration = os.path.join(os.path.dirname(__file__), '..', 'database', 'migrations', '005_subscription_tiers.py')
+        engine = Engine.from_uri('sqlite://:memory:', max_pool_conns=1)
+        with engine as tx:
+            tx.execute('CREATE TABLE "user" (id INTEGER PRIMARY KEY, subscription_plan TEXT, subscription_status TEXT)')
+            tx.execute('CREATE TABLE product (id INTEGER PRIMARY KEY, requires_subscription TEXT)')
+            tx.executemany('INSERT INTO "user" (subscription_plan, subscription_status) VALUES (?, ?)',
+                           [('pro', 'active'), ('Enterprise', 'trialing'), ('pro', 'canceled'), (None, None)])
+            tx.executemany('INSERT INTO product (requires_subscription) VALUES (?)', [('basic',), ('Pro',), (None,)])
+
+            execute_migration(migration)
+
+            assert tx.fetchscalars('SELECT subscription_tier FROM "user" ORDER BY id') == [
+                plan_tier('pro'), plan_tier('enterprise'), 0, 0]
+            assert tx.fetchscalars('SELECT required_tier FROM product ORDER BY id') == [
+                plan_tier('basic'), plan_tier('pro'), 0]
@@ -0,0 +1,202 @@
+"""
+Tests for the Prometheus metrics service.
+"""
+import json
+import os
+import threading
+
+import pytest
+from dramatiq import Message
+from flask import Flask
+
+from app.services.metrics import (
+    Metrics, MetricsRegistry, TaskMetricsMiddleware, merge, queue_depth, render, statement_type,
+)
+from app.services.query_stats import remove_listener
+
+
+DEAD_PID = 2 ** 22 + 1  # above the default pid_max, never a live process
+
+
+@pytest.fixture
+def metrics_app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(METRICS_DIR=str(tmp_path), METRICS_FLUSH_INTERVAL=0)
+    metrics = Metrics(app)
+
+    @app.route('/items/<int:id>')
+    def item(id):
+        return "ok"
+
+    app.metrics = metrics
+    yield app
+    remove_listener(metrics.record_query)
+
+
+def sample_lines(text, name):
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+class TestMetricTypes:
+    """Test sharded counters and histograms"""
+
+    def test_counter_sums_thread_shards(self):
+        counter = MetricsRegistry().counter("jobs_total", "Jobs", ("kind",))
+
+        def work():
+            for _ in range(1000):
+                counter.inc(("a",))
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert counter.collect() == [[["a"], 8000]]
+
+    def test_histogram_exposition(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, ("/",))
+
+        text = render(registry.snapshot())
+
+        assert '# TYPE latency_seconds histogram' in text
+        assert sample_lines(text, 'latency_seconds_bucket') == [
+            'latency_seconds_bucket{route="/",le="0.1"} 2',
+            'latency_seconds_bucket{route="/",le="1.0"} 3',
+            'latency_seconds_bucket{route="/",le="+Inf"} 4',
+        ]
+        assert 'latency_seconds_count{route="/"} 4' in text
+        assert 'latency_seconds_sum{route="/"} 3.65' in text
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.counter("hits_total", "Hits", ("path",)).inc(('say "hi"\n',))
+
+        assert 'hits_total{path="say \\"hi\\"\\n"} 1' in render(registry.snapshot())
+
+    def test_statement_type(self):
+        assert statement_type("  select * from product") == "SELECT"
+        assert statement_type("PRAGMA foreign_keys = ON") == "OTHER"
+
+
+class TestAggregation:
+    """Test summing per-process snapshots"""
+
+    def test_merge_keeps_counters_of_exited_processes(self):
+        live = {
+            'reqs_total': {'type': 'counter', 'help': '', 'labels': ['route'], 'samples': [[['/'], 3]]},
+            'pool_idle': {'type': 'gauge', 'help': '', 'labels': [], 'samples': [[[], 2]]},
+        }
+        exited = {
+            'reqs_total': {'type': 'counter', 'help': '', 'labels': ['route'], 'samples': [[['/'], 4], [['/a'], 1]]},
+            'pool_idle': {'type': 'gauge', 'help': '', 'labels': [], 'samples': [[[], 5]]},
+        }
+
+        merged = merge([(live, True), (exited, False)])
+
+        assert sorted(merged['reqs_total']['samples']) == [[['/'], 7], [['/a'], 1]]
+        assert merged['pool_idle']['samples'] == [[[], 2]]
+
+    def test_scrape_sums_other_process_files(self, metrics_app, tmp_path):
+        client = metrics_app.test_client()
+        client.get('/items/1')
+        client.get('/items/2')
+
+        other = Metrics()
+        other.requests.inc(('/items/<int:id>', 'GET', '200'), 5)
+        (tmp_path / f'{DEAD_PID}.json').write_text(json.dumps(other.registry.snapshot()))
+
+        text = metrics_app.metrics.render()
+
+        assert 'http_requests_total{route="/items/<int:id>",method="GET",status="200"} 7' in text
+        assert 'http_request_duration_seconds_count{route="/items/<int:id>"} 2' in text
+
+    def test_flush_writes_own_snapshot(self, metrics_app, tmp_path):
+        metrics_app.test_client().get('/items/1')
+        metrics_app.metrics.flush()
+
+        snapshot = json.loads((tmp_path / f'{os.getpid()}.json').read_text())
+        assert snapshot['http_requests_total']['samples'] == [[['/items/<int:id>', 'GET', '200'], 1]]
+
+
+class TestCollectors:
+    """Test Stripe, cache, and dramatiq metrics"""
+
+    def test_stripe_errors(self):
+        metrics = Metrics()
+        with metrics.stripe_call('list_prices'):
+            pass
+        with pytest.raises(TimeoutError):
+            with metrics.stripe_call('list_prices'):
+                raise TimeoutError()
+
+        assert metrics.stripe_requests.collect() == [[['list_prices'], 2]]
+        assert metrics.stripe_errors.collect() == [[['list_prices', 'TimeoutError'], 1]]
+
+    def test_cache_hit_ratio(self, metrics_app):
+        metrics = metrics_app.metrics
+        for hit in (True, True, True, False):
+            metrics.cache_lookup('plan_catalog', hit)
+
+        assert 'cache_hit_ratio{cache="plan_catalog"} 0.75' in metrics.render()
+
+    def test_task_middleware(self):
+        metrics = Metrics()
+        middleware = TaskMetricsMiddleware(metrics)
+        message = Message(queue_name='default', actor_name='update_rollups', args=(), kwargs={}, options={})
+
+        middleware.before_process_message(None, message)
+        middleware.after_process_message(None, message, exception=ValueError())
+
+        assert metrics.tasks.collect() == [[['update_rollups', 'default', 'failed'], 1]]
+        [[labels, row]] = metrics.task_duration.collect()
+        assert labels == ['update_rollups', 'default'] and sum(row[:-1]) == 1
+
+    def test_queue_depth(self, tmp_path):
+        from dramatiq_sqlite import Database
+
+        path = str(tmp_path / 'tasks.db')
+        with Database.create(f'sqlite://{path}') as cursor:
+            cursor.executemany(
+                "INSERT INTO dramatiq_messages VALUES (?, ?, ?, '{}', strftime('%s', 'now') - 60)",
+                [('m1', 'default', 'queued'), ('m2', 'default', 'queued'), ('m3', 'default', 'consumed'),
+                 ('m4', 'default', 'done')],
+            )
+
+        depth, oldest = queue_depth(f'sqlite://{path}')
+
+        assert depth == {('default', 'queued'): 2, ('default', 'consumed'): 1}
+        assert 55 < oldest['default'] < 120
+        # hyperflask passes sqlite:// broker URLs without their scheme
+        assert queue_depth(path)[0] == depth
+        assert queue_depth(f'sqlite://{tmp_path}/missing.db') == ({}, {})
+
+
+class TestMetricsPage:
+    """Test the /metrics page"""
+
+    def test_metrics_endpoint(self, client):
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        assert b'# TYPE http_requests_total counter' in response.data
+
+
+class TestConfig:
+    """Test the METRICS_ENABLED flag"""
+
+    @pytest.mark.parametrize("value, enabled", [
+        (True, True), (False, False), ("1", True), ("true", True), ("false", False), ("0", False), ("", False),
+    ])
+    def test_enabled_flag(self, tmp_path, value, enabled):
+        app = Flask(__name__)
+        app.config.update(METRICS_DIR=str(tmp_path), METRICS_ENABLED=value)
+        metrics = Metrics(app)
+        try:
+            assert metrics.enabled is enabled
+        finally:
+            remove_listener(metrics.record_query)
@@ -0,0 +1,111 @@
+"""
+Tests for the .jpy page compile cache.
+"""
+import importlib.util
+import os
+import runpy
+import sys
+
+import jinjapy
+import pytest
+from flask import Flask
+
+from app.services.page_cache import PageCache, CodeCache, CachedFileLoader
+
+
+PAGE = """---
+title = "Hello " + name
+---
+<h1>{{ title }}</h1>
+"""
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    """A Flask app with a jinjapy pages package and a templates folder, like app/"""
+    root = tmp_path / "site"
+    (root / "pages" / "shop").mkdir(parents=True)
+    (root / "templates").mkdir()
+    (root / "pages" / "index.jpy").write_text(PAGE)
+    (root / "pages" / "shop" / "cart.jpy").write_text(PAGE.replace("Hello", "Cart"))
+    (root / "templates" / "layout.html").write_text("<main>{% block content %}{% endblock %}</main>")
+
+    monkeypatch.setattr(sys, "meta_path", list(sys.meta_path))
+    app = Flask("site", root_path=str(root))
+    app.config["PAGE_CACHE_DIR"] = "cache"
+    jinjapy.register_package("cachetestpages", str(root / "pages"), "pages", env=app.jinja_env)
+    yield app
+    for name in [name for name in sys.modules if name.startswith("cachetestpages")]:
+        del sys.modules[name]
+
+
+class TestPageCache:
+    """Test the frontmatter code cache and the Jinja bytecode cache"""
+
+    def test_frontmatter_is_compiled_once(self, site):
+        cache = PageCache(site)
+        run = lambda: runpy.run_module("cachetestpages.index", {"name": "world"})
+
+        assert run()["title"] == "Hello world"
+        assert run()["title"] == "Hello world"
+
+        assert (cache.code_cache.misses, cache.code_cache.hits) == (1, 0)
+        assert cache.get_stats()["in_memory"] == 1
+
+    def test_code_is_loaded_from_disk_by_another_process(self, site):
+        PageCache(site).warm()
+
+        # A new process starts with an empty memory cache
+        cache = PageCache(site)
+        assert runpy.run_module("cachetestpages.shop.cart", {"name": "mug"})["title"] == "Cart mug"
+        assert (cache.code_cache.misses, cache.code_cache.hits) == (0, 1)
+
+    def test_changed_page_is_recompiled(self, site):
+        cache = PageCache(site)
+        runpy.run_module("cachetestpages.index", {"name": "world"})
+
+        with open(os.path.join(site.root_path, "pages", "index.jpy"), "w") as f:
+            f.write(PAGE.replace("Hello", "Bye"))
+
+        assert runpy.run_module("cachetestpages.index", {"name": "world"})["title"] == "Bye world"
+        assert cache.code_cache.misses == 2
+
+    def test_warm_fills_both_caches(self, site):
+        stats = PageCache(site).warm()
+
+        assert (stats["modules"], stats["templates"]) == (2, 3)
+        directory = os.path.join(os.path.dirname(site.root_path), "cache")
+        assert stats["directory"] == directory
+        assert len([f for f in os.listdir(directory) if f.endswith(".pyc")]) == 2
+        assert len(os.listdir(os.path.join(directory, "jinja"))) == 3
+
+        with site.app_context():
+            html = site.jinja_env.get_template("pages/index.jpy").render(title="Hi")
+        assert "<h1>Hi</h1>" in html
+
+    def test_warm_reports_pages_that_do_not_compile(self, site):
+        with open(os.path.join(site.root_path, "pages", "broken.jpy"), "w") as f:
+            f.write("---\nif True\n---\n{% if %}")
+
+        stats = PageCache(site).warm()
+
+        assert stats["modules"] == 3
+        assert [error.split(":")[0] for error in stats["errors"]] == ["cachetestpages.broken", "pages/broken.jpy"]
+
+    def test_disabled(self, site):
+        site.config["PAGE_CACHE"] = False
+        cache = PageCache(site)
+
+        assert cache.get_stats() == {"enabled": False}
+        assert site.jinja_env.bytecode_cache is None
+        spec = importlib.util.find_spec("cachetestpages.index")
+        assert not isinstance(spec.loader, CachedFileLoader)
+
+    def test_unwritable_cache_still_compiles(self, tmp_path):
+        (tmp_path / "file").write_text("")
+        cache = CodeCache(str(tmp_path / "file" / "cache"))
+        code = cache.compile("x = 1", "page.jpy")
+
+        namespace = {}
+        exec(code, namespace)
+        assert namespace["x"] == 1
@@ -0,0 +1,96 @@
+"""
+Tests for the plan catalog synced from Stripe prices.
+"""
+from app.services.plan_catalog import (
+    PlanCatalog,
+    format_amount,
+    plan_from_price,
+)
+from app.services.webhook_events import coalesce_subscription_events
+
+
+class TestPlanFromPrice:
+    """Test mapping Stripe prices to plans"""
+
+    def test_mock_prices(self, mock_stripe_api):
+        plans = {p['price_id']: p for p in map(plan_from_price, mock_stripe_api.list_prices()['data'])}
+
+        pro = plans['price_test_pro_monthly']
+        assert pro['plan'] == 'pro'
+        assert pro['name'] == 'Pro'
+        assert pro['amount'] == 2900
+        assert pro['interval'] == 'month'
+        assert pro['highlighted'] is True
+        assert 'Priority support' in pro['features'].splitlines()
+        assert plans['price_test_basic_monthly']['highlighted'] is False
+
+    def test_plan_defaults_to_product_name(self):
+        price = {
+            'id': 'price_team',
+            'unit_amount': 4900,
+            'currency': 'eur',
+            'recurring': {'interval': 'month', 'interval_count': 3},
+            'product': {'name': 'Team', 'metadata': {}},
+        }
+
+        plan = plan_from_price(price)
+
+        assert plan['plan'] == 'team'
+        assert plan['interval'] == '3 months'
+        assert plan['features'] == ''
+
+    def test_format_amount(self):
+        assert format_amount(900, 'usd') == '$9'
+        assert format_amount(950, 'eur') == '€9.50'
+        assert format_amount(1000, 'chf') == '10 CHF'
+
+
+class TestPlanCatalog:
+    """Test the in-memory catalog"""
+
+    def test_lookup_uses_loaded_index(self):
+        catalog = PlanCatalog()
+        plan = {'price_id': 'price_live_pro', 'plan': 'pro'}
+        catalog._catalog = ([plan], {'price_live_pro': plan})
+        catalog._loaded_at = float('inf')
+
+        assert catalog.get('price_live_pro') is plan
+        assert catalog.plan_for_price('price_live_pro') == 'pro'
+        assert catalog.get(None) is None
+
+    def test_unknown_price_falls_back_to_config_mapping(self):
+        catalog = PlanCatalog()
+        catalog._loaded_at = float('inf')
+
+        assert catalog.plan_for_price('price_test_basic_monthly') == 'basic'
+        assert catalog.plan_for_price('price_unknown') is None
+
+    def test_webhook_uses_catalog_plans(self):
+        event = {
+            'type': 'checkout.session.completed',
+            'created': 100,
+            'data': {'object': {
+                'customer_email': 'a@example.com',
+                'customer': 'cus_1',
+                'subscription': 'sub_1',
+                'metadata': {'price_id': 'price_live_team'},
+            }},
+        }
+
+        states, _ = coalesce_subscription_events([event], plan_for_price={'price_live_team': 'enterprise'}.get)
+
+        assert states['sub_1']['fields']['subscription_plan'] == 'enterprise'
+
+    def test_sync_populates_plan_table(self, app, stripe_service_mock, monkeypatch):
+        import app.services.plan_catalog as plan_catalog_module
+        from app.models import Plan
+
+        monkeypatch.setattr(plan_catalog_module, 'stripe_service', stripe_service_mock)
+        catalog = PlanCatalog(app)
+
+        with app.app_context():
+            assert catalog.sync() == 3
+            assert len(list(Plan.find_all(is_active=True))) == 3
+
+        assert [p['name'] for p in catalog.plans] == ['Basic', 'Pro', 'Enterprise']
+        assert catalog.get('price_test_pro_monthly')['price'] == '$29'
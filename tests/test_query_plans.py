@@ -0,0 +1,166 @@
+"""
+Query plan regression tests: hot queries must be served by an index.
+
+TestHotQueries runs the index migrations from database/migrations on a
+minimal SQLite schema and checks the plan of each hot query.
+TestPagePlans renders the pages, captures every SELECT they run and fails
+if any of them falls back to a full scan.
+"""
+import os
+
+import pytest
+from sqlorm import Engine
+from sqlorm.engine import Transaction
+from sqlorm.schema import execute_migration
+
+from app.services.query_plans import explain, full_scans, uses_index
+
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), "..", "database", "migrations")
+
+# Only the columns the indexes and hot queries need
+SCHEMA = [
+    'CREATE TABLE "user" (id INTEGER PRIMARY KEY, email TEXT, signup_at TIMESTAMP, '
+    'stripe_customer_id TEXT, stripe_subscription_id TEXT, subscription_status TEXT, subscription_ends_at TIMESTAMP)',
+    "CREATE TABLE timelineentry (id INTEGER PRIMARY KEY, user_id INTEGER, timestamp TIMESTAMP, status TEXT, "
+    "created_at TIMESTAMP, product_id INTEGER, caption TEXT)",
+    "CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, category TEXT, is_active BOOLEAN, "
+    "required_tier INTEGER, created_at TIMESTAMP)",
+    "CREATE TABLE cartitem (id INTEGER PRIMARY KEY, user_id INTEGER, product_id INTEGER, quantity INTEGER, added_at TIMESTAMP)",
+    'CREATE TABLE "order" (id INTEGER PRIMARY KEY, user_id INTEGER, status TEXT, order_number TEXT, '
+    "created_at TIMESTAMP, updated_at TIMESTAMP)",
+    "CREATE TABLE orderitem (id INTEGER PRIMARY KEY, order_id INTEGER, product_id INTEGER, quantity INTEGER)",
+    "CREATE TABLE checkoutrequest (id INTEGER PRIMARY KEY, user_id INTEGER, price_id TEXT, status TEXT, created_at TIMESTAMP)",
+    "CREATE TABLE dailyproductsales (id INTEGER PRIMARY KEY, day DATE, product_id INTEGER, revenue INTEGER)",
+    "CREATE TABLE dailyproductposts (id INTEGER PRIMARY KEY, day DATE, product_id INTEGER, posts INTEGER)",
+]
+
+# (description, statement, params, index expected to serve it)
+HOT_QUERIES = [
+    ("timeline: approved entries by timestamp",
+     "SELECT * FROM timelineentry WHERE status = ? ORDER BY timestamp DESC",
+     ['approved'], 'ix_timelineentry_status_timestamp'),
+    ("homepage: latest approved entries",
+     "SELECT * FROM timelineentry WHERE status = ? ORDER BY created_at DESC LIMIT 3",
+     ['approved'], 'ix_timelineentry_status_created_at'),
+    ("product page: approved posts about a product",
+     "SELECT * FROM timelineentry WHERE product_id = ? AND status = ? ORDER BY created_at DESC LIMIT 10",
+     [1, 'approved'], 'ix_timelineentry_product_status_created_at'),
+    ("shop: active products, newest first",
+     "SELECT * FROM product WHERE is_active = ? ORDER BY created_at DESC",
+     [True], 'ix_product_is_active_created_at'),
+    ("shop: products the user can buy",
+     "SELECT * FROM product WHERE is_active = ? AND required_tier <= ? ORDER BY created_at DESC",
+     [True, 1], 'ix_product_is_active_created_at'),
+    ("cart: user's items",
+     "SELECT * FROM cartitem WHERE user_id = ?",
+     [1], 'ix_cartitem_user_product'),
+    ("cart add: existing item",
+     "SELECT * FROM cartitem WHERE user_id = ? AND product_id = ?",
+     [1, 2], 'ix_cartitem_user_product'),
+    ("cart sweeper: abandoned rows",
+     "SELECT id FROM cartitem WHERE added_at < ? AND user_id NOT IN "
+     "(SELECT user_id FROM cartitem WHERE added_at >= ?) LIMIT 500",
+     ['2024-01-01', '2024-01-01'], 'ix_cartitem_added_at'),
+    ("webhook: user by subscription",
+     'SELECT * FROM "user" WHERE stripe_subscription_id = ?',
+     ['sub_123'], 'ix_user_stripe_subscription_id'),
+    ("subscription expiry: entitled subscriptions past their end",
+     'SELECT id FROM "user" WHERE subscription_status IN (?, ?) AND subscription_ends_at < ?',
+     ['active', 'trialing', '2024-01-01'], 'ix_user_subscription_status_ends_at'),
+    ("checkout: pending request",
+     "SELECT * FROM checkoutrequest WHERE user_id = ? AND price_id = ? AND status = ? AND created_at >= ?",
+     [1, 'price_1', 'pending', '2024-01-01'], 'ix_checkoutrequest_user_status'),
+    ("rollups: orders changed since the watermark",
+     'SELECT created_at, updated_at FROM "order" WHERE updated_at > ?',
+     ['2024-01-01'], 'ix_order_updated_at'),
+    ("exports: orders in a date range",
+     'SELECT * FROM "order" WHERE created_at >= ? AND created_at < ? ORDER BY created_at',
+     ['2024-01-01', '2024-02-01'], 'ix_order_created_at'),
+]
+
+# Tables small enough that a scan is cheaper than an index
+SMALL_TABLES = {'plan', 'adminstat', 'rollupwatermark', 'schema_version'}
+
+
+@pytest.fixture
+def indexed_db():
+    engine = Engine.from_uri("sqlite://:memory:", max_pool_conns=1)
+    with engine as tx:
+        for stmt in SCHEMA:
+            tx.execute(stmt)
+        for filename in sorted(os.listdir(MIGRATIONS)):
+            if filename.endswith(".sql"):
+                execute_migration(os.path.join(MIGRATIONS, filename))
+        yield tx
+
+
+class TestPlanInspection:
+    """Test full scan detection"""
+
+    def test_detects_table_scan(self, indexed_db):
+        plan = explain(indexed_db, "SELECT * FROM product WHERE name = ?", ['Mug'])
+        assert full_scans(plan) == ['product']
+        assert full_scans(plan, allow=['product']) == []
+
+    def test_index_walk_accepted_with_limit(self, indexed_db):
+        limited = explain(indexed_db, "SELECT * FROM timelineentry ORDER BY created_at DESC LIMIT 50")
+        unlimited = explain(indexed_db, "SELECT * FROM timelineentry ORDER BY created_at DESC")
+
+        assert full_scans(limited) == []
+        assert full_scans(unlimited) == ['timelineentry']
+
+
+class TestHotQueries:
+    """Test that the migrations' indexes serve the hot queries"""
+
+    @pytest.mark.parametrize("description,stmt,params,index", HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES])
+    def test_uses_index(self, indexed_db, description, stmt, params, index):
+        plan = explain(indexed_db, stmt, params)
+
+        assert full_scans(plan) == [], plan['nodes']
+        assert uses_index(plan, index), plan['nodes']
+
+
+class TestPagePlans:
+    """Render pages and EXPLAIN every query they run"""
+
+    PAGES = ['/', '/timeline', '/shop', '/shop/cart', '/pricing', '/admin', '/admin/sales']
+
+    def test_pages_have_no_full_scans(self, app, client):
+        from hyperflask.factory import db
+        from app.models import Product, User
+
+        with app.app_context():
+            db.migrate(use_schema_version=False)
+            with db:
+                admin = User.create_user('plans-admin@test.com', password='testpass')
+                admin.is_admin = True
+                admin.save()
+                product = Product.create(name='Plan Mug', price=1000)
+        client.post('/login', data={'email': 'plans-admin@test.com', 'password': 'testpass'})
+
+        statements = []
+
+        def capture(tx, stmt, params, many=False, **kwargs):
+            if not many and str(stmt).lstrip().upper().startswith("SELECT"):
+                statements.append((str(stmt), params))
+
+        Transaction.before_execute.connect(capture)
+        try:
+            for path in self.PAGES + [f'/shop/product/{product.id}']:
+                client.get(path)
+        finally:
+            Transaction.before_execute.disconnect(capture)
+
+        assert statements
+        failures = []
+        with app.app_context():
+            with db as tx:
+                for stmt, params in dict(statements).items():
+                    plan = explain(tx, stmt, params)
+                    tables = full_scans(plan, allow=SMALL_TABLES)
+                    if tables:
+                        failures.append(f"{', '.join(tables)}: {stmt}")
+
+        assert failures == []
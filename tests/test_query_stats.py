@@ -0,0 +1,110 @@
+"""
+Tests for per-request query counting, N+1 detection and page query budgets.
+"""
+import pytest
+from flask import Flask
+from sqlorm import Engine
+
+from app.services.query_stats import (
+    HEADER, QueryBudgetExceeded, QueryStats, collect_queries, fingerprint, query_budget,
+)
+
+
+@pytest.fixture
+def engine():
+    engine = Engine.from_uri("sqlite://:memory:", max_pool_conns=1)
+    with engine as tx:
+        tx.execute("CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT)")
+        tx.executemany("INSERT INTO item (name) VALUES (?)", [(f"item {i}",) for i in range(10)])
+    yield engine
+    engine.disconnect_all()
+
+
+def load_items_one_by_one(engine):
+    with engine as tx:
+        return [tx.fetchscalar("SELECT name FROM item WHERE id = ?", [i]) for i in range(1, 11)]
+
+
+class TestFingerprint:
+    """Test statement normalization"""
+
+    def test_literals_and_placeholders(self):
+        assert fingerprint("SELECT * FROM product WHERE id = 12 AND name = 'it''s'") == \
+            "SELECT * FROM product WHERE id = ? AND name = ?"
+        assert fingerprint("SELECT * FROM product WHERE id = %(id)s") == fingerprint("SELECT * FROM product WHERE id = ?")
+
+    def test_in_lists_and_whitespace(self):
+        assert fingerprint("SELECT *\n  FROM t WHERE id IN (?, ?, ?)") == fingerprint("SELECT * FROM t WHERE id IN (?)")
+
+
+class TestQueryCollector:
+    """Test counting and N+1 detection"""
+
+    def test_counts_and_detects_repeats(self, engine):
+        with collect_queries() as collector:
+            load_items_one_by_one(engine)
+
+        assert collector.count == 10
+        assert collector.seconds > 0
+        assert collector.repeated == [("SELECT name FROM item WHERE id = ?", 10)]
+        assert "(x10)" in collector.summary()
+
+    def test_single_query_not_repeated(self, engine):
+        with collect_queries() as collector:
+            with engine as tx:
+                tx.fetchall("SELECT name FROM item WHERE id IN (1, 2, 3)")
+
+        assert collector.count == 1
+        assert collector.repeated == []
+
+    def test_budget(self, engine):
+        with query_budget(2):
+            with engine as tx:
+                tx.fetchall("SELECT * FROM item")
+
+        with pytest.raises(QueryBudgetExceeded, match="N\\+1"):
+            with query_budget(20):
+                load_items_one_by_one(engine)
+
+        with pytest.raises(QueryBudgetExceeded, match="budget is 5"):
+            with query_budget(5, allow_repeated=True):
+                load_items_one_by_one(engine)
+
+    def test_request_header(self, engine):
+        app = Flask(__name__)
+        app.config['QUERY_STATS_HEADER'] = True
+        QueryStats(app)
+
+        @app.route('/items')
+        def items():
+            return {'items': load_items_one_by_one(engine)}
+
+        response = app.test_client().get('/items')
+
+        assert response.headers[HEADER].startswith("count=10; time_ms=")
+        assert "repeated=SELECT name FROM item WHERE id = ? (x10)" in response.headers[HEADER]
+
+
+class TestPageBudgets:
+    """Pages must stay within their declared query budgets, without N+1 queries"""
+
+    # Anonymous pages; the product page is added with a real id below
+    PAGE_BUDGETS = {
+        '/': 6,
+        '/timeline': 4,
+        '/shop': 6,
+        '/pricing': 4,
+    }
+
+    def test_pages_within_budget(self, app, client):
+        from hyperflask.factory import db
+        from app.models import Product
+
+        with app.app_context():
+            with db:
+                product = Product.create(name='Budget Mug', price=1000)
+
+        for path, budget in {**self.PAGE_BUDGETS, f'/shop/product/{product.id}': 6}.items():
+            with query_budget(budget):
+                response = client.get(path)
+            assert response.status_code == 200, path
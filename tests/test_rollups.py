@@ -0,0 +1,147 @@
+"""
+Tests for the daily sales and engagement rollups.
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.services import rollups
+from app.services.rollups import aggregate_by_day, day_windows
+
+
+SCHEMA = [
+    'CREATE TABLE "order" (id INTEGER PRIMARY KEY, status TEXT, created_at TIMESTAMP, updated_at TIMESTAMP)',
+    'CREATE TABLE orderitem (id INTEGER PRIMARY KEY, order_id INTEGER, product_id INTEGER, quantity INTEGER, '
+    'price_at_purchase INTEGER)',
+    'CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, category TEXT)',
+    'CREATE TABLE timelineentry (id INTEGER PRIMARY KEY, timestamp TIMESTAMP, product_id INTEGER)',
+    'CREATE TABLE dailyproductsales (id INTEGER PRIMARY KEY, day DATE, product_id INTEGER, category TEXT, '
+    'orders INTEGER, units INTEGER, revenue INTEGER)',
+    'CREATE TABLE dailyproductposts (id INTEGER PRIMARY KEY, day DATE, product_id INTEGER, posts INTEGER)',
+    'CREATE TABLE rollupwatermark (id INTEGER PRIMARY KEY, name TEXT UNIQUE, last_id INTEGER, '
+    'last_timestamp TIMESTAMP, updated_at TIMESTAMP)',
+]
+
+
+@pytest.fixture
+def rollup_db(monkeypatch):
+    """In-memory SQLite engine standing in for the app database"""
+    import hyperflask.factory
+    from sqlorm import Engine
+
+    engine = Engine.from_uri("sqlite://:memory:", max_pool_conns=1)
+    with engine as tx:
+        for stmt in SCHEMA:
+            tx.execute(stmt)
+    monkeypatch.setattr(hyperflask.factory, "db", engine)
+    return engine
+
+
+class TestAggregation:
+    """Test NumPy grouping helpers"""
+
+    def test_aggregate_by_day_groups_and_sums(self):
+        groups = aggregate_by_day(
+            [datetime(2024, 1, 2, 5), datetime(2024, 1, 1, 23), datetime(2024, 1, 2, 9), datetime(2024, 1, 2, 10)],
+            [7, 7, 7, 8],
+            units=[1, 2, 3, 1],
+            revenue=[100, 200, 300, 50],
+        )
+
+        assert groups == [
+            {'day': date(2024, 1, 1), 'key': 7, 'rows': 1, 'units': 2, 'revenue': 200},
+            {'day': date(2024, 1, 2), 'key': 7, 'rows': 2, 'units': 4, 'revenue': 400},
+            {'day': date(2024, 1, 2), 'key': 8, 'rows': 1, 'units': 1, 'revenue': 50},
+        ]
+
+    def test_aggregate_by_day_empty(self):
+        assert aggregate_by_day([], []) == []
+
+    def test_day_windows(self):
+        days = [date(2024, 1, 20), date(2024, 1, 1), date(2024, 2, 5), date(2024, 1, 1)]
+
+        assert day_windows(days, window_days=31) == [
+            (date(2024, 1, 1), date(2024, 1, 20)),
+            (date(2024, 2, 5), date(2024, 2, 5)),
+        ]
+
+
+class TestRollupSQL:
+    """Test the rollup and chart statements against SQLite"""
+
+    def test_incremental_rollups_and_charts(self, rollup_db):
+        now = datetime.utcnow().replace(microsecond=0)
+        with rollup_db as tx:
+            tx.execute("INSERT INTO product (id, name, category) VALUES (1, 'Mug', 'mugs')")
+            tx.execute('INSERT INTO "order" (id, status, created_at, updated_at) VALUES (1, ?, ?, ?)', ['paid', now, now])
+            tx.execute('INSERT INTO "order" (id, status, created_at, updated_at) VALUES (2, ?, ?, ?)', ['pending', now, now])
+            tx.executemany('INSERT INTO orderitem (order_id, product_id, quantity, price_at_purchase) VALUES (?, 1, ?, 1000)',
+                           [(1, 3), (2, 5)])
+            tx.executemany('INSERT INTO timelineentry (timestamp, product_id) VALUES (?, ?)', [(now, 1), (now, None)])
+
+        assert rollups.rollup_sales() == {'days': 1, 'rows': 1}
+        assert rollups.rollup_posts() == {'days': 1, 'rows': 1}
+
+        with rollup_db as tx:
+            tx.execute('UPDATE "order" SET status = ?, updated_at = ? WHERE id = 2', ['paid', now + timedelta(seconds=1)])
+            tx.execute('INSERT INTO timelineentry (timestamp, product_id) VALUES (?, 1)', [now])
+            assert tx.fetchone("SELECT last_id FROM rollupwatermark WHERE name = ?", [rollups.POSTS])[0] == 1
+
+        rollups.rollup_sales()
+        assert rollups.rollup_posts() == {'days': 1, 'rows': 1}
+
+        assert rollups.revenue_by_day(1) == [{'day': now.date(), 'revenue': 8000}]
+        assert rollups.revenue_by_category() == [{'category': 'mugs', 'revenue': 8000}]
+        assert rollups.top_products() == [{'product_id': 1, 'name': 'Mug', 'revenue': 8000, 'units': 8, 'posts': 2}]
+        assert rollups.posts_by_product() == [{'product_id': 1, 'name': 'Mug', 'posts': 2}]
+
+
+class TestRollupPipeline:
+    """Test incremental rollups against the database"""
+
+    def test_incremental_sales_rollup(self, app, db_session):
+        from app.models import DailyProductSales, Order, OrderItem, Product, User
+        from app.services.rollups import rollup_sales
+
+        with db_session:
+            user = User.find_one(order_by='id')
+            product = Product.create(name='Rollup Mug', price=1000, category='mugs')
+            order = Order.create(user_id=user.id, order_number='ORD-ROLLUP-1', status='paid', total_amount=3000)
+            OrderItem.create(order_id=order.id, product_id=product.id, quantity=3,
+                             price_at_purchase=1000, product_name='Rollup Mug')
+
+        rollup_sales()
+
+        with db_session:
+            row = DailyProductSales.find_one(product_id=product.id)
+            assert (row.units, row.revenue, row.category) == (3, 3000, 'mugs')
+
+            order2 = Order.create(user_id=user.id, order_number='ORD-ROLLUP-2', status='paid', total_amount=1000)
+            OrderItem.create(order_id=order2.id, product_id=product.id, quantity=1,
+                             price_at_purchase=1000, product_name='Rollup Mug')
+
+        stats = rollup_sales()
+
+        assert stats['days'] >= 1
+        with db_session:
+            rows = list(DailyProductSales.find_all(product_id=product.id))
+            assert len(rows) == 1
+            assert rows[0].revenue == 4000
+            assert rows[0].orders == 2
+
+    def test_posts_rollup(self, app, db_session):
+        from app.models import DailyProductPosts, Product, TimelineEntry, User
+        from app.services.rollups import rollup_posts
+
+        with db_session:
+            user = User.find_one(order_by='id')
+            product = Product.create(name='Rollup Poster', price=500)
+            for hours in (1, 2):
+                TimelineEntry.create(user_id=user.id, product_id=product.id, status='approved',
+                                     timestamp=datetime.utcnow().replace(hour=12) - timedelta(hours=hours))
+
+        rollup_posts()
+
+        with db_session:
+            row = DailyProductPosts.find_one(product_id=product.id)
+            assert row.posts == 2
@@ -0,0 +1,93 @@
+"""
+Tests for the Server-Timing breakdown and per-route aggregates.
+"""
+import time
+
+import pytest
+from flask import Flask
+from flask_file_routes.view import before_page_module_execute, before_page_module_render, after_page_module_render
+from sqlorm import Engine
+
+from app.services.query_stats import QueryStats
+from app.services.server_timing import HEADER, ServerTiming, breakdown
+
+
+@pytest.fixture
+def timed_app():
+    engine = Engine.from_uri("sqlite://:memory:", max_pool_conns=1)
+    app = Flask(__name__)
+    app.config['SERVER_TIMING_HEADER'] = True
+    QueryStats(app)
+    timing = ServerTiming(app)
+
+    @app.route('/page/<int:id>')
+    def fake_page(id):
+        # Same signals as a .jpy page view
+        before_page_module_execute.send(None)
+        with engine as tx:
+            tx.fetchscalar("SELECT 1")
+        time.sleep(0.01)
+        before_page_module_render.send(None)
+        time.sleep(0.02)
+        after_page_module_render.send(None)
+        return "ok"
+
+    @app.route('/plain')
+    def plain():
+        return "ok"
+
+    app.timing = timing
+    yield app
+    engine.disconnect_all()
+
+
+def durations(header):
+    return {part.split(';')[0]: float(part.split('dur=')[1]) for part in header.split(', ')}
+
+
+class TestBreakdown:
+    """Test phase computation from marks"""
+
+    def test_db_time_is_subtracted_from_its_phase(self):
+        phases = breakdown([("start", 0.0, 0.0), ("execute", 0.001, 0.0), ("render", 0.011, 0.004),
+                            ("rendered", 0.031, 0.004), ("end", 0.032, 0.004)])
+
+        assert phases == pytest.approx({'route': 0.001, 'frontmatter': 0.006, 'db': 0.004,
+                                        'template': 0.02, 'serialize': 0.001, 'total': 0.032})
+
+    def test_early_response_has_no_template(self):
+        phases = breakdown([("start", 0.0, 0.0), ("execute", 0.001, 0.0), ("end", 0.005, 0.0)])
+        assert set(phases) == {'route', 'frontmatter', 'db', 'total'}
+
+
+class TestServerTimingHeader:
+    """Test the header and aggregates on requests"""
+
+    def test_page_phases(self, timed_app):
+        response = timed_app.test_client().get('/page/1')
+
+        phases = durations(response.headers[HEADER])
+        assert list(phases) == ['route', 'frontmatter', 'template', 'serialize', 'db', 'total']
+        assert phases['frontmatter'] >= 10
+        assert phases['template'] >= 20
+        assert phases['total'] >= phases['frontmatter'] + phases['template']
+
+    def test_aggregated_per_route(self, timed_app):
+        client = timed_app.test_client()
+        for i in range(3):
+            client.get(f'/page/{i}')
+        client.get('/plain')
+
+        report = {row['route']: row for row in timed_app.timing.report()}
+        assert report['/page/<int:id>']['count'] == 3
+        assert report['/page/<int:id>']['template_ms'] >= 20
+        assert report['/plain']['count'] == 1
+        assert report['/plain']['handler_ms'] > 0
+
+
+class TestTimingsPage:
+    """Test the admin timings page"""
+
+    def test_requires_admin(self, client):
+        response = client.get('/admin/timings', follow_redirects=False)
+        assert response.status_code in [302, 401, 403]
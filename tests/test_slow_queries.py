@@ -0,0 +1,76 @@
+"""
+Tests for the slow query log and latency histograms.
+"""
+import logging
+
+from flask import Flask
+
+from app.services.query_stats import remove_listener
+from app.services.slow_queries import LatencyHistogram, SlowQueryLog
+
+
+class TestLatencyHistogram:
+    """Test bucketed percentiles"""
+
+    def test_percentiles_within_a_bucket(self):
+        histogram = LatencyHistogram()
+        for ms in range(1, 101):
+            histogram.observe(ms / 1000)
+
+        assert histogram.count == 100
+        assert 0.050 <= histogram.percentile(0.50) <= 0.050 * 1.25
+        assert 0.095 <= histogram.percentile(0.95) <= 0.100
+        assert histogram.percentile(0.99) <= histogram.max == 0.1
+
+    def test_empty(self):
+        assert LatencyHistogram().percentile(0.99) == 0.0
+
+
+class TestSlowQueryLog:
+    """Test fingerprint stats, slow logging and bounded cardinality"""
+
+    def make_log(self, **config):
+        app = Flask(__name__)
+        app.config.update(config)
+        log = SlowQueryLog(app)
+        # Only record what the test passes in
+        remove_listener(log.record)
+        return app, log
+
+    def test_groups_by_fingerprint(self):
+        app, log = self.make_log()
+        with app.test_request_context('/shop'):
+            log.record("SELECT * FROM product WHERE id = 1", 0.002)
+            log.record("SELECT * FROM product WHERE id = 2", 0.004)
+
+        [row] = log.report()
+        assert row['fingerprint'] == "SELECT * FROM product WHERE id = ?"
+        assert row['count'] == 2
+        assert row['page'] == "GET /shop"
+        assert round(row['total_ms'], 3) == 6.0
+
+    def test_logs_slow_queries_with_page(self, caplog):
+        app, log = self.make_log(SLOW_QUERY_MS=10)
+        with caplog.at_level(logging.WARNING, logger=app.logger.name), app.test_request_context('/timeline'):
+            log.record("SELECT * FROM timelineentry", 0.001)
+            log.record("SELECT * FROM timelineentry WHERE status = 'approved'", 0.05)
+
+        assert [r.getMessage() for r in caplog.records] == [
+            "Slow query (50.0ms) GET /timeline: SELECT * FROM timelineentry WHERE status = ?"
+        ]
+        assert log.report(order_by='slow')[0]['slow'] == 1
+
+    def test_cardinality_is_bounded(self):
+        app, log = self.make_log(SLOW_QUERY_MAX_FINGERPRINTS=3)
+        for _ in range(5):
+            log.record("SELECT * FROM product", 0.001)
+        for table in ("a", "b", "c", "d"):
+            log.record(f"SELECT * FROM {table}", 0.001)
+
+        assert len(log.stats) == 3
+        assert "SELECT * FROM product" in log.stats
+        assert log.evicted == 2
+
+    def test_admin_report_requires_admin(self, client):
+        response = client.get('/admin/slow-queries', follow_redirects=False)
+        assert response.status_code in [302, 401, 403]
@@ -0,0 +1,119 @@
+"""
+Tests for the SQLite profile and read/write routing.
+"""
+import sqlite3
+
+import pytest
+from flask import Flask, g
+from sqlorm import Engine, EngineDispatcher
+from sqlorm.engine import session_context
+
+from app.services.db_pool import PoolTimeoutError
+from app.services.db_router import DatabaseRouter, use_engine
+from app.services.sqlite_profile import create_sqlite_engines, sqlite_pragmas
+
+
+class SQLiteDB:
+    """Minimal stand-in for FlaskSQLORM's engine factory"""
+
+    def create_engine(self, uri, **kwargs):
+        return Engine.from_uri(uri, **kwargs)
+
+
+@pytest.fixture
+def engines(tmp_path):
+    writer, reader = create_sqlite_engines(SQLiteDB(), f"sqlite://{tmp_path}/app.db",
+                                           sqlite_pragmas({}), readers=2, writer_timeout=0.05)
+    with writer as tx:
+        tx.execute("CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT)")
+    yield writer, reader
+    writer.disconnect_all()
+    reader.disconnect_all()
+
+
+class TestSQLiteProfile:
+    """Test pragmas and the writer/reader split"""
+
+    def test_pragmas_applied_on_connect(self, engines):
+        writer, reader = engines
+
+        with writer as tx:
+            assert tx.fetchscalar("PRAGMA journal_mode") == "wal"
+            assert tx.fetchscalar("PRAGMA synchronous") == 1  # NORMAL
+            assert tx.fetchscalar("PRAGMA temp_store") == 2  # MEMORY
+            assert tx.fetchscalar("PRAGMA cache_size") == -65536
+            assert tx.fetchscalar("PRAGMA busy_timeout") == 5000
+
+    def test_config_overrides(self):
+        assert sqlite_pragmas({'SQLITE_PRAGMAS': {'cache_size': -1000}})['cache_size'] == '-1000'
+
+    def test_readers_are_read_only_and_see_commits(self, engines):
+        writer, reader = engines
+
+        with writer as tx:
+            tx.execute("INSERT INTO item (name) VALUES ('mug')")
+
+        with reader as tx:
+            assert tx.fetchscalar("SELECT name FROM item") == "mug"
+            with pytest.raises(sqlite3.OperationalError):
+                tx.execute("INSERT INTO item (name) VALUES ('poster')")
+
+    def test_single_writer(self, engines):
+        writer, reader = engines
+        writer.connect()
+
+        with pytest.raises(PoolTimeoutError):
+            writer.connect()
+        # Readers are unaffected by a busy writer
+        with reader as tx:
+            assert tx.fetchscalar("SELECT COUNT(*) FROM item") == 0
+
+
+class TestDatabaseRouter:
+    """Test per-request session routing"""
+
+    @pytest.fixture
+    def flask_app(self, engines):
+        writer, reader = engines
+        db = SQLiteDB()
+        db.engine = writer
+        db.engines = EngineDispatcher()
+        db.engines.register(writer, default=True)
+        db.engines.register(reader, ["reader"])
+
+        app = Flask(__name__)
+        app.router = DatabaseRouter(app, db)
+        return app
+
+    def request_session(self, flask_app, method):
+        writer = flask_app.router.db.engine
+        with flask_app.test_request_context("/", method=method):
+            g.sqlorm_session = writer.make_session()
+            session_context.push(g.sqlorm_session)
+            try:
+                flask_app.router.route_request()
+                return g.sqlorm_session
+            finally:
+                session_context.pop()
+                g.sqlorm_session.close()
+
+    def test_get_uses_reader(self, flask_app, engines):
+        assert self.request_session(flask_app, "GET").engine is engines[1]
+
+    def test_post_stays_on_writer(self, flask_app, engines):
+        assert self.request_session(flask_app, "POST").engine is engines[0]
+
+    def test_session_in_transaction_is_not_switched(self, engines):
+        writer, reader = engines
+        with Flask(__name__).test_request_context("/"):
+            g.sqlorm_session = writer.make_session()
+            session_context.push(g.sqlorm_session)
+
+            with g.sqlorm_session:
+                assert use_engine(reader) is False
+            assert g.sqlorm_session.engine is writer
+            assert use_engine(reader) is True
+            assert session_context.top is g.sqlorm_session
+
+            session_context.pop()
+            g.sqlorm_session.close()
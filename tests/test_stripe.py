@@ -11,8 +11,14 @@ Tests cover:
 """
 import pytest
 import json
+import threading
 from datetime import datetime, timedelta
-from app.services.stripe_service import StripeService, MockStripeAPI
+from app.services.stripe_service import (
+    StripeService,
+    MockStripeAPI,
+    StripeBusyError,
+    StripeTimeoutError,
+)
 from app.models import User
 
 
@@ -78,6 +84,23 @@ class TestMockStripeAPI:
         assert completed_session['customer'].startswith('cus_mock_')
         assert completed_session['subscription'].startswith('sub_mock_')
 
+    def test_complete_checkout_reuses_customer(self, mock_stripe_api):
+        """Test that sessions for an existing customer don't create another one"""
+        customer = mock_stripe_api.create_customer(email='test@example.com')
+        session = mock_stripe_api.create_checkout_session(
+            customer_email=None,
+            customer_id=customer['id'],
+            price_id='price_test_basic',
+            success_url='https://example.com/success',
+            cancel_url='https://example.com/cancel'
+        )
+
+        completed = mock_stripe_api.complete_checkout_session(session['id'])
+
+        assert completed['customer'] == customer['id']
+        assert completed['customer_details']['email'] == 'test@example.com'
+        assert len(mock_stripe_api.customers) == 1
+
     def test_cancel_subscription(self, mock_stripe_api):
         """Test canceling a subscription"""
         customer = mock_stripe_api.create_customer('test@example.com')
@@ -165,6 +188,107 @@ class TestStripeService:
         assert canceled_sub['status'] == 'canceled'
 
 
+class TestStripeExecutor:
+    """Test the bounded executor used for outbound Stripe calls"""
+
+    def test_call_returns_result(self, stripe_service_mock):
+        session = stripe_service_mock.call(
+            stripe_service_mock.create_checkout_session,
+            customer_email='test@example.com',
+            price_id='price_test_basic',
+            success_url='https://example.com/success',
+            cancel_url='https://example.com/cancel'
+        )
+
+        assert session['id'].startswith('cs_test_')
+
+    def test_call_deadline(self, stripe_service_mock):
+        release = threading.Event()
+
+        with pytest.raises(StripeTimeoutError):
+            stripe_service_mock.call(release.wait, timeout=0.05)
+        release.set()
+
+    def test_submit_is_bounded(self, app):
+        app.config['STRIPE_MAX_PENDING'] = 1
+        service = StripeService(app)
+        release = threading.Event()
+
+        future = service.submit(release.wait)
+        with pytest.raises(StripeBusyError):
+            service.submit(release.wait)
+
+        release.set()
+        future.result(timeout=1)
+        # The slot is released once the call finishes
+        service.submit(lambda: None).result(timeout=1)
+
+
+    def test_single_flight_coalesces_concurrent_calls(self, stripe_service_mock):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow_call():
+            calls.append(1)
+            started.set()
+            release.wait(1)
+            return 'session'
+
+        leader = stripe_service_mock.submit(stripe_service_mock.single_flight, 'key', slow_call)
+        started.wait(1)
+        follower = stripe_service_mock.submit(stripe_service_mock.single_flight, 'key', slow_call)
+        release.set()
+
+        assert leader.result(timeout=1) == follower.result(timeout=1) == 'session'
+        assert len(calls) == 1
+        # Later calls with the same key run again
+        assert stripe_service_mock.single_flight('key', slow_call) == 'session'
+        assert len(calls) == 2
+
+    def test_checkout_session_reuses_stored_customer(self, stripe_service_mock):
+        mock_api = stripe_service_mock._get_mock_api()
+        customer = mock_api.create_customer(email='test@example.com')
+
+        session = stripe_service_mock.create_checkout_session(
+            customer_email='test@example.com',
+            customer_id=customer['id'],
+            price_id='price_test_basic_monthly',
+            success_url='https://example.com/success',
+            cancel_url='https://example.com/cancel'
+        )
+
+        assert session['customer'] == customer['id']
+        assert session['customer_email'] is None
+
+
+    def test_checkout_request_failed_when_save_fails(self, app, stripe_service_mock, monkeypatch):
+        from app.models import CheckoutRequest
+        from hyperflask.factory import db
+        user = User.create_user(email='save-fails@example.com', password='testpass')
+        with db:
+            checkout_request = CheckoutRequest.create(user_id=user.id, price_id='price_test_basic_monthly')
+
+        def save(self, *args, **kwargs):
+            raise RuntimeError('database is locked')
+
+        monkeypatch.setattr(CheckoutRequest, 'save', save)
+        future = stripe_service_mock.create_checkout_session_async(
+            checkout_request.id,
+            customer_email=user.email,
+            price_id='price_test_basic_monthly',
+            success_url='https://example.com/success',
+            cancel_url='https://example.com/cancel'
+        )
+
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+        with db:
+            checkout_request = CheckoutRequest.get(checkout_request.id)
+        assert checkout_request.status == 'failed'
+        assert 'database is locked' in checkout_request.error
+
+
 class TestPricingPage:
     """Test the pricing page"""
 
@@ -247,6 +371,35 @@ class TestCheckoutFlow:
         assert response.status_code == 302
         assert 'checkout.stripe.com' in response.location or 'mock' in response.location
 
+    def test_start_checkout_returns_polling_fragment(self, client, app):
+        """Test the non-blocking HTMX checkout flow"""
+        app.config['stripe_enabled'] = True
+        app.config['stripe_mode'] = 'mock'
+
+        from app.services.stripe_service import stripe_service
+        stripe_service.init_app(app)
+
+        from app.models import User
+        user = User.create_user(email='async@example.com', password='testpass')
+        client.post('/login', data={'email': user.email, 'password': 'testpass'})
+
+        response = client.post('/checkout/start', data={
+            'price_id': 'price_test_basic_monthly'
+        }, headers={'HX-Request': 'true'})
+
+        assert response.status_code == 200
+        assert b'/checkout/status?id=' in response.data
+
+        from app.models import CheckoutRequest
+        from hyperflask.factory import db
+        with db:
+            checkout_request = CheckoutRequest.find_one(order_by='id DESC')
+        # Wait for the executor to record the session
+        stripe_service._get_executor().submit(lambda: None).result(timeout=5)
+
+        response = client.get(f'/checkout/status?id={checkout_request.id}', headers={'HX-Request': 'true'})
+        assert 'checkout.stripe.com' in response.headers.get('HX-Redirect', '')
+
     def test_checkout_success_page(self, client):
         """Test checkout success page"""
         response = client.get('/checkout/success?session_id=cs_test_12345')
@@ -0,0 +1,180 @@
+"""
+Tests for the local Stripe-compatible HTTP stand-in.
+
+The server runs on an ephemeral port in a background thread, so these
+tests exercise real HTTP round trips without Stripe credentials.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app.services.stripe_mock_server import MockStripeServer, parse_stripe_form
+from app.services.stripe_service import (
+    MockStripeAPI,
+    generate_webhook_signature,
+    verify_webhook_signature,
+)
+
+
+@pytest.fixture
+def mock_server():
+    server = MockStripeServer(port=0, seed=42).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def webhook_receiver():
+    """A tiny HTTP endpoint that records delivered webhooks"""
+    received = []
+    delivered = threading.Event()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            received.append((body, self.headers.get('Stripe-Signature')))
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            delivered.set()
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    httpd.received = received
+    httpd.delivered = delivered
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/webhooks/stripe"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def create_session(server, **params):
+    data = {
+        'customer_email': 'load@example.com',
+        'line_items[0][price]': 'price_test_basic_monthly',
+        'line_items[0][quantity]': '1',
+        'mode': 'subscription',
+        'success_url': 'https://example.com/success',
+        'cancel_url': 'https://example.com/cancel',
+    }
+    data.update(params)
+    return requests.post(f"{server.url}/v1/checkout/sessions", data=data, timeout=5)
+
+
+class TestWebhookSignatures:
+    """Test the HMAC signature helpers"""
+
+    def test_signature_roundtrip(self):
+        payload = b'{"type": "checkout.session.completed"}'
+        header = generate_webhook_signature(payload, 'whsec_test')
+
+        assert header.startswith('t=')
+        assert verify_webhook_signature(payload, header, 'whsec_test')
+
+    def test_signature_rejects_wrong_secret_or_payload(self):
+        payload = b'{"type": "checkout.session.completed"}'
+        header = generate_webhook_signature(payload, 'whsec_test')
+
+        assert not verify_webhook_signature(payload, header, 'whsec_other')
+        assert not verify_webhook_signature(b'{}', header, 'whsec_test')
+        assert not verify_webhook_signature(payload, 'garbage', 'whsec_test')
+
+    def test_signature_rejects_stale_timestamp(self):
+        payload = b'{}'
+        header = generate_webhook_signature(payload, 'whsec_test', timestamp=int(time.time()) - 3600)
+
+        assert not verify_webhook_signature(payload, header, 'whsec_test')
+
+    def test_mock_construct_event_verifies_real_signatures(self):
+        api = MockStripeAPI()
+        payload = json.dumps({'type': 'ping'}).encode('utf-8')
+
+        assert api.construct_event(payload, 'mock_signature', 'whsec_test')['type'] == 'ping'
+        signed = generate_webhook_signature(payload, 'whsec_test')
+        assert api.construct_event(payload, signed, 'whsec_test')['type'] == 'ping'
+        with pytest.raises(ValueError):
+            api.construct_event(payload, signed, 'whsec_other')
+
+
+class TestMockStripeServer:
+    """Test the HTTP stand-in"""
+
+    def test_parse_stripe_form(self):
+        params = parse_stripe_form('line_items[0][price]=price_1&line_items[0][quantity]=1&mode=payment')
+
+        assert params == {'line_items': [{'price': 'price_1', 'quantity': '1'}], 'mode': 'payment'}
+
+    def test_create_and_retrieve_checkout_session(self, mock_server):
+        response = create_session(mock_server)
+        assert response.status_code == 200
+        session = response.json()
+        assert session['id'].startswith('cs_test_')
+        assert session['line_items'][0]['price'] == 'price_test_basic_monthly'
+
+        response = requests.get(f"{mock_server.url}/v1/checkout/sessions/{session['id']}", timeout=5)
+        assert response.json()['id'] == session['id']
+
+    def test_list_prices_expands_products(self, mock_server):
+        response = requests.get(f"{mock_server.url}/v1/prices", params={'active': 'true'}, timeout=5)
+
+        prices = response.json()['data']
+        assert {p['id'] for p in prices} >= {'price_test_basic_monthly', 'price_test_pro_monthly'}
+        assert all(p['product']['object'] == 'product' for p in prices)
+
+    def test_unknown_objects_return_stripe_errors(self, mock_server):
+        response = requests.get(f"{mock_server.url}/v1/subscriptions/sub_missing", timeout=5)
+
+        assert response.status_code == 404
+        assert response.json()['error']['type'] == 'invalid_request_error'
+
+    def test_complete_and_cancel_subscription(self, mock_server):
+        session = create_session(mock_server).json()
+        completed = requests.post(
+            f"{mock_server.url}/v1/checkout/sessions/{session['id']}/complete", timeout=5
+        ).json()
+        subscription_id = completed['subscription']
+
+        subscription = requests.get(f"{mock_server.url}/v1/subscriptions/{subscription_id}", timeout=5).json()
+        assert subscription['status'] == 'active'
+
+        canceled = requests.delete(f"{mock_server.url}/v1/subscriptions/{subscription_id}", timeout=5).json()
+        assert canceled['status'] == 'canceled'
+
+    def test_latency_injection(self, mock_server):
+        mock_server.configure(latency_ms=150)
+
+        start = time.perf_counter()
+        create_session(mock_server)
+        elapsed = time.perf_counter() - start
+
+        assert elapsed >= 0.15
+
+    def test_error_injection(self, mock_server):
+        requests.post(f"{mock_server.url}/_mock/config", data={'error_rate': '1.0', 'error_status': '503'}, timeout=5)
+
+        response = create_session(mock_server)
+
+        assert response.status_code == 503
+        assert response.json()['error']['type'] == 'api_error'
+        stats = requests.get(f"{mock_server.url}/_mock/stats", timeout=5).json()
+        assert stats['injected_errors'] == 1
+
+    def test_webhook_delivery_is_signed(self, webhook_receiver):
+        server = MockStripeServer(port=0, webhook_url=webhook_receiver.url, webhook_secret='whsec_load').start()
+        try:
+            session = create_session(server).json()
+            requests.post(f"{server.url}/v1/checkout/sessions/{session['id']}/complete", timeout=5)
+
+            assert webhook_receiver.delivered.wait(5)
+            payload, signature = webhook_receiver.received[0]
+            assert verify_webhook_signature(payload, signature, 'whsec_load')
+            assert json.loads(payload)['type'] == 'checkout.session.completed'
+        finally:
+            server.stop()
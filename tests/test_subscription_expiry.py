@@ -0,0 +1,108 @@
+"""
+Tests for the subscription expiry reconciliation job.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.db_sql import to_datetime
+from app.services.stripe_service import stripe_service
+from app.services.subscription_expiry import expire_subscriptions
+
+
+@pytest.fixture
+def user_db(monkeypatch):
+    """In-memory SQLite engine standing in for the app database"""
+    import hyperflask.factory
+    from sqlorm import Engine
+
+    engine = Engine.from_uri("sqlite://:memory:", max_pool_conns=1)
+    with engine as tx:
+        tx.execute('CREATE TABLE "user" (id INTEGER PRIMARY KEY, stripe_subscription_id TEXT, '
+                   'subscription_status TEXT, subscription_ends_at TIMESTAMP, subscription_tier INTEGER)')
+    monkeypatch.setattr(hyperflask.factory, "db", engine)
+    return engine
+
+
+def subscribe(email, status, ends_in, subscription_id=None):
+    from app.models import User
+
+    return User.create(email=email, subscription_status=status, subscription_plan='pro', subscription_tier=2,
+                       subscription_ends_at=datetime.utcnow() + ends_in, stripe_subscription_id=subscription_id)
+
+
+class TestExpireSubscriptions:
+    """Test the bulk expiry UPDATE and the Stripe re-verification"""
+
+    def test_flips_expired_subscriptions(self, app, db_session):
+        from app.models import User
+
+        with db_session:
+            expired = subscribe('expired@test.com', 'active', -timedelta(days=3))
+            in_grace = subscribe('grace@test.com', 'trialing', -timedelta(hours=2))
+            current = subscribe('current@test.com', 'active', timedelta(days=10))
+
+        stats = expire_subscriptions(grace=timedelta(hours=24), verify_limit=0)
+
+        assert stats['expired'] == 1
+        user = User.get(expired.id)
+        assert (user.subscription_status, user.subscription_tier) == ('canceled', 0)
+        assert User.get(in_grace.id).subscription_status == 'trialing'
+        assert User.get(current.id).subscription_tier == 2
+
+    def test_renewals_found_in_stripe_are_kept(self, app, db_session, monkeypatch):
+        from app.models import User
+
+        with db_session:
+            renewed = subscribe('renewed@test.com', 'active', -timedelta(days=2), 'sub_renewed')
+            canceled = subscribe('gone@test.com', 'active', -timedelta(days=2), 'sub_gone')
+
+        period_end = int((datetime.utcnow() + timedelta(days=28)).replace(tzinfo=timezone.utc).timestamp())
+        subscriptions = {
+            'sub_renewed': {'status': 'active', 'current_period_end': period_end},
+            'sub_gone': {'status': 'unpaid', 'current_period_end': None},
+        }
+        monkeypatch.setattr(stripe_service, 'is_enabled', lambda: True)
+        monkeypatch.setattr(stripe_service, 'get_subscription', subscriptions.get)
+
+        stats = expire_subscriptions(verify_limit=10)
+
+        assert (stats['verified'], stats['renewed'], stats['expired']) == (2, 1, 0)
+        user = User.get(renewed.id)
+        assert (user.subscription_status, user.subscription_tier) == ('active', 2)
+        assert user.subscription_ends_at > datetime.utcnow()
+        user = User.get(canceled.id)
+        assert (user.subscription_status, user.subscription_tier) == ('unpaid', 0)
+
+
+class TestExpirySQL:
+    """Test the sample, verify and expiry statements against SQLite"""
+
+    def test_verify_then_expire(self, user_db, monkeypatch):
+        now = datetime.utcnow()
+        with user_db as tx:
+            tx.executemany('INSERT INTO "user" (id, stripe_subscription_id, subscription_status, '
+                           'subscription_ends_at, subscription_tier) VALUES (?, ?, ?, ?, 2)', [
+                               (1, 'sub_renewed', 'active', now - timedelta(days=3)),
+                               (2, 'sub_gone', 'trialing', now - timedelta(days=2)),
+                               (3, None, 'active', now - timedelta(days=2)),
+                               (4, None, 'active', now + timedelta(days=2)),
+                           ])
+        period_end = int((now + timedelta(days=28)).replace(tzinfo=timezone.utc).timestamp())
+        subscriptions = {
+            'sub_renewed': {'status': 'active', 'current_period_end': period_end},
+            'sub_gone': {'status': 'active', 'current_period_end': None},
+        }
+        monkeypatch.setattr(stripe_service, 'is_enabled', lambda: True)
+        monkeypatch.setattr(stripe_service, 'get_subscription', subscriptions.get)
+
+        stats = expire_subscriptions(verify_limit=10, now=now)
+
+        assert (stats['verified'], stats['renewed'], stats['expired']) == (2, 1, 1)
+        with user_db as tx:
+            rows = [tuple(row) for row in tx.fetchall(
+                'SELECT subscription_status, subscription_tier FROM "user" ORDER BY id')]
+            ends_at = to_datetime(tx.fetchscalar('SELECT subscription_ends_at FROM "user" WHERE id = 1'))
+        assert rows == [('active', 2), ('canceled', 0), ('canceled', 0), ('active', 2)]
+        # Stripe's period end (a Unix timestamp) is stored as naive UTC
+        assert ends_at == (now + timedelta(days=28)).replace(microsecond=0)
@@ -0,0 +1,101 @@
+"""
+Tests for the batched dramatiq brokers.
+"""
+import sqlite3
+import time
+
+import dramatiq
+from dramatiq import Worker
+
+from app.services.task_broker import SQLiteBroker
+
+
+def make_broker(tmp_path, **kwargs):
+    broker = SQLiteBroker(url=f"sqlite://{tmp_path}/tasks.db", **kwargs)
+    broker.declare_queue("default")
+    return broker
+
+
+def states(tmp_path):
+    conn = sqlite3.connect(f"{tmp_path}/tasks.db")
+    rows = dict(conn.execute("SELECT state, COUNT(*) FROM dramatiq_messages GROUP BY state").fetchall())
+    conn.close()
+    return rows
+
+
+def send(broker, count):
+    @dramatiq.actor(broker=broker, actor_name="work")
+    def work(i):
+        pass
+
+    return [work.send(i) for i in range(count)]
+
+
+class TestBatchConsumer:
+    """Test batched claims, acks and requeues"""
+
+    def test_tuned_pragmas(self, tmp_path):
+        broker = make_broker(tmp_path)
+        assert broker.db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert broker.db.conn.execute("PRAGMA busy_timeout").fetchone()[0] == 10000
+
+    def test_claims_a_batch_in_enqueue_order(self, tmp_path):
+        broker = make_broker(tmp_path)
+        sent = send(broker, 5)
+        consumer = broker.consume("default", prefetch=3)
+
+        received = [next(consumer) for _ in range(3)]
+
+        assert [m.message_id for m in received] == [m.message_id for m in sent[:3]]
+        assert states(tmp_path) == {'consumed': 3, 'queued': 2}
+        assert len(consumer.in_processing) == 3
+
+    def test_acks_are_written_together(self, tmp_path):
+        broker = make_broker(tmp_path)
+        send(broker, 4)
+        consumer = broker.consume("default", prefetch=4)
+        received = [next(consumer) for _ in range(4)]
+
+        for message in received[:3]:
+            consumer.ack(message)
+        consumer.nack(received[3])
+        assert states(tmp_path) == {'consumed': 4}
+
+        consumer.flush()
+        assert states(tmp_path) == {'done': 3, 'rejected': 1}
+
+    def test_close_requeues_unprocessed_messages(self, tmp_path):
+        broker = make_broker(tmp_path)
+        send(broker, 4)
+        consumer = broker.consume("default", prefetch=4)
+        first = next(consumer)
+        consumer.ack(first)
+
+        consumer.close()
+
+        assert states(tmp_path) == {'done': 1, 'queued': 3}
+
+
+class TestWorker:
+    """Test the broker under a dramatiq worker"""
+
+    def test_processes_every_message(self, tmp_path):
+        broker = make_broker(tmp_path)
+        processed = []
+
+        @dramatiq.actor(broker=broker, actor_name="record")
+        def record(i):
+            processed.append(i)
+
+        for i in range(200):
+            record.send(i)
+
+        worker = Worker(broker, worker_threads=4, worker_timeout=100)
+        worker.start()
+        deadline = time.time() + 30
+        while len(processed) < 200 and time.time() < deadline:
+            time.sleep(0.05)
+        worker.stop()
+
+        assert sorted(processed) == list(range(200))
+        assert states(tmp_path) == {'done': 200}
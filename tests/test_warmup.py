@@ -0,0 +1,142 @@
+"""
+Tests for startup warm-up and the /readyz endpoint.
+"""
+import sys
+import time
+
+import jinjapy
+import pytest
+from flask import Flask
+
+from app.services import warmup as warmup_module
+from app.services.warmup import Warmup, format_breakdown, page_imports, process_uptime
+
+
+@pytest.fixture
+def flask_app():
+    return Flask("warmup_test")
+
+
+def make_warmup(app, *steps):
+    warmup = Warmup(app)
+    warmup.steps = []
+    for step in steps:
+        warmup.add_step(*step)
+    return warmup
+
+
+def wait_for(warmup, timeout=5):
+    deadline = time.time() + timeout
+    while warmup._thread is not None and not warmup.ready and time.time() < deadline:
+        time.sleep(0.01)
+
+
+class TestWarmup:
+    """Test step timing, readiness and retries"""
+
+    def test_ready_after_every_step(self, flask_app):
+        ran = []
+        warmup = make_warmup(flask_app, ("pages", lambda: ran.append("pages")), ("caches", lambda: ran.append("caches")))
+        assert warmup.status()["status"] == "warming"
+
+        assert warmup.run() is True
+
+        assert ran == ["pages", "caches"]
+        status = warmup.status()
+        assert status["status"] == "ready"
+        assert {"pages", "caches", "total"} <= set(status["startup_ms"])
+
+    def test_optional_step_failure_is_logged_only(self, flask_app):
+        def fail():
+            raise RuntimeError("Stripe is down")
+
+        warmup = make_warmup(flask_app, ("stripe", fail), ("caches", lambda: None))
+
+        assert warmup.run() is True
+        assert warmup.errors == {"stripe": "Stripe is down"}
+        assert "caches" in warmup.timings
+
+    def test_required_step_failure_is_retried(self, flask_app, monkeypatch):
+        attempts = []
+
+        def connect():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("connection refused")
+
+        warmup = make_warmup(flask_app, ("database", connect, True), ("caches", lambda: None))
+
+        assert warmup.run() is False
+        assert warmup.status()["status"] == "failed"
+        assert "caches" not in warmup.timings
+
+        # Not before RETRY_INTERVAL
+        warmup.start()
+        assert warmup._thread is None
+
+        monkeypatch.setattr(warmup_module, "RETRY_INTERVAL", 0)
+        warmup.start()
+        wait_for(warmup)
+        assert warmup.ready and len(attempts) == 2
+
+    def test_first_request_starts_warmup(self, flask_app):
+        started = []
+        warmup = make_warmup(flask_app, ("pages", lambda: started.append(1)))
+
+        @flask_app.route("/")
+        def index():
+            return "ok"
+
+        client = flask_app.test_client()
+        client.get("/")
+        wait_for(warmup)
+        client.get("/")
+
+        assert warmup.ready and started == [1]
+
+    def test_disabled(self, flask_app):
+        flask_app.config["WARMUP"] = False
+        warmup = Warmup(flask_app)
+
+        assert warmup.ready
+        assert flask_app.before_request_funcs == {}
+
+
+class TestHelpers:
+    """Test the startup breakdown helpers"""
+
+    def test_process_uptime(self):
+        uptime = process_uptime()
+        if uptime is not None:
+            assert 0 <= uptime < time.time()
+
+    def test_format_breakdown(self):
+        assert format_breakdown({"boot": 0.8124, "pages": 0.12}) == "boot=812ms pages=120ms"
+
+    def test_page_imports(self, tmp_path, monkeypatch):
+        (tmp_path / "pages").mkdir()
+        (tmp_path / "pages" / "index.jpy").write_text(
+            "---\nimport json\nfrom app.models import Product\nfrom . import sibling\n---\n<p></p>")
+        (tmp_path / "pages" / "broken.jpy").write_text("---\nreturn\n---\n")
+        monkeypatch.setattr(sys, "meta_path", list(sys.meta_path))
+        jinjapy.register_package("warmuptestpages", str(tmp_path / "pages"))
+
+        pages = [("warmuptestpages.index", "index.jpy"), ("warmuptestpages.broken", "broken.jpy")]
+        assert page_imports(pages) == ["app.models", "json"]
+
+
+class TestReadyz:
+    """Test the readiness endpoint"""
+
+    def test_reports_warming_then_ready(self, app, client):
+        from app.services.warmup import warmup
+
+        warmup.ready = False
+        response = client.get('/readyz')
+        assert response.status_code == 503
+        assert response.get_json()['status'] in ('warming', 'failed')
+
+        assert warmup.run()
+        response = client.get('/readyz')
+        assert response.status_code == 200
+        assert 'database' in response.get_json()['startup_ms']
@@ -0,0 +1,221 @@
+"""
+Tests for webhook event coalescing and the batched replay path.
+"""
+import json
+from datetime import datetime
+
+import pytest
+
+from app.services.stripe_service import MockStripeAPI
+from app.services.webhook_events import (
+    apply_subscription_states,
+    coalesce_subscription_events,
+    iter_jsonl_events,
+    process_events,
+)
+
+
+USER_SCHEMA = '''
+CREATE TABLE "user" (
+    id INTEGER PRIMARY KEY,
+    email TEXT,
+    stripe_customer_id TEXT,
+    stripe_subscription_id TEXT,
+    subscription_status TEXT,
+    subscription_plan TEXT,
+    subscription_ends_at TIMESTAMP,
+    subscription_tier INTEGER DEFAULT 0
+)
+'''
+
+
+@pytest.fixture
+def user_db(monkeypatch):
+    """In-memory SQLite engine standing in for the app database"""
+    import hyperflask.factory
+    from sqlorm import Engine
+
+    engine = Engine.from_uri("sqlite://:memory:", max_pool_conns=1)
+    with engine as tx:
+        tx.execute(USER_SCHEMA)
+    monkeypatch.setattr(hyperflask.factory, "db", engine)
+    return engine
+
+
+def make_event(event_type, obj, created):
+    return {'id': f'evt_{created}', 'type': event_type, 'created': created, 'data': {'object': obj}}
+
+
+class TestCoalesceSubscriptionEvents:
+    """Test reducing event streams to final subscription state"""
+
+    def test_multiple_events_collapse_to_final_state(self):
+        events = [
+            make_event('checkout.session.completed',
+                       {'customer_email': 'a@example.com', 'customer': 'cus_1', 'subscription': 'sub_1'}, 100),
+            make_event('customer.subscription.updated',
+                       {'id': 'sub_1', 'status': 'past_due', 'current_period_end': 2000000000}, 200),
+            make_event('customer.subscription.deleted',
+                       {'id': 'sub_1', 'status': 'canceled', 'canceled_at': 1900000000}, 300),
+        ]
+
+        states, events_read = coalesce_subscription_events(events)
+
+        assert events_read == 3
+        assert list(states) == ['sub_1']
+        state = states['sub_1']
+        assert state['email'] == 'a@example.com'
+        assert state['fields']['stripe_customer_id'] == 'cus_1'
+        assert state['fields']['subscription_status'] == 'canceled'
+        # Period end from the update wins over canceled_at
+        assert state['fields']['subscription_ends_at'] == datetime.utcfromtimestamp(2000000000)
+        assert 'ends_at_if_unset' not in state
+
+    def test_out_of_order_events_keep_latest(self):
+        events = [
+            make_event('customer.subscription.deleted', {'id': 'sub_1', 'canceled_at': 1900000000}, 300),
+            make_event('customer.subscription.updated', {'id': 'sub_1', 'status': 'active'}, 200),
+        ]
+
+        states, _ = coalesce_subscription_events(events)
+
+        assert states['sub_1']['fields']['subscription_status'] == 'canceled'
+        assert states['sub_1']['ends_at_if_unset'] == datetime.utcfromtimestamp(1900000000)
+
+    def test_late_checkout_still_links_user(self):
+        events = [
+            make_event('customer.subscription.updated', {'id': 'sub_1', 'status': 'past_due'}, 200),
+            make_event('checkout.session.completed',
+                       {'customer_email': 'a@example.com', 'customer': 'cus_1', 'subscription': 'sub_1'}, 100),
+        ]
+
+        states, _ = coalesce_subscription_events(events)
+
+        assert states['sub_1']['email'] == 'a@example.com'
+        assert states['sub_1']['fields']['subscription_status'] == 'past_due'
+
+    def test_checkout_for_existing_customer(self):
+        events = [
+            make_event('checkout.session.completed',
+                       {'customer': 'cus_1', 'customer_details': {'email': 'a@example.com'},
+                        'subscription': 'sub_1'}, 100),
+            make_event('checkout.session.completed', {'customer': 'cus_2', 'subscription': 'sub_2'}, 100),
+        ]
+
+        states, _ = coalesce_subscription_events(events)
+
+        assert states['sub_1']['email'] == 'a@example.com'
+        assert states['sub_2']['customer_id'] == 'cus_2'
+        assert 'email' not in states['sub_2']
+
+    def test_unhandled_events_are_skipped(self):
+        events = [make_event('invoice.paid', {'id': 'in_1'}, 100)]
+
+        states, events_read = coalesce_subscription_events(events)
+
+        assert events_read == 1
+        assert states == {}
+
+    def test_mock_api_events(self, mock_stripe_api):
+        session = mock_stripe_api.create_checkout_session(
+            customer_email='mock@example.com',
+            price_id='price_test_basic',
+            success_url='https://example.com/success',
+            cancel_url='https://example.com/cancel'
+        )
+        completed = mock_stripe_api.complete_checkout_session(session['id'])
+        mock_stripe_api.cancel_subscription(completed['subscription'])
+
+        states, events_read = coalesce_subscription_events(mock_stripe_api.events)
+
+        assert events_read == 2
+        assert states[completed['subscription']]['fields']['subscription_status'] == 'canceled'
+
+    def test_iter_jsonl_events(self, tmp_path):
+        path = tmp_path / 'events.jsonl'
+        path.write_text('\n'.join(json.dumps(make_event('invoice.paid', {}, i)) for i in range(3)) + '\n\n')
+
+        assert [e['created'] for e in iter_jsonl_events(str(path))] == [0, 1, 2]
+
+
+class TestProcessEvents:
+    """Test applying coalesced events to users"""
+
+    def test_batched_replay_updates_users(self, app, db_session):
+        from app.models import User
+
+        api = MockStripeAPI()
+        emails = [f'replay{i}@example.com' for i in range(5)]
+        for email in emails:
+            User.create_user(email=email, password='testpass')
+            session = api.create_checkout_session(
+                customer_email=email,
+                price_id='price_test_basic',
+                success_url='https://example.com/success',
+                cancel_url='https://example.com/cancel'
+            )
+            completed = api.complete_checkout_session(session['id'])
+        api.cancel_subscription(completed['subscription'])
+
+        stats = process_events(api.events, batch_size=2)
+
+        assert stats['events_read'] == 6
+        assert stats['subscriptions'] == 5
+        assert stats['rows_updated'] == 5
+        with db_session:
+            statuses = {email: User.find_one(email=email).subscription_status for email in emails}
+        assert statuses[emails[-1]] == 'canceled'
+        assert all(statuses[email] == 'active' for email in emails[:-1])
+
+
+class TestApplySubscriptionStates:
+    """Test the batched UPDATEs against SQLite"""
+
+    def test_updates_by_lookup_key(self, user_db):
+        with user_db as tx:
+            tx.executemany('INSERT INTO "user" (email, stripe_subscription_id, subscription_plan) VALUES (?, ?, ?)',
+                           [('a@example.com', None, None), ('b@example.com', 'sub_b', 'pro')])
+
+        ends_at = datetime(2030, 1, 1)
+        states = [
+            {'subscription_id': 'sub_a', 'email': 'a@example.com', 'fields': {
+                'stripe_subscription_id': 'sub_a', 'subscription_status': 'active',
+                'subscription_plan': 'basic', 'subscription_ends_at': ends_at, 'subscription_tier': 1}},
+            {'subscription_id': 'sub_b', 'tier_from_stored_plan': True, 'ends_at_if_unset': ends_at,
+             'fields': {'subscription_status': 'active'}},
+            {'subscription_id': 'sub_unknown', 'fields': {'subscription_status': 'canceled'}},
+        ]
+
+        assert apply_subscription_states(states, batch_size=1) == 2
+
+        with user_db as tx:
+            rows = {r['email']: r for r in tx.fetchall(
+                'SELECT email, stripe_subscription_id, subscription_status, subscription_tier, '
+                'subscription_ends_at FROM "user"')}
+        assert rows['a@example.com']['stripe_subscription_id'] == 'sub_a'
+        assert rows['a@example.com']['subscription_tier'] == 1
+        assert rows['b@example.com']['subscription_status'] == 'active'
+        assert rows['b@example.com']['subscription_tier'] == 2
+        assert rows['b@example.com']['subscription_ends_at'] is not None
+
+    def test_checkout_matches_customer_before_email(self, user_db):
+        with user_db as tx:
+            tx.executemany('INSERT INTO "user" (email, stripe_customer_id) VALUES (?, ?)',
+                           [('a@example.com', 'cus_a'), ('b@example.com', None), ('c@example.com', None)])
+
+        def checkout(customer, email, subscription):
+            return {'subscription_id': subscription, 'customer_id': customer, 'email': email,
+                    'fields': {'stripe_customer_id': customer, 'stripe_subscription_id': subscription}}
+
+        states = [
+            # Returning customer whose Stripe email is now another account's
+            checkout('cus_a', 'b@example.com', 'sub_a'),
+            # First-time customer, found by email
+            checkout('cus_c', 'c@example.com', 'sub_c'),
+        ]
+
+        assert apply_subscription_states(states) == 2
+
+        with user_db as tx:
+            subscriptions = dict(tx.fetchall('SELECT email, stripe_subscription_id FROM "user"'))
+        assert subscriptions == {'a@example.com': 'sub_a', 'b@example.com': None, 'c@example.com': 'sub_c'}